@@ -0,0 +1,328 @@
+#
+# Copyright 2015 - Tom Alessi
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""SSD Static Asset Build
+
+   Bundles the stylesheets and scripts loaded by every page into a few files,
+   minifies them and names each one after a hash of its content so they can be
+   cached by browsers forever (a changed bundle gets a new name).  Each bundle
+   is also written gzip (and brotli, if the brotli module is installed)
+   compressed so Apache can serve it without compressing it on every request.
+
+   The bundles are written to html/dist, along with manifest.json, which maps
+   each bundle name to its file and is read by the templates.
+
+   Stylesheets and scripts are minified by the small minifiers below, so the
+   build needs nothing beyond the standard library.
+
+   Run by the install script, or manually with:
+     python assets.py /path/to/ssd/html
+
+"""
+
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import urlparse
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# The bundles, in the order their files are loaded by the templates
+# (paths are relative to the html directory).  The stylesheets are split where
+# a file that cannot be bundled is loaded, so the cascade order is unchanged.
+BUNDLES = (
+    ('css', (
+        'css/foundation.css',
+        'css/foundicons/general_foundicons.css',
+        'css/foundicons/general_enclosed_foundicons.css',
+        'css/foundicons/accessibility_foundicons.css',
+    )),
+    # The IE7 foundicons are loaded here, from a conditional comment
+    ('css_base', (
+        'css/normalize.css',
+        'css/smoothness/jquery-ui-1.10.3.custom.min.css',
+    )),
+    # Loaded with media="screen" (and has its own @media rules), so kept apart
+    ('css_screen', (
+        'css/responsive-tables.css',
+    )),
+    ('css_app', (
+        'css/jqueryui-editable.css',
+        'css/app.css',
+        'css/ssd.css',
+    )),
+    ('js', (
+        'js/vendor/custom.modernizr.js',
+        'js/jquery-1.8.2.js',
+        'js/jquery-ui-1.10.3.custom.min.js',
+        'js/ssd.js',
+        'js/responsive-tables.js',
+        'js/jquery-ui-timepicker-addon.js',
+        'js/jqueryui-editable.min.js',
+    )),
+    ('js_foundation', (
+        'js/foundation/foundation.js',
+        'js/foundation/foundation.alerts.js',
+        'js/foundation/foundation.clearing.js',
+        'js/foundation/foundation.cookie.js',
+        'js/foundation/foundation.dropdown.js',
+        'js/foundation/foundation.forms.js',
+        'js/foundation/foundation.joyride.js',
+        'js/foundation/foundation.magellan.js',
+        'js/foundation/foundation.orbit.js',
+        'js/foundation/foundation.placeholder.js',
+        'js/foundation/foundation.reveal.js',
+        'js/foundation/foundation.section.js',
+        'js/foundation/foundation.tooltips.js',
+        'js/foundation/foundation.topbar.js',
+    )),
+    ('js_highcharts', (
+        'js/highcharts.js',
+    )),
+)
+
+# Where the html directory is served from
+URL = '/html/'
+
+# Where the bundles are written, relative to the html directory
+DIST = 'dist'
+
+# Comments and strings in stylesheets (strings are left alone by the minifier)
+CSS_TOKENS = re.compile(r'/\*.*?\*/|"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'', re.S)
+
+# Stylesheet url() references
+CSS_URLS = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+# Script tokens: whitespace, comments, strings, words (names, keywords and
+# numbers), then single characters ('/' may start a regular expression)
+JS_TOKENS = re.compile(r'''
+    (?P<space>\s+)
+  | (?P<comment>//[^\r\n]*|/\*.*?\*/)
+  | (?P<string>"(?:\\.|[^"\\\r\n])*"|'(?:\\.|[^'\\\r\n])*'|`(?:\\.|[^`\\])*`)
+  | (?P<word>[\w$\\\x80-\xff]+)
+  | (?P<char>.)
+''', re.S | re.X)
+
+# A regular expression literal, with its character classes and escapes
+JS_REGEX = re.compile(r'/(?:\\.|\[(?:\\.|[^\]\\\r\n])*\]|[^/\\\[\r\n])+/')
+
+# A '/' after one of these characters or words starts a regular expression
+JS_REGEX_AFTER = '(,=:[!&|?{};~+-*%<>^'
+JS_REGEX_WORDS = ('return', 'typeof', 'case', 'do', 'else', 'in', 'instanceof', 'new', 'delete', 'void', 'throw')
+
+# A line break between these may end a statement (automatic semicolon
+# insertion), so it is kept
+JS_BREAK_BEFORE = ')]}\'"`+-/'
+JS_BREAK_AFTER = '({[+-!~\'"`/'
+
+
+def _squeeze(css):
+    """Remove the unneeded whitespace from stylesheet text (without strings)"""
+
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    return css.replace(';}', '}')
+
+
+def minify_css(css):
+    """Remove the comments and unneeded whitespace from a stylesheet"""
+
+    out = []
+    pos = 0
+    for match in CSS_TOKENS.finditer(css):
+        out.append(_squeeze(css[pos:match.start()]))
+        if not match.group().startswith('/*'):
+            out.append(match.group())
+        pos = match.end()
+    out.append(_squeeze(css[pos:]))
+
+    return ''.join(out).strip()
+
+
+def _word(char):
+    """Whether a character is part of a script word"""
+
+    return char.isalnum() or char in '_$\\' or ord(char) > 127
+
+
+def _js_space(last, first, newline):
+    """The whitespace that must be kept between two script tokens, given the
+    last character of the first and the first character of the second"""
+
+    if newline and (_word(last) or last in JS_BREAK_BEFORE) and (_word(first) or first in JS_BREAK_AFTER):
+        return '\n'
+
+    # Words would merge, as would '+ +', '- -' and '/ /' (and '1 .toString')
+    if (_word(last) and _word(first)) or (last == first and last in '+-/') or (last.isdigit() and first == '.'):
+        return ' '
+
+    return ''
+
+
+def minify_js(js):
+    """Remove the comments and unneeded whitespace from a script
+
+    Line breaks are kept wherever they may end a statement, and comments
+    starting with /*! (licenses) are kept.
+
+    """
+
+    out = []
+    last = ''
+    word = None
+    space = None
+    pos = 0
+
+    while pos < len(js):
+        match = JS_TOKENS.match(js, pos)
+        kind, token = match.lastgroup, match.group()
+
+        if kind == 'char' and token == '/' and (not last or last in JS_REGEX_AFTER or word in JS_REGEX_WORDS):
+            regex = JS_REGEX.match(js, pos)
+            if regex:
+                kind, token = 'regex', regex.group()
+        pos += len(token)
+
+        # Whitespace and comments separate tokens, a line break may end a statement
+        if kind == 'space' or (kind == 'comment' and not token.startswith('/*!')):
+            newline = '\n' in token or '\r' in token
+            space = '\n' if newline or space == '\n' else ' '
+            continue
+
+        if kind == 'comment':
+            out.append('\n' + token + '\n')
+            last, word, space = '', None, None
+            continue
+
+        if space and last:
+            out.append(_js_space(last, token[0], space == '\n'))
+        out.append(token)
+
+        last = token[-1]
+        word = token if kind == 'word' else None
+        space = None
+
+    return ''.join(out)
+
+
+def rebase_css(css, path):
+    """Make the relative url() references in a stylesheet absolute so they still
+    resolve from the bundle"""
+
+    base = URL + path
+
+    def rebase(match):
+        url = match.group(2).strip()
+        if url.startswith(('/', '#', 'data:', 'http:', 'https:')):
+            return match.group()
+        return 'url("%s")' % urlparse.urljoin(base, url)
+
+    return CSS_URLS.sub(rebase, css)
+
+
+def bundle_css(html_dir, paths):
+    """Build a stylesheet bundle"""
+
+    parts = []
+    for path in paths:
+        css = open(os.path.join(html_dir, path)).read()
+        # @charset is only allowed at the very top
+        css = re.sub(r'@charset\s+[^;]+;', '', css)
+        parts.append(minify_css(rebase_css(css, path)))
+
+    return '@charset "UTF-8";\n' + '\n'.join(parts) + '\n'
+
+
+def bundle_js(html_dir, paths):
+    """Build a script bundle"""
+
+    parts = []
+    for path in paths:
+        js = open(os.path.join(html_dir, path)).read()
+        # Already minified files are left as they are
+        if not path.endswith('.min.js'):
+            js = minify_js(js)
+        # Keep a missing trailing semicolon from joining two scripts
+        parts.append(js.strip() + '\n;')
+
+    return '\n'.join(parts) + '\n'
+
+
+def _write(path, data):
+    """Write a file along with its compressed variants"""
+
+    f = open(path, 'wb')
+    f.write(data)
+    f.close()
+
+    # Use a fixed timestamp so an unchanged bundle compresses the same every time
+    f = gzip.GzipFile(path + '.gz', 'wb', 9, mtime=0)
+    f.write(data)
+    f.close()
+
+    if brotli:
+        f = open(path + '.br', 'wb')
+        f.write(brotli.compress(data))
+        f.close()
+
+
+def build(html_dir):
+    """Build all of the bundles and the manifest
+
+    Any previous build is removed.  Returns the manifest, a dictionary of
+    bundle name to bundle file (relative to the html directory).
+
+    """
+
+    dist_dir = os.path.join(html_dir, DIST)
+    if os.path.exists(dist_dir):
+        shutil.rmtree(dist_dir)
+    os.makedirs(dist_dir)
+
+    manifest = {}
+    for name,paths in BUNDLES:
+        if paths[0].endswith('.css'):
+            data, ext = bundle_css(html_dir, paths), 'css'
+        else:
+            data, ext = bundle_js(html_dir, paths), 'js'
+
+        file = '%s/%s.%s.%s' % (DIST, name, hashlib.md5(data).hexdigest()[:12], ext)
+        _write(os.path.join(html_dir, file), data)
+        manifest[name] = file
+
+    f = open(os.path.join(dist_dir, 'manifest.json'), 'w')
+    json.dump(manifest, f, indent=2, sort_keys=True)
+    f.close()
+
+    return manifest
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print 'Usage: python assets.py /path/to/ssd/html'
+        exit(2)
+
+    for name,file in sorted(build(sys.argv[1]).items()):
+        print '%s: %s' % (name, file)
@@ -24,6 +24,7 @@
 """
 
 
+import assets
 import django
 import os
 import random
@@ -64,6 +65,15 @@ def create_log(app_dir,apache_uid):
     except Exception as e:
         terminate(e)
 
+    # Create the request profile directory, writeable by the Apache user
+    print 'Creating the request profile directory:%s/log/profiles' % app_dir
+    try:
+        os.makedirs('%s/log/profiles' % app_dir)
+        os.chown('%s/log/profiles' % app_dir,int(apache_uid),-1)
+        os.chmod('%s/log/profiles' % app_dir,0700)
+    except Exception as e:
+        terminate(e)
+
 
 def customize_settings(app_dir,dst_local):
     """Customize the SSD settings.tmpl file"""
@@ -224,6 +234,20 @@ def ssd_symlink(app_dir,ssd_src):
         terminate(e)
 
 
+def build_assets(app_dir):
+    """Bundle, minify and compress the SSD static assets"""
+
+    print 'Building the static asset bundles in %s/html/%s' % (app_dir,assets.DIST)
+
+    try:
+        manifest = assets.build('%s/html' % app_dir)
+    except Exception, e:
+        terminate(e)
+
+    for name in sorted(manifest):
+        print '  %s: %s' % (name,manifest[name])
+
+
 def split_directories(ssd_src):
     """Split the source directory from its path"""
 
@@ -414,6 +438,9 @@ def install():
     # Create the screenshot upload directory
     create_upload(upload_dir,apache_uid)
 
+    # Build the static asset bundles
+    build_assets(app_dir)
+
 
 def upgrade():
     """Perform an upgrade of SSD"""
@@ -480,6 +507,11 @@ def upgrade():
     # Customize settings.tmpl to add the path to the local_settings.py file
     customize_settings(app_dir,dst_local)
 
+    # Rebuild the static asset bundles
+    build_assets(app_dir)
+    print 'The bundles are served with far-future caching by the /html/dist section of %s/src/local.tmpl/wsgi.conf,' % app_dir
+    print 'copy it into %s/wsgi.conf if it is not there already.' % dst_local
+
 
 ### Main Program Execution ###
 
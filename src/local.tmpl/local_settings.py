@@ -69,3 +69,126 @@ CACHES = {
 # Keep in mind that sessions could be evicted or you could lose your session store if memcached
 # is restarted.
 # SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+
+
+# -- EVENT ARCHIVE -- #
+# Closed incidents and completed maintenances that ended more than
+# SSD_ARCHIVE_AGE days ago are moved to the archive tables by running
+# 'python manage.py archive_events' (e.g. nightly from cron).  Archived events
+# remain available through search and the event detail pages.
+# SSD_ARCHIVE_AGE = 365
+# SSD_ARCHIVE_BATCH = 500
+
+
+
+# -- DASHBOARD -- #
+# Number of service rows rendered with the dashboard.  The remaining services are
+# loaded a page (of the same size) at a time as the dashboard is scrolled.
+# SSD_DASHBOARD_PAGE = 50
+
+# Event counts per day, week or month (/search/histogram?start=&end=&granularity=)
+# can be requested for at most SSD_HISTOGRAM_MAX_DAYS days at a time.
+# SSD_HISTOGRAM_MAX_DAYS = 3660
+
+
+
+# -- STATIC ASSETS -- #
+# The install script bundles, minifies and compresses the stylesheets and
+# scripts into html/dist (rebuild them after changing any of them by running
+# 'python src/install/assets.py <ssd dir>/html' and restarting Apache).  Set
+# SSD_ASSET_BUNDLES to False to load the individual files instead.
+# SSD_ASSET_BUNDLES = True
+
+
+
+# -- EVENT IMPORT -- #
+# Number of events written per transaction when importing historical events
+# ('python manage.py import_events <file> --user <username>' or Admin > Import Events).
+# SSD_IMPORT_BATCH = 1000
+
+
+
+# -- REQUEST TRACING -- #
+# Set SSD_TRACE_RATE to trace a fraction of the requests (e.g. 0.01 for 1 in
+# 100).  Each traced request logs one line to the SSD log with its total time
+# and the number and time of its SQL queries, cache calls (and misses) and the
+# template rendering time.  Tracing is off (and costs nothing) when set to 0.
+# SSD_TRACE_RATE = 0
+
+# Requests to a URL can be profiled on demand from Admin > Request Profiling.
+# The profiles are saved to SSD_PROFILE_DIR (set to None to turn profiling off
+# entirely).  Each web server process checks whether profiling has been armed
+# every SSD_PROFILE_POLL seconds.
+# SSD_PROFILE_DIR = '$__app_dir__$/log/profiles'
+# SSD_PROFILE_POLL = 10
+
+
+
+# -- READ REPLICAS -- #
+# Add one or more read replicas to DATABASES and list their aliases in
+# SSD_REPLICAS to serve the public read views (dashboard, search, event details,
+# escalation and availability) from them.  Writes, logged in users and anyone
+# who submitted a form within the last SSD_REPLICA_LAG seconds always use the
+# primary, so set SSD_REPLICA_LAG above your worst expected replication lag.
+# The cached data is shared by everyone, so after any write all requests use the
+# primary for SSD_REPLICA_LAG seconds while the cache is rebuilt.  Run
+# 'python manage.py replica_check' to verify which database the reads use.
+"""
+DATABASES['replica1'] = {
+    'ENGINE'   : 'django.db.backends.mysql',
+    'NAME'     : 'ssd',
+    'USER'     : '$__db_user__$',
+    'PASSWORD' : '$__db_pass__$',
+    'HOST'     : 'replica1.domain.com',
+}
+"""
+# SSD_REPLICAS = ['replica1']
+# SSD_REPLICA_LAG = 5
+
+
+
+# -- SCREENSHOT UPLOAD STORAGE -- #
+# Incident report screenshots are stored in the upload path set in the SSD admin
+# (Incident Reports configuration).  For several web nodes, either point the
+# upload path at a shared directory (e.g. NFS) mounted on every node and use
+# SharedUploadStorage, or use any Django storage class for an object store (it
+# is configured through its own settings and the upload path is not used).
+# SSD_UPLOAD_STORAGE = 'ssd.dashboard.storage.FileSystemUploadStorage'
+# SSD_UPLOAD_STORAGE = 'ssd.dashboard.storage.SharedUploadStorage'
+# SSD_UPLOAD_URL = '/uploads/'
+
+# New screenshots are deduplicated, re-encoded if larger than SSD_SCREENSHOT_MAX
+# pixels and thumbnailed by running 'python manage.py process_screenshots'
+# (e.g. every minute from cron).  Until then reports link to the original upload.
+# SSD_SCREENSHOT_MAX = 1600
+# SSD_THUMBNAIL_SIZE = 200
+
+# Incident report uploads are limited to the file size set in the SSD admin for
+# each screenshot, and to SSD_IREPORT_UPLOAD_TOTAL bytes per report (default:
+# twice the file size).  Larger uploads are stopped as soon as they go over.
+# SSD_IREPORT_UPLOAD_TOTAL = 2097152
+
+# Incident report submissions are limited per client IP and for all clients,
+# each given as (reports, seconds).  Over the limit, reports are rejected with
+# HTTP 429 before any database or email work.  If SSD is behind a proxy or load
+# balancer, set SSD_CLIENT_IP_HEADER to the header holding the client address.
+# SSD_IREPORT_RATE = (5, 300)
+# SSD_IREPORT_GLOBAL_RATE = (60, 60)
+# SSD_CLIENT_IP_HEADER = 'HTTP_X_FORWARDED_FOR'
+
+# Incident report text pages are sent at most once every SSD_PAGER_WINDOW
+# seconds; reports received in between are combined into one page with a count
+# and the SSD_PAGER_DIGEST_TOP most common details.  Run
+# 'python manage.py send_report_pages' every minute from cron so the last
+# reports of a busy period are paged without waiting for another report.
+# SSD_PAGER_WINDOW = 60
+# SSD_PAGER_DIGEST_TOP = 3
+
+
+
+# -- SERVICE BADGES -- #
+# Service status badges (/badge/svg?service=<name> and /badge/json?service=<name>)
+# may be cached by browsers and proxies for SSD_BADGE_MAX_AGE seconds and are
+# then revalidated with their ETag.
+# SSD_BADGE_MAX_AGE = 300
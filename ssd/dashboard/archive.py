@@ -0,0 +1,169 @@
+#
+# Copyright 2015 - Tom Alessi
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Event archive for SSD
+
+   Closed incidents and completed maintenances that ended more than
+   SSD_ARCHIVE_AGE days ago are moved, in batches, from the live event
+   tables into the Archive_* tables.  This keeps the tables behind the
+   dashboard and admin lists small, while searches and event detail pages
+   fall back to the archive.
+
+"""
+
+
+import logging
+import datetime
+import pytz
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q, Max
+from ssd.dashboard.models import Event, Event_Service, Event_Impact, Event_Coordinator, Event_Email, Event_Update
+from ssd.dashboard.models import Archive_Event, Archive_Event_Service, Archive_Event_Impact, Archive_Event_Coordinator, Archive_Event_Email, Archive_Event_Update
+from ssd.dashboard import cachetags, router
+
+
+# Get an instance of the ssd logger
+logger = logging.getLogger(__name__)
+
+
+# Defaults, may be overridden in local_settings.py
+ARCHIVE_AGE = getattr(settings, 'SSD_ARCHIVE_AGE', 365)
+ARCHIVE_BATCH = getattr(settings, 'SSD_ARCHIVE_BATCH', 500)
+
+
+def horizon():
+    """Return the latest end date of any archived event (or None)
+
+    Archived events all start and end before this date, so callers can skip
+    the archive entirely for date ranges that begin after it.
+
+    """
+
+    archive_horizon = cache.get('archive_horizon')
+    if archive_horizon == None:
+        logger.debug('cache miss: %s', 'archive_horizon')
+        archive_horizon = Archive_Event.objects.aggregate(Max('end'))['end__max'] or False
+        cache.set('archive_horizon', archive_horizon)
+    else:
+        logger.debug('cache hit: %s', 'archive_horizon')
+
+    return archive_horizon or None
+
+
+def _archive_batch(ids):
+    """Move one batch of events (and everything tied to them) into the archive"""
+
+    with transaction.atomic():
+        Archive_Event.objects.bulk_create([
+            Archive_Event(**event) for event in Event.objects.filter(id__in=ids).values(
+                'id','type_id','date','description','start','end','status_id','user_id')
+        ])
+        Archive_Event_Service.objects.bulk_create([
+            Archive_Event_Service(**row) for row in Event_Service.objects.filter(event_id__in=ids).values('event_id','service_id')
+        ])
+        Archive_Event_Impact.objects.bulk_create([
+            Archive_Event_Impact(**row) for row in Event_Impact.objects.filter(event_id__in=ids).values('event_id','impact')
+        ])
+        Archive_Event_Coordinator.objects.bulk_create([
+            Archive_Event_Coordinator(**row) for row in Event_Coordinator.objects.filter(event_id__in=ids).values('event_id','coordinator')
+        ])
+        Archive_Event_Email.objects.bulk_create([
+            Archive_Event_Email(**row) for row in Event_Email.objects.filter(event_id__in=ids).values('event_id','email_id')
+        ])
+        # Keep the updates in their original order
+        Archive_Event_Update.objects.bulk_create([
+            Archive_Event_Update(**row) for row in Event_Update.objects.filter(event_id__in=ids).values('event_id','date','update','user_id').order_by('id')
+        ])
+
+        # Now remove them from the live tables
+        for model in (Event_Service, Event_Impact, Event_Coordinator, Event_Email, Event_Update):
+            model.objects.filter(event_id__in=ids).delete()
+        Event.objects.filter(id__in=ids).delete()
+
+
+def archive(age=ARCHIVE_AGE, batch=ARCHIVE_BATCH):
+    """Archive all closed incidents and completed maintenances that ended
+    more than age days ago, batch events at a time
+
+    Returns the number of events archived
+
+    """
+
+    cutoff = datetime.datetime.now(pytz.utc) - datetime.timedelta(days=age)
+    logger.debug('Archiving events that ended before %s', cutoff)
+
+    finished = Q(type__type='incident', status__status='closed') | Q(type__type='maintenance', status__status='completed')
+
+    archived = 0
+    while True:
+        ids = list(Event.objects.filter(finished, end__lt=cutoff).order_by('id').values_list('id', flat=True)[:batch])
+        if not ids:
+            break
+
+        _archive_batch(ids)
+        archived += len(ids)
+
+        # The cached detail of these events (see functions.event_detail_get) now has to show them as archived
+        router.write_mark()
+        cache.delete_many(['event_detail_ns_%s' % id for id in ids])
+        logger.debug('Archived %s events (%s total)', len(ids), archived)
+
+    if archived:
+        # Clear the cache - archived events move out of the live event caches
+        cachetags.invalidate('events')
+        cache.delete('archive_horizon')
+
+    return archived
+
+
+class QuerySetChain(object):
+    """Chain the live and archived results of a search together so they can
+    be paginated as one list (live results first)
+
+    """
+
+    def __init__(self, *querysets):
+        self.querysets = querysets
+        self._counts = None
+
+    def counts(self):
+        if self._counts is None:
+            self._counts = [qs.count() for qs in self.querysets]
+        return self._counts
+
+    def count(self):
+        return sum(self.counts())
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+
+        start = key.start or 0
+        stop = self.count() if key.stop is None else key.stop
+
+        items = []
+        for qs, count in zip(self.querysets, self.counts()):
+            if start < count and stop > 0:
+                items.extend(qs[max(start, 0):min(stop, count)])
+            start -= count
+            stop -= count
+
+        return items
@@ -0,0 +1,259 @@
+#
+# Copyright 2015 - Tom Alessi
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Service availability engine for SSD
+
+   Incident downtime is merged per service and rolled up into one
+   Service_Availability row per service per UTC day.  Rollups are refreshed
+   whenever an incident is written, so availability percentages can be
+   served from the rollups instead of scanning the full event history.
+
+"""
+
+
+import logging
+import datetime
+import pytz
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from ssd.dashboard.models import Event, Event_Service, Service, Service_Availability, Archive_Event
+from ssd.dashboard import archive
+
+
+# Get an instance of the ssd logger
+logger = logging.getLogger(__name__)
+
+
+# Availability windows that are reported (in days)
+WINDOWS = (30, 90, 365)
+
+
+def merge(intervals):
+    """Merge overlapping (start, end) intervals
+
+    The intervals are sorted by start and swept once, extending the current
+    interval while the next one overlaps it.
+
+    """
+
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+
+    return merged
+
+
+def _day_start(day):
+    """Return midnight UTC for a date"""
+
+    return pytz.utc.localize(datetime.datetime.combine(day, datetime.time()))
+
+
+def downtime(service_ids, first_day, last_day, now=None):
+    """Calculate incident downtime per service per UTC day
+
+    Returns a dict of {(service_id, date): seconds} for all days between
+    first_day and last_day (inclusive) that have downtime.  Open incidents
+    are counted up until now.
+
+    """
+
+    if now is None:
+        now = datetime.datetime.now(pytz.utc)
+
+    range_start = _day_start(first_day)
+    range_end = _day_start(last_day + datetime.timedelta(days=1))
+
+    # All incidents for these services that overlap the range (archived incidents
+    # are only checked if the range reaches back far enough)
+    models = [Event]
+    archive_horizon = archive.horizon()
+    if archive_horizon and range_start <= archive_horizon:
+        models.append(Archive_Event)
+
+    incidents = []
+    for model in models:
+        incidents.extend(model.objects.filter(
+                                              type__type='incident',
+                                              event_service__service_id__in=service_ids,
+                                              start__lt=range_end
+                                             ).filter(Q(end__isnull=True) | Q(end__gt=range_start)).values(
+                                              'event_service__service_id',
+                                              'start',
+                                              'end'
+                                             ))
+
+    # Group the intervals by service
+    intervals = {}
+    for incident in incidents:
+        end = incident['end'] or now
+        if end <= incident['start']:
+            continue
+        intervals.setdefault(incident['event_service__service_id'], []).append((incident['start'], end))
+
+    # Merge each service's intervals and split them across UTC days
+    result = {}
+    for service_id, service_intervals in intervals.items():
+        for start, end in merge(service_intervals):
+            start = max(start, range_start)
+            end = min(end, range_end)
+            while start < end:
+                day = start.astimezone(pytz.utc).date()
+                day_end = min(_day_start(day + datetime.timedelta(days=1)), end)
+                seconds = int((day_end - start).total_seconds())
+                if seconds:
+                    result[(service_id, day)] = result.get((service_id, day), 0) + seconds
+                start = day_end
+
+    return result
+
+
+def refresh(service_ids, start, end=None):
+    """Recalculate the daily rollups for the given services over the
+    UTC days touched by start through end (or now, if there is no end)
+
+    """
+
+    service_ids = list(set(service_ids))
+    if not service_ids:
+        return
+
+    now = datetime.datetime.now(pytz.utc)
+    first_day = start.astimezone(pytz.utc).date()
+    last_day = (end or now).astimezone(pytz.utc).date()
+    if last_day < first_day:
+        last_day = first_day
+
+    logger.debug('Refreshing availability rollups for services %s: %s - %s', service_ids, first_day, last_day)
+
+    rollups = downtime(service_ids, first_day, last_day, now)
+
+    with transaction.atomic():
+        Service_Availability.objects.filter(service_id__in=service_ids, date__range=[first_day, last_day]).delete()
+        Service_Availability.objects.bulk_create([
+            Service_Availability(service_id=service_id, date=day, downtime=seconds)
+            for (service_id, day), seconds in rollups.items()
+        ])
+
+
+def event_snapshot(event_id):
+    """Capture the services and time span of an incident so that the rollups
+    it contributed to can be refreshed after it changes
+
+    Returns None if the event is not an incident.
+
+    """
+
+    event = Event.objects.filter(id=event_id, type__type='incident').values('start', 'end')
+    if not event:
+        return None
+
+    return {
+            'services': list(Event_Service.objects.filter(event_id=event_id).values_list('service_id', flat=True)),
+            'start': event[0]['start'],
+            'end': event[0]['end']
+           }
+
+
+def event_refresh(event_id, before=None):
+    """Refresh the rollups touched by an incident, both before (if given)
+    and after it was written
+
+    """
+
+    snapshots = [s for s in (before, event_snapshot(event_id)) if s]
+    if not snapshots:
+        return
+
+    service_ids = []
+    for snapshot in snapshots:
+        service_ids.extend(snapshot['services'])
+
+    start = min(snapshot['start'] for snapshot in snapshots)
+
+    # An open incident runs through now
+    if [snapshot for snapshot in snapshots if snapshot['end'] is None]:
+        end = None
+    else:
+        end = max(snapshot['end'] for snapshot in snapshots)
+
+    refresh(service_ids, start, end)
+
+
+def get():
+    """Obtain the availability percentages for all services
+
+    Returns a list like this:
+    [
+     {'service':'www.domain.com', 'd30':99.982, 'd90':99.994, 'd365':99.998}
+    ]
+
+    """
+
+    availability = cache.get('availability')
+    if availability is not None:
+        logger.debug('cache hit: %s', 'availability')
+        return availability
+
+    logger.debug('cache miss: %s', 'availability')
+
+    now = datetime.datetime.now(pytz.utc)
+    today = now.date()
+    first_day = today - datetime.timedelta(days=max(WINDOWS) - 1)
+
+    # Start with the precomputed rollups
+    rollups = {}
+    for row in Service_Availability.objects.filter(date__gte=first_day).values('service_id', 'date', 'downtime'):
+        rollups[(row['service_id'], row['date'])] = row['downtime']
+
+    # Open incidents keep accruing downtime after their last write, so recalculate
+    # the days they cover (only for the services they impact)
+    open_incidents = Event.objects.filter(type__type='incident', status__status='open').values('start', 'event_service__service_id')
+    open_services = set(row['event_service__service_id'] for row in open_incidents if row['event_service__service_id'])
+    if open_services:
+        open_first = max(min(row['start'] for row in open_incidents).astimezone(pytz.utc).date(), first_day)
+        for key in [key for key in rollups if key[0] in open_services and key[1] >= open_first]:
+            del rollups[key]
+        rollups.update(downtime(open_services, open_first, today, now))
+
+    # Sum the downtime for each window
+    totals = {}
+    for (service_id, day), seconds in rollups.items():
+        age = (today - day).days
+        for window in WINDOWS:
+            if age < window:
+                totals[(service_id, window)] = totals.get((service_id, window), 0) + seconds
+
+    # Today only counts up until now
+    today_seconds = (now - _day_start(today)).total_seconds()
+
+    availability = []
+    for service in Service.objects.values('id', 'service_name').order_by('service_name'):
+        row = {'service': service['service_name']}
+        for window in WINDOWS:
+            elapsed = (window - 1) * 86400 + today_seconds
+            percent = 100 * (1 - totals.get((service['id'], window), 0) / elapsed)
+            row['d%s' % window] = round(max(percent, 0), 3)
+        availability.append(row)
+
+    cache.set('availability', availability)
+
+    return availability
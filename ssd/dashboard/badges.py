@@ -0,0 +1,142 @@
+#
+# Copyright 2015 - Tom Alessi
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Service status badges for SSD
+
+   A badge shows the current status of one service (OK, incident or
+   maintenance) as SVG or JSON.  The badges of all services are built from the
+   timeline lookup whenever the timeline is rebuilt (i.e. when an event
+   changes).  Each badge is cached under its own key, namespaced by the
+   versions of the events and services cache tags, so serving one takes two
+   small cache lookups and never loads the timeline.
+
+"""
+
+import hashlib
+import json
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.html import escape
+from ssd.dashboard.models import Service
+from ssd.dashboard import cachetags
+
+
+# How long clients and proxies may use a badge before checking for a new one (seconds)
+BADGE_MAX_AGE = getattr(settings, 'SSD_BADGE_MAX_AGE', 300)
+
+# The cache tags the badges are built from
+TAGS = ('events','services')
+
+# Label and color of each status
+STATUSES = {
+    'ok':('OK', '#4c1'),
+    'incident':('incident', '#e05d44'),
+    'maintenance':('maintenance', '#dfb317'),
+}
+
+SVG = '''<svg xmlns="http://www.w3.org/2000/svg" width="%(width)s" height="20">
+<rect width="%(left)s" height="20" fill="#555"/>
+<rect x="%(left)s" width="%(right)s" height="20" fill="%(color)s"/>
+<g fill="#fff" text-anchor="middle" font-family="DejaVu Sans,Verdana,Geneva,sans-serif" font-size="11">
+<text x="%(left_x)s" y="14">%(service)s</text>
+<text x="%(right_x)s" y="14">%(label)s</text>
+</g>
+</svg>
+'''
+
+
+def _svg(service, status):
+    """Draw a badge (roughly 7 pixels per character plus padding)"""
+
+    label, color = STATUSES[status]
+    left = len(service) * 7 + 10
+    right = len(label) * 7 + 10
+
+    return SVG % {
+        'width':left + right,
+        'left':left,
+        'right':right,
+        'color':color,
+        'left_x':left / 2,
+        'right_x':left + right / 2,
+        'service':escape(service),
+        'label':label,
+    }
+
+
+def _badge(timeline, service):
+    """Build the badge of a service: the status, SVG and JSON bodies and their
+    ETags"""
+
+    # Incidents over-ride everything for setting the status of the service
+    if service in timeline['lookup']['incident']:
+        status = 'incident'
+    elif service in timeline['lookup']['maintenance']:
+        status = 'maintenance'
+    else:
+        status = 'ok'
+
+    badge = {
+        'status':status,
+        'svg':_svg(service, status),
+        'json':json.dumps({'service':service, 'status':status}),
+    }
+    for format in ('svg','json'):
+        badge['%s_etag' % format] = '"%s"' % hashlib.md5(badge[format].encode('utf-8')).hexdigest()
+
+    return badge
+
+
+def _key(ns, service):
+    """The cache key of a badge (service names may not be valid in a key)"""
+
+    return 'badge_%s_%s' % (ns, hashlib.md5(service.encode('utf-8')).hexdigest())
+
+
+def namespace():
+    """The current badge namespace
+
+    Obtain it before reading the data a badge is built from, so a badge is
+    never cached under a newer namespace than its data.
+
+    """
+
+    return hashlib.md5(repr(cachetags.versions(TAGS))).hexdigest()
+
+
+def build(ns, timeline):
+    """Build and cache the badges of all services from a timeline"""
+
+    cache.set_many(dict((_key(ns, service), _badge(timeline, service)) for service in Service.objects.values_list('service_name', flat=True)))
+
+
+def get(ns, service):
+    """Obtain the cached badge of a service, or None if it is not cached"""
+
+    return cache.get(_key(ns, service))
+
+
+def build_one(ns, timeline, service):
+    """Build and cache the badge of one service (when it is not in the cache),
+    or return None if the service does not exist"""
+
+    if not Service.objects.filter(service_name=service).exists():
+        return None
+
+    badge = _badge(timeline, service)
+    cache.set(_key(ns, service), badge)
+
+    return badge
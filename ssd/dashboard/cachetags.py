@@ -0,0 +1,134 @@
+#
+# Copyright 2015 - Tom Alessi
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Tag based cache invalidation for SSD
+
+   Cached data is tagged with the kinds of data it is built from:
+     - events: incidents, maintenances and their updates
+     - services: services and service groups
+     - messages: the alert and information messages
+     - escalation: the escalation contacts and configuration
+     - config: the logo, admin link and incident report configuration
+
+   Writes invalidate the tags they change with invalidate(tag, ...) instead of
+   deleting individual keys.  Data is cached against its tags with the cached
+   decorator:
+
+     @cachetags.cached('escalation_contacts', ('escalation',))
+     def _contacts():
+         ...
+
+   which keys the cached value by the function arguments and the current
+   version of each tag, so invalidating a tag orphans everything built from it.
+
+   The cache keys that predate tags are listed in TAGS and are deleted along
+   with their tags.
+
+"""
+
+
+import hashlib
+import logging
+import uuid
+from functools import wraps
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from ssd.dashboard import router
+
+
+# Get an instance of the ssd logger
+logger = logging.getLogger(__name__)
+
+
+# The tags, with the (untagged) cache keys that depend on them
+TAGS = {
+    'events':('timeline','events_ns','event_count_ns','availability'),
+    'services':('service_groups','timeline','events_ns','groups_ns','availability'),
+    'messages':(),
+    'escalation':('enable_escalation',),
+    'config':('display_admin','display_logo','logo_url','enable_ireport','ireport_upload_path','ireport_file_size'),
+}
+
+
+def _key(tag):
+    """The cache key holding the current version of a tag"""
+
+    return 'tag_ns_%s' % tag
+
+
+def versions(tags):
+    """Obtain the current version of each tag (creating any that are missing)"""
+
+    keys = [_key(tag) for tag in tags]
+    current = cache.get_many(keys)
+
+    for key in keys:
+        if not key in current:
+            logger.debug('cache miss: %s', key)
+            # Use add in case someone else just created it, then use theirs
+            if not cache.add(key, uuid.uuid4().hex):
+                logger.debug('Could not add tag version %s.  The key was already added', key)
+            current[key] = cache.get(key)
+
+    return [current[key] for key in keys]
+
+
+def invalidate(*tags):
+    """Invalidate everything cached from the given tags"""
+
+    for tag in tags:
+        if not tag in TAGS:
+            raise ValueError('Unknown cache tag: %s' % tag)
+
+    keys = set()
+    for tag in tags:
+        keys.add(_key(tag))
+        keys.update(TAGS[tag])
+
+    logger.debug('Invalidating cache tags: %s', ', '.join(tags))
+    router.write_mark()
+    cache.delete_many(list(keys))
+
+
+def cached(name, tags, timeout=DEFAULT_TIMEOUT):
+    """Decorator that caches what a function returns until one of the tags is
+    invalidated (or the timeout passes)
+
+    The function arguments are part of the key, so they must have a stable
+    repr (e.g. strings, numbers and dates).
+
+    """
+
+    for tag in tags:
+        if not tag in TAGS:
+            raise ValueError('Unknown cache tag: %s' % tag)
+
+    def decorator(function):
+        @wraps(function)
+        def _cached(*args):
+            key = '%s_%s' % (name, hashlib.md5(repr((versions(tags), args))).hexdigest())
+
+            value = cache.get(key)
+            if value == None:
+                logger.debug('cache miss: %s', key)
+                value = function(*args)
+                cache.set(key, value, timeout)
+            else:
+                logger.debug('cache hit: %s', key)
+
+            return value
+        return _cached
+    return decorator
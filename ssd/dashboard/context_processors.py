@@ -18,11 +18,14 @@
 
    This context processor is responsible for setting the user desired
    display characteristics of the header (e.g. don't show the top nav)
+   and the static asset bundles to load
 
 """
 
 
+import json
 import logging
+import os
 import pytz
 from django.core.cache import cache
 from ssd.dashboard.models import Config_Admin, Config_Logo, Config_Escalation, Config_Ireport
@@ -33,6 +36,16 @@ from django.conf import settings
 logger = logging.getLogger(__name__)
 
 
+# Use the static asset bundles built by the install script (if they have been built)
+ASSET_BUNDLES = getattr(settings, 'SSD_ASSET_BUNDLES', True)
+
+# The bundle manifest written by src/install/assets.py
+ASSET_MANIFEST = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'html', 'dist', 'manifest.json')
+
+# The manifest only changes with an install/upgrade (and restart), so read it once
+_manifest = None
+
+
 def prefs(request):
     """Set the display characteristics"""
 
@@ -53,11 +66,11 @@ def prefs(request):
     # -- LOGO DISPLAY -- #
     display_logo = cache.get('display_logo')
     if display_logo == None:
-        logger.debug('cache miss: %s' % 'display_logo')
+        logger.debug('cache miss: %s', 'display_logo')
         display_logo = Config_Logo.objects.filter(id=Config_Logo.objects.values('id')[0]['id']).values('logo_enabled')[0]['logo_enabled']
         cache.set('display_logo', display_logo)
     else:
-        logger.debug('cache hit: %s' % 'display_logo')
+        logger.debug('cache hit: %s', 'display_logo')
     if display_logo == 1:
         # Yes, display it, what's the url
         logo_url = cache.get('logo_url')
@@ -73,11 +86,11 @@ def prefs(request):
     # -- INCIDENT REPORT -- #
     enable_ireport = cache.get('enable_ireport')
     if enable_ireport == None:
-        logger.debug('cache miss: %s' % 'enable_ireport')
+        logger.debug('cache miss: %s', 'enable_ireport')
         enable_ireport = Config_Ireport.objects.filter(id=Config_Ireport.objects.values('id')[0]['id']).values('enabled')[0]['enabled']
         cache.set('enable_ireport', enable_ireport)
     else:
-        logger.debug('cache hit: %s' % 'enable_ireport')
+        logger.debug('cache hit: %s', 'enable_ireport')
     if enable_ireport == 1:
         values['ireport'] = True
     else:
@@ -88,11 +101,11 @@ def prefs(request):
     # -- ESCALATION PATH --#
     enable_escalation = cache.get('enable_escalation')
     if enable_escalation == None:
-        logger.debug('cache miss: %s' % 'enable_escalation')
+        logger.debug('cache miss: %s', 'enable_escalation')
         enable_escalation = Config_Escalation.objects.filter(id=Config_Escalation.objects.values('id')[0]['id']).values('enabled')[0]['enabled']
         cache.set('enable_escalation', enable_escalation)
     else:
-        logger.debug('cache hit: %s' % 'enable_escalation')
+        logger.debug('cache hit: %s', 'enable_escalation')
     if enable_escalation == 1:
         values['escalation'] = True
     else:
@@ -103,11 +116,11 @@ def prefs(request):
     # -- ADMIN LINK --#
     display_admin = cache.get('display_admin')
     if display_admin == None:
-        logger.debug('cache miss: %s' % 'display_admin')
+        logger.debug('cache miss: %s', 'display_admin')
         display_admin = Config_Admin.objects.filter(id=Config_Admin.objects.values('id')[0]['id']).values('link_enabled')[0]['link_enabled']
         setit = cache.set('display_admin', display_admin)
     else:
-        logger.debug('cache hit: %s' % 'display_admin')
+        logger.debug('cache hit: %s', 'display_admin')
     if display_admin == 1:
         values['admin_link'] = True
     else:
@@ -126,3 +139,25 @@ def timezones(request):
     timezones = pytz.all_timezones
 
     return {'timezones': timezones}
+
+
+def assets(request):
+    """Set the static asset bundles to load
+
+    Returns the bundle files by name (see src/install/assets.py), or False if
+    the bundles are not in use, in which case the templates load the individual
+    files.
+
+    """
+
+    global _manifest
+
+    if _manifest == None:
+        _manifest = False
+        if ASSET_BUNDLES:
+            try:
+                _manifest = json.load(open(ASSET_MANIFEST))
+            except (IOError, ValueError) as e:
+                logger.error('Static asset bundles not available, using the individual files: %s', e)
+
+    return {'assets': _manifest}
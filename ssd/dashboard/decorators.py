@@ -22,6 +22,8 @@ from django.utils.translation import ugettext as _
 from django.contrib.admin.forms import AdminAuthenticationForm
 from django.contrib.auth.views import login
 from django.contrib.auth import REDIRECT_FIELD_NAME
+from django.http import HttpResponse
+from ssd.dashboard import ratelimit
 
 
 def staff_member_required_ssd(view_func):
@@ -49,4 +51,30 @@ def staff_member_required_ssd(view_func):
             },
         }
         return login(request, **defaults)
-    return _checklogin
\ No newline at end of file
+    return _checklogin
+
+def rate_limited_ssd(name, rate, global_rate):
+    """
+    Decorator for public views that limits how often they may be POSTed to, per
+    client IP and for all clients (see ssd.dashboard.ratelimit).
+
+    - Rejected requests get a plain 429 response, so a flood costs only cache lookups
+      (no database queries, templates or email).
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def _ratelimit(request, *args, **kwargs):
+            if request.method == 'POST':
+                # Check the client first so one client cannot use up the global allowance
+                retry = ratelimit.consume('ratelimit_%s_%s' % (name, ratelimit.client_ip(request)), *rate)
+                if not retry:
+                    retry = ratelimit.consume('ratelimit_%s' % name, *global_rate)
+
+                if retry:
+                    response = HttpResponse('Too many requests, please try again in %s seconds.' % retry, content_type='text/plain', status=429)
+                    response['Retry-After'] = retry
+                    return response
+
+            return view_func(request, *args, **kwargs)
+        return _ratelimit
+    return decorator
@@ -0,0 +1,146 @@
+#
+# Copyright 2015 - Tom Alessi
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Escalation contact ordering for SSD
+
+   Contacts are numbered 1..n by their order.  Every change to the order runs
+   in a single transaction that first locks the escalation configuration row
+   and the contacts (so concurrent changes wait for each other instead of
+   interleaving, even when there are no contacts yet) and then writes the new
+   order with one UPDATE, however many contacts move.
+
+"""
+
+
+import logging
+from django.db import connections, router, transaction
+from django.db.models import F, Max
+from ssd.dashboard.models import Escalation, Config_Escalation
+
+
+# Get an instance of the ssd logger
+logger = logging.getLogger(__name__)
+
+
+def _lock(db):
+    """Lock all of the contacts and obtain their ids in order"""
+
+    # The configuration row always exists, so this serializes the changes even
+    # when there are no contacts to lock
+    list(Config_Escalation.objects.using(db).select_for_update().values_list('id', flat=True))
+
+    return list(Escalation.objects.using(db).select_for_update().order_by('order','id').values_list('id', flat=True))
+
+
+def _write(db, ids):
+    """Number the contacts 1..n in the order of the ids, in one statement
+
+    Only the contacts whose order changes are written.
+
+    """
+
+    current = dict(Escalation.objects.using(db).filter(id__in=ids).values_list('id','order'))
+    changed = [(id, order) for order,id in enumerate(ids, 1) if current.get(id) != order]
+    if not changed:
+        return
+
+    connection = connections[db]
+    qn = connection.ops.quote_name
+    sql = 'UPDATE %s SET %s = CASE %s %s END WHERE %s IN (%s)' % (
+        qn(Escalation._meta.db_table),
+        qn('order'),
+        qn('id'),
+        ' '.join(['WHEN %s THEN %s'] * len(changed)),
+        qn('id'),
+        ','.join(['%s'] * len(changed))
+    )
+    params = [value for pair in changed for value in pair] + [id for id,order in changed]
+
+    connection.cursor().execute(sql, params)
+    logger.debug('Reordered %s escalation contacts', len(changed))
+
+
+def reorder(ids):
+    """Set the order of all contacts from a list of their ids
+
+    Raises ValueError if the ids are not exactly the current contacts (e.g.
+    one was added or removed since the list was shown).
+
+    """
+
+    db = router.db_for_write(Escalation)
+
+    with transaction.atomic(using=db):
+        if sorted(_lock(db)) != sorted(ids):
+            raise ValueError('The escalation contacts have changed, please reload the list')
+        _write(db, ids)
+
+
+def move(id, offset):
+    """Move a contact up (-1) or down (+1) the order
+
+    Returns False if the contact does not exist.
+
+    """
+
+    db = router.db_for_write(Escalation)
+
+    with transaction.atomic(using=db):
+        ids = _lock(db)
+        if not id in ids:
+            return False
+
+        position = ids.index(id)
+        other = position + offset
+        if 0 <= other < len(ids):
+            ids[position], ids[other] = ids[other], ids[position]
+
+        # Also repairs any gaps or duplicates in the order
+        _write(db, ids)
+
+    return True
+
+
+def append(**contact):
+    """Add a contact at the end of the order"""
+
+    db = router.db_for_write(Escalation)
+
+    with transaction.atomic(using=db):
+        _lock(db)
+        order = Escalation.objects.using(db).aggregate(Max('order'))['order__max'] or 0
+        Escalation.objects.using(db).create(order=order + 1, **contact)
+
+
+def remove(id):
+    """Delete a contact and close the gap it leaves in the order
+
+    Returns False if the contact does not exist.
+
+    """
+
+    db = router.db_for_write(Escalation)
+
+    with transaction.atomic(using=db):
+        _lock(db)
+        order = Escalation.objects.using(db).filter(id=id).values_list('order', flat=True)
+        if not order:
+            return False
+
+        Escalation.objects.using(db).filter(id=id).delete()
+        Escalation.objects.using(db).filter(order__gt=order[0]).update(order=F('order') - 1)
+
+    return True
@@ -0,0 +1,248 @@
+#
+# Copyright 2015 - Tom Alessi
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Atom/RSS event feeds for SSD
+
+   There is one feed of all events plus one feed per service, each holding the
+   SSD_FEED_SIZE most recently changed incidents and maintenances (except
+   maintenances that are still being planned, which are not public).  A feed's
+   entries are kept in the cache and updated in place when an event (or one of
+   its updates) is written, see events_changed.  The feed body is rendered
+   once per change and format, and each change gets a new version which is
+   used as the ETag.
+
+"""
+
+import logging
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import feedgenerator
+from django.utils import timezone as jtz
+from django.utils.text import Truncator
+from ssd.dashboard.models import Event, Event_Service, Event_Update, Service
+from ssd.dashboard import router
+
+
+# Get an instance of the ssd logger
+logger = logging.getLogger(__name__)
+
+
+# Number of events in a feed
+FEED_SIZE = getattr(settings, 'SSD_FEED_SIZE', 50)
+
+# Supported feed formats
+FORMATS = {'atom':feedgenerator.Atom1Feed, 'rss':feedgenerator.Rss201rev2Feed}
+
+
+def _public():
+    """The events that may be published"""
+
+    return Event.objects.exclude(status__status='planning')
+
+
+def _entries(ids):
+    """Build the feed entries of the given events in three queries
+
+    Returns a dictionary of entries by event id (events that do not exist or
+    are not public are left out).  An entry was last updated when its event
+    last changed or an update was added, whichever is later.
+
+    """
+
+    entries = {}
+    for event in _public().filter(id__in=ids).values('id','type__type','status__status','description','start','end','date'):
+        entries[event['id']] = {
+            'id':event['id'],
+            'type':event['type__type'],
+            'status':event['status__status'],
+            'description':event['description'],
+            'start':event['start'],
+            'end':event['end'],
+            'updated':event['date'],
+            'services':[],
+            'service_names':[],
+            'updates':[]
+        }
+
+    for service in Event_Service.objects.filter(event_id__in=entries.keys()).values('event_id','service_id','service__service_name').order_by('service__service_name'):
+        entries[service['event_id']]['services'].append(service['service_id'])
+        entries[service['event_id']]['service_names'].append(service['service__service_name'])
+
+    for update in Event_Update.objects.filter(event_id__in=entries.keys()).values('event_id','date','update').order_by('id'):
+        entries[update['event_id']]['updates'].append((update['date'],update['update']))
+        if update['date'] > entries[update['event_id']]['updated']:
+            entries[update['event_id']]['updated'] = update['date']
+
+    return entries
+
+
+def _order(entries):
+    """The entries of a feed: those of the most recent events, by last change"""
+
+    recent = sorted(entries, key=lambda entry: entry['id'], reverse=True)[:FEED_SIZE]
+    return sorted(recent, key=lambda entry: (entry['updated'], entry['id']), reverse=True)
+
+
+def _build(feed):
+    """Build a feed from the database (when it is not in the cache)
+
+    Returns None for the feed of a service that does not exist.
+
+    """
+
+    events = _public()
+    if feed != 'all':
+        service_id = int(feed.split('_')[1])
+        if not Service.objects.filter(id=service_id).exists():
+            return None
+        events = events.filter(event_service__service_id=service_id)
+
+    ids = list(events.order_by('-id').values_list('id', flat=True)[:FEED_SIZE])
+    entries = _order(_entries(ids).values())
+
+    return {'version':uuid.uuid4().hex, 'updated':entries[0]['updated'] if entries else jtz.now(), 'entries':entries}
+
+
+def get(feed):
+    """Obtain a feed ('all' or 'service_<id>'), or None if the service does
+    not exist"""
+
+    key = 'feed_%s' % feed
+    data = cache.get(key)
+    if data == None:
+        logger.debug('cache miss: %s', key)
+        data = _build(feed)
+        if data == None:
+            return None
+        cache.set(key, data)
+    else:
+        logger.debug('cache hit: %s', key)
+
+    return data
+
+
+def events_changed(event_ids):
+    """Update the cached feeds after the given events (or their updates) were
+    created, modified or deleted
+
+    The time of the change is recorded on the events (Event.date, which is not
+    set when events are changed with update()).  Each event's entry is then
+    rebuilt and put where a full rebuild of the feeds it now belongs to would
+    put it, and removed from any others.  Feeds that are not in the cache are
+    left alone, they will be built when they are next requested.
+
+    """
+
+    event_ids = [int(id) for id in event_ids]
+    if not event_ids:
+        return
+
+    now = jtz.now()
+    Event.objects.filter(id__in=event_ids).update(date=now)
+    entries = _entries(event_ids)
+
+    keys = ['feed_all'] + ['feed_service_%s' % id for id in Service.objects.values_list('id', flat=True)]
+    feeds = cache.get_many(keys)
+
+    changed = {}
+    stale = []
+    for key,data in feeds.items():
+        feed_entries = [entry for entry in data['entries'] if not entry['id'] in event_ids]
+        removed = len(feed_entries) != len(data['entries'])
+
+        service = None if key == 'feed_all' else int(key.split('_')[2])
+        added = [entry for entry in entries.values() if service == None or service in entry['services']]
+
+        if not removed and not added:
+            continue
+
+        # A full feed that lost an event would be refilled with an older one
+        # that is not cached, so rebuild it when it is next requested
+        if len(data['entries']) >= FEED_SIZE and len(feed_entries) + len(added) < FEED_SIZE:
+            stale.append(key)
+            continue
+
+        changed[key] = {'version':uuid.uuid4().hex, 'updated':now, 'entries':_order(added + feed_entries)}
+
+    if changed:
+        cache.set_many(changed)
+    if stale:
+        cache.delete_many(stale)
+    logger.debug('Updated %s feeds (%s removed) for events: %s', len(changed), len(stale), event_ids)
+
+
+def invalidate():
+    """Remove every cached feed (e.g. after a bulk change), they will be built
+    when they are next requested"""
+
+    router.write_mark()
+    cache.delete_many(['feed_all'] + ['feed_service_%s' % id for id in Service.objects.values_list('id', flat=True)])
+
+
+def render(feed, format, base_url):
+    """Render a feed, returning (version, last update, body), or None if the
+    service does not exist
+
+    The body is cached per feed version, format and site URL.
+
+    """
+
+    data = get(feed)
+    if data == None:
+        return None
+
+    key = 'feed_body_%s_%s_%s_%s' % (feed, format, data['version'], uuid.uuid5(uuid.NAMESPACE_URL, base_url.encode('utf-8')).hex)
+    body = cache.get(key)
+    if body == None:
+        logger.debug('cache miss: %s', key)
+
+        if feed == 'all':
+            title = 'System Status Dashboard'
+        else:
+            service_name = Service.objects.filter(id=int(feed.split('_')[1])).values_list('service_name', flat=True)
+            title = 'System Status Dashboard: %s' % (service_name[0] if service_name else 'unknown service')
+
+        generator = FORMATS[format](
+            title=title,
+            link=base_url,
+            description='Incidents and scheduled maintenances',
+            feed_url='%sfeeds/%s' % (base_url, format),
+        )
+
+        for entry in data['entries']:
+            link = '%s%s_detail?id=%s' % (base_url, entry['type'][0], entry['id'])
+            description = [entry['description']]
+            if entry['service_names']:
+                description.append('Services: %s' % ', '.join(entry['service_names']))
+            for date,update in entry['updates']:
+                description.append('Update (%s): %s' % (date.strftime('%Y-%m-%d %H:%M %Z'), update))
+
+            generator.add_item(
+                title='%s (%s): %s' % (entry['type'].capitalize(), entry['status'], Truncator(entry['description']).chars(100)),
+                link=link,
+                description='\n\n'.join(description),
+                unique_id=link,
+                pubdate=entry['updated'],
+                categories=entry['service_names'],
+            )
+
+        body = generator.writeString('utf-8')
+        cache.set(key, body)
+    else:
+        logger.debug('cache hit: %s', key)
+
+    return data['version'], data['updated'], body
@@ -29,21 +29,10 @@ from django import forms
 from django.conf import settings
 from ssd.dashboard.models import Config_Email
 from ssd.dashboard.models import Config_Ireport
+from ssd.dashboard import profiler, storage
 
 
 
-### VALIDATORS ###
-
-def file_size(value):
-    """Ensure file size is below the maximum allowed"""
-
-    # Obtain the max file size
-    file_size = Config_Ireport.objects.filter(id=Config_Ireport.objects.values('id')[0]['id']).values('file_size')[0]['file_size']
-
-    if value.size > file_size:
-        raise forms.ValidationError('File too large (%s bytes) - please reduce the size of the upload to below %s bytes.' % (value.size,file_size))
-
-
 ### FIELDS ###
 
 
@@ -60,6 +49,30 @@ class MultipleServiceField(forms.Field):
             raise forms.ValidationError('Select at least one item.')
 
 
+class IdListField(forms.Field):
+    """Comma separated list of ids
+
+       Requirements:
+          - Must not be empty
+          - Each id must be a number and may only be listed once
+
+    """
+
+    def to_python(self, value):
+        if value is None or value == '':
+            return []
+        try:
+            return [int(id) for id in value.split(',')]
+        except ValueError:
+            raise forms.ValidationError('Enter a comma separated list of ids.')
+
+    def validate(self, value):
+        if not value:
+            raise forms.ValidationError('Enter at least one id.')
+        if len(set(value)) != len(value):
+            raise forms.ValidationError('Each id may only be listed once.')
+
+
 ### FORMS ###
 
 
@@ -234,8 +247,8 @@ class IreportConfigForm(forms.Form):
         upload_enabled = cleaned_data.get('upload_enabled')
         file_size = cleaned_data.get('file_size')
 
-        # Cannot enable uploads w/o an upload path
-        if upload_enabled and not upload_path:
+        # Cannot enable uploads w/o an upload path (unless uploads go to an object store)
+        if upload_enabled and not upload_path and storage.local():
             self._errors["upload_path"] = self.error_class(['Please enter a local upload path.'])
             self._errors["upload_enabled"] = self.error_class(['Cannot enable file uploads without defining an upload path.'])
 
@@ -247,7 +260,7 @@ class IreportConfigForm(forms.Form):
             self._errors["file_size"] = self.error_class(['Please enter a positive integer.'])
 
         # If the upload path is defined and does not exist or is not writable, that's an error
-        if upload_path:
+        if upload_path and storage.local():
             # Writable?
             if not os.access(upload_path, os.W_OK):
                 self._errors["upload_path"] = self.error_class(['This location is not writable by the Apache user.'])
@@ -281,6 +294,62 @@ class DetailForm(forms.Form):
     id = forms.IntegerField(required=True)
 
 
+class FeedForm(forms.Form):
+    """Form for selecting an event feed (all events, or a single service)"""
+
+    service = forms.IntegerField(required=False)
+
+
+class BadgeForm(forms.Form):
+    """Form for selecting the service of a status badge"""
+
+    service = forms.CharField(required=True, max_length=50)
+
+
+class ImportEventsForm(forms.Form):
+    """Form for importing historical events from a file"""
+
+    file = forms.FileField(required=True)
+    format = forms.ChoiceField(required=True, choices=(('csv','CSV'),('json','JSON (newline delimited)')))
+
+
+class ArmProfileForm(forms.Form):
+    """Form for arming request profiling"""
+
+    path = forms.RegexField(required=True, max_length=200, regex=r'^/\S*$', error_messages={'invalid':'Enter a URL path starting with /'})
+    rate = forms.FloatField(required=True, min_value=0.001, max_value=1)
+    count = forms.IntegerField(required=True, min_value=1, max_value=100)
+    minutes = forms.IntegerField(required=True, min_value=1, max_value=1440)
+
+
+class ProfileForm(forms.Form):
+    """Form for selecting a captured profile"""
+
+    name = forms.RegexField(required=True, regex=profiler.NAME)
+
+
+class RowsForm(forms.Form):
+    """Form for obtaining a page of dashboard rows"""
+
+    ref = forms.CharField(required=False, max_length=10)
+    group = forms.IntegerField(required=False)
+    filter = forms.CharField(required=False, max_length=50)
+    page = forms.IntegerField(required=False, min_value=1)
+    layout = forms.ChoiceField(required=False, choices=(('large','large'),('small','small')))
+
+
+class AddServiceGroupForm(forms.Form):
+    """Form for adding a service group"""
+
+    group = forms.CharField(required=True, max_length=50)
+
+
+class ServiceGroupForm(forms.Form):
+    """Form for setting the services in a service group"""
+
+    id = forms.IntegerField(required=True)
+
+
 class DeleteEventForm(forms.Form):
     """Form for deleting an existing event (incident or maintenance)"""
 
@@ -313,8 +382,8 @@ class ReportIncidentForm(forms.Form):
     email = forms.EmailField(required=True, max_length=50)
     detail = forms.CharField(required=True, max_length=160)
     extra = forms.CharField(required=False, max_length=1000)
-    screenshot1 = forms.ImageField(required=False, validators=[file_size])
-    screenshot2 = forms.ImageField(required=False, validators=[file_size])
+    screenshot1 = forms.ImageField(required=False)
+    screenshot2 = forms.ImageField(required=False)
 
 
 class AddRecipientForm(forms.Form):
@@ -369,6 +438,12 @@ class RemoveServiceForm(forms.Form):
     id = forms.IntegerField(required=True)
 
 
+class ReorderContactsForm(forms.Form):
+    """Form for setting the order of all contacts"""
+
+    order = IdListField()
+
+
 class RemoveContactForm(forms.Form):
     """Form for removing contacts"""
 
@@ -394,6 +469,26 @@ class GSearchForm(forms.Form):
     page = forms.IntegerField(required=False)
 
 
+class HistogramForm(forms.Form):
+    """Form for obtaining event counts over a date range"""
+
+    start = forms.DateField(required=True, input_formats=['%Y-%m-%d'])
+    end = forms.DateField(required=True, input_formats=['%Y-%m-%d'])
+    granularity = forms.ChoiceField(required=False, choices=(('day','day'),('week','week'),('month','month')))
+
+    # Override the form clean method - the range has to be in order
+    def clean(self):
+        cleaned_data = super(HistogramForm, self).clean()
+        start = cleaned_data.get('start')
+        end = cleaned_data.get('end')
+
+        if start and end and end < start:
+            self._errors["end"] = self.error_class(['The end date cannot be before the start date'])
+
+        # Return the full collection of cleaned data
+        return cleaned_data
+
+
 class AddIncidentForm(forms.Form):
     """Form for adding a new incident (by an administrator)"""
 
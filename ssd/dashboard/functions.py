@@ -20,8 +20,14 @@
 """
 
 
-from django.core.cache import cache
+import datetime
+import pytz
+import re
 import uuid
+from django.core.cache import cache
+from django.db.models import Q
+from ssd.dashboard.models import Event, Event_Service, Event_Update, Archive_Event
+from ssd.dashboard import archive, badges, groups, router
 
 
 def namespace_get(logger, key):
@@ -29,7 +35,7 @@ def namespace_get(logger, key):
 
 	"""
 
-	logger.debug('Checking namespace for %s' % key)
+	logger.debug('Checking namespace for %s', key)
 
 	# Check the cache for the key in question
 	# e.g. 'events_ns'
@@ -38,25 +44,333 @@ def namespace_get(logger, key):
 	# If the namespace does not exist, set it with a unique number
 	# created with UUID
 	if ns == None:
-		logger.debug('cache miss: %s' % key)
+		logger.debug('cache miss: %s', key)
 
 		# Create the unique namespace
 		ns = uuid.uuid4().hex
-		logger.debug('Unique namespace created for %s: %s' % (key, ns))
+		logger.debug('Unique namespace created for %s: %s', key, ns)
 
 		# We'll use add here instead of set just in case someone beat us
 		# to adding it
 		ns_add = cache.add(key, ns)
 		if not ns_add:
-			logger.debug('Could not add unique namespace for %s: %s.  The key was already added' % (key, ns))
+			logger.debug('Could not add unique namespace for %s: %s.  The key was already added', key, ns)
 			# Ok then get it from memcached
 			ns = cache.get(key)
 		else:
-			logger.debug('Unique namespace successfully added for %s: %s.' % (key, ns))
+			logger.debug('Unique namespace successfully added for %s: %s.', key, ns)
 	else:
-		logger.debug('cache hit: %s' % key)
+		logger.debug('cache hit: %s', key)
 
-	logger.debug('Namespace for %s: %s' % (key, ns))
+	logger.debug('Namespace for %s: %s', key, ns)
 	return ns
 
 
+def events_day_get(logger, start, end):
+	"""Obtain all dashboard events starting between start and end (inclusive)
+
+	Events are cached in per UTC day buckets (events_day_[ns]_[YYYYMMDD]) so
+	that any window, in any timezone, is assembled from the same shared pieces.
+	Only the days that are missing from the cache are queried, with a single
+	query covering the missing range.
+
+	"""
+
+	# Obtain the memcached namespace for the key events_day_
+	events_ns = namespace_get(logger, 'events_ns')
+
+	# Determine which UTC days overlap the requested window
+	first_day = start.astimezone(pytz.utc).date()
+	last_day = end.astimezone(pytz.utc).date()
+	days = []
+	day = first_day
+	while day <= last_day:
+		days.append(day)
+		day += datetime.timedelta(days=1)
+
+	keys = {}
+	for day in days:
+		keys['events_day_%s_%s' % (events_ns, day.strftime('%Y%m%d'))] = day
+
+	# Grab whatever buckets we already have
+	buckets = cache.get_many(keys.keys())
+	logger.debug('events_day cache hits: %s of %s', len(buckets), len(keys))
+
+	missing = [day for key,day in keys.items() if not key in buckets]
+	if missing:
+		# Query the full range of missing days in one shot and split it into buckets
+		q_start = pytz.utc.localize(datetime.datetime.combine(min(missing), datetime.time()))
+		q_end = pytz.utc.localize(datetime.datetime.combine(max(missing) + datetime.timedelta(days=1), datetime.time()))
+		logger.debug('events_day cache miss: %s - %s', q_start, q_end)
+
+		# The only thing we don't want shown here are maintenances that are in the planning stage
+		# Only look in the archive if the range reaches back far enough
+		models = [Event]
+		archive_horizon = archive.horizon()
+		if archive_horizon and q_start <= archive_horizon:
+			models.append(Archive_Event)
+
+		events = []
+		for model in models:
+			events.extend(model.objects.filter(start__gte=q_start,start__lt=q_end).exclude(status__status='planning').values(
+			                                                                                                    'id',
+			                                                                                                    'type__type',
+			                                                                                                    'description',
+			                                                                                                    'start',
+			                                                                                                    'end',
+			                                                                                                    'event_service__service__service_name',
+			                                                                                                    'status__status'
+			                                                                                                    ))
+
+		new_buckets = {}
+		for day in missing:
+			new_buckets['events_day_%s_%s' % (events_ns, day.strftime('%Y%m%d'))] = []
+		for event in events:
+			key = 'events_day_%s_%s' % (events_ns, event['start'].astimezone(pytz.utc).strftime('%Y%m%d'))
+			if key in new_buckets:
+				new_buckets[key].append(event)
+
+		cache.set_many(new_buckets)
+		buckets.update(new_buckets)
+
+	# Assemble the window from the buckets, trimming the edges to the requested range
+	events = []
+	for key in keys:
+		for event in buckets[key]:
+			if start <= event['start'] <= end:
+				events.append(event)
+	events.sort(key=lambda event: event['id'])
+
+	return events
+
+
+def event_lock(logger, event_id):
+	"""Lock an event until the end of the current transaction
+
+	Concurrent updates to the same event wait for each other instead of
+	interleaving their reads and writes of the services and email recipient.
+	Returns False if the event does not exist.
+
+	"""
+
+	logger.debug('Locking event %s', event_id)
+
+	return bool(list(Event.objects.select_for_update().filter(id=event_id).values_list('id', flat=True)))
+
+
+def event_services_set(logger, event_id, service_ids):
+	"""Set the services impacted by an event
+
+	The requested service ids are diffed against what is already stored so that
+	only the changes are written: one bulk delete for removed services and one
+	bulk insert for added services.
+
+	"""
+
+	# Should be number only -- can't figure out how to validate
+	# multiple checkboxes in the form
+	wanted = set()
+	for service_id in service_ids:
+		if re.match(r'^\d+$', str(service_id)):
+			wanted.add(int(service_id))
+
+	current = set(Event_Service.objects.filter(event_id=event_id).values_list('service_id', flat=True))
+
+	removed = current - wanted
+	added = wanted - current
+	logger.debug('Event %s services added: %s, removed: %s', event_id, list(added), list(removed))
+
+	if removed:
+		Event_Service.objects.filter(event_id=event_id, service_id__in=removed).delete()
+
+	if added:
+		Event_Service.objects.bulk_create([Event_Service(event_id=event_id,service_id=service_id) for service_id in added])
+
+
+def event_detail_get(logger, id, type):
+	"""Obtain the detail of an incident or maintenance (live or archived)
+
+	Returns a dictionary with the details, services and updates of the event
+	and whether it has been archived, or None if there is no such event of that
+	type.  The detail is cached under a per event namespace, so it is only
+	rebuilt after a write to that event (see event_detail_invalidate).
+
+	"""
+
+	ns = namespace_get(logger, 'event_detail_ns_%s' % id)
+	key = 'event_detail_%s_%s_%s' % (type, id, ns)
+
+	detail = cache.get(key)
+	if detail == None:
+		logger.debug('cache miss: %s', key)
+
+		fields = ['status__status','start','end','description','user_id__first_name','user_id__last_name']
+		if type == 'maintenance':
+			fields.extend(['event_impact__impact','event_coordinator__coordinator','event_email__email__email'])
+
+		# If it's not in the live tables, it may have been archived
+		for model in (Event, Archive_Event):
+			details = list(model.objects.filter(id=id,type__type=type).values(*fields))
+			if details:
+				break
+		if not details:
+			return None
+
+		# Which services were impacted
+		services = list(model.objects.filter(id=id).values('event_service__service__service_name'))
+
+		# Obain any updates
+		updates = list(model.objects.filter(id=id).values(
+													'event_update__id',
+													'event_update__date',
+													'event_update__update',
+													'event_update__user__first_name',
+													'event_update__user__last_name'
+													).order_by('event_update__id'))
+		# If there are no updates, set to None
+		if len(updates) == 1 and updates[0]['event_update__date'] == None:
+			updates = None
+
+		detail = {
+			'details':details,
+			'services':services,
+			'updates':updates,
+			'archived':model == Archive_Event
+		}
+		cache.set(key, detail)
+	else:
+		logger.debug('cache hit: %s', key)
+
+	return detail
+
+
+def event_detail_invalidate(event_ids):
+	"""Invalidate the cached detail of the given events"""
+
+	router.write_mark()
+	cache.delete_many(['event_detail_ns_%s' % id for id in event_ids])
+
+
+def timeline_get(logger):
+	"""Obtain the active (open incident / started maintenance) event information
+
+	This information is used to build the timelines and also as lookups to set
+	the service status in the main dashboard.  The status of each service group
+	is kept under 'groups' (see groups.status), and the service status badges
+	are precomputed from it into their own cache keys (see badges.build).
+
+	"""
+
+	# We'll use the following data structure
+	# timeline = {
+	#              'events': {
+	#                            incident':{
+	#                                        '1': {
+	#                                               'start':'2013-01-01 10:28:25 PDT',
+	#                                               'description':'We are having an issue with the exchange server',
+	#                                               'services':['service1','service2'],
+	#                                               'updates': [
+	#                                                            ['2013-01-01 10:29:25 PDT','We are having an issue'],
+	#                                                            ['2013-01-01 10:30:25 PDT','Resolved now']
+	#                                                           ]
+	#                                              }
+	#                                       },
+	#
+	#                            maintenance':{
+	#                                           '5': {
+	#                                                  'start':'2013-01-01 10:28:25 PDT',
+	#                                                  'description':'We are having an issue with the exchange server',
+	#                                                  'services':['service1','service2'],
+	#                                                  'updates': [
+	#                                                               ['2013-01-01 10:29:25 PDT','We are having an issue'],
+	#                                                               ['2013-01-01 10:30:25 PDT','Resolved now']
+	#                                                             ]
+	#                                                 }
+	#                                         }
+	#
+	#
+	#                        },
+	#               'lookup': {
+	#                           'incident': {
+	#                                           'service1': '',
+	#                                           'service2': ''
+	#                                       },
+	#                           'maintenance': {
+	#                                                'service3': '',
+	#                                                'service4': ''
+	#                                            }
+	#                         }
+	#            }
+	#
+	timeline = cache.get('timeline')
+	if timeline == None:
+		logger.debug('cache miss: %s', 'timeline')
+
+		# Before reading the events, so the badges are not newer than their namespace
+		badges_ns = badges.namespace()
+
+		# Create the timeline structure
+		timeline = {
+					'events': {},
+					'lookup': {
+								'incident': {},
+								'maintenance': {}
+					}
+		}
+
+
+		# Get the events
+		timeline_events = Event.objects.filter(Q(status__status='open') | Q(status__status='started')).values('id','start','type__type','description').order_by('start')
+
+		# Build the timeline data structure
+		for event in timeline_events:
+
+			# Add the type to the timeline if not there
+			if not event['type__type'] in timeline['events']:
+				timeline['events'][event['type__type']] = {}
+
+			# Add the event id to the timeline if not there
+			if not event['id'] in timeline['events'][event['type__type']]:
+				timeline['events'][event['type__type']][event['id']] = {}
+
+			# Add the event data to the timeline
+			timeline['events'][event['type__type']][event['id']]['start'] = event['start']
+			timeline['events'][event['type__type']][event['id']]['description'] = event['description']
+
+			# Find out which services this event impacts and add to the timeline
+			# We need to cast this to a list so that it's evaluated and caching works properly
+			services_impacted = list(Event.objects.filter(id=event['id']).values('event_service__service__service_name'))
+
+			# Add the services to the timeline
+			timeline['events'][event['type__type']][event['id']]['services'] = services_impacted
+
+			# Check each service impacted and add to the events_lookup table
+			for service in services_impacted:
+
+				if not service['event_service__service__service_name'] in timeline['lookup'][event['type__type']]:
+					timeline['lookup'][event['type__type']][service['event_service__service__service_name']] = ''
+
+		# Now get the updates
+		timeline_updates = Event_Update.objects.filter(Q(event_id__status__status='open') | Q(event_id__status__status='started')).values('event_id','event_id__type__type','date','update').order_by('id')
+
+		for update in timeline_updates:
+
+			# Add the updates array to the timeline if not there
+			if not 'updates' in timeline['events'][update['event_id__type__type']][update['event_id']]:
+				timeline['events'][update['event_id__type__type']][update['event_id']]['updates'] = []
+
+			# Add the update to the timeline
+			timeline['events'][update['event_id__type__type']][update['event_id']]['updates'].append([update['date'],update['update']])
+
+		# The current status of each service group
+		timeline['groups'] = groups.status(timeline)
+
+		# Precompute the service status badges now that the statuses have changed
+		badges.build(badges_ns, timeline)
+
+		# Put in cache
+		cache.set('timeline', timeline)
+	else:
+		logger.debug('cache hit: %s', 'timeline')
+
+	return timeline
@@ -0,0 +1,211 @@
+#
+# Copyright 2015 - Tom Alessi
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Service groups for SSD
+
+   Grouped services are shown on the dashboard as one collapsed row per
+   group, whose members are only built when the group is expanded.  Each
+   group row shows the worst status of its members:
+     - now, precomputed with the timeline (see status)
+     - for each day, from per group rollups that are cached per UTC day
+       (group_day_[events ns]_[groups ns]_[YYYYMMDD]) next to the dashboard
+       event buckets, so they are dropped along with them whenever an event
+       is written (see days_get)
+
+   Membership changes must invalidate the 'services' cache tag (see
+   cachetags).
+
+"""
+
+
+import datetime
+import logging
+import pytz
+from django.core.cache import cache
+from ssd.dashboard.models import Service, Service_Group, Service_Group_Member
+
+
+# Get an instance of the ssd logger
+logger = logging.getLogger(__name__)
+
+
+# How bad a day is for a group, worst last
+GREEN = 0
+MAINTENANCE = 1
+INCIDENT_RESOLVED = 2
+INCIDENT = 3
+
+
+def members():
+    """Obtain the groups (with the names of their services) and the services
+    that are not in any group
+
+    Returns {'groups':[{'id', 'group_name', 'services':[...]}], 'ungrouped':[...]},
+    with groups and services ordered by name.
+
+    """
+
+    service_groups = cache.get('service_groups')
+    if service_groups == None:
+        logger.debug('cache miss: %s', 'service_groups')
+
+        groups = []
+        by_id = {}
+        for group in Service_Group.objects.values('id','group_name').order_by('group_name'):
+            group['services'] = []
+            groups.append(group)
+            by_id[group['id']] = group
+
+        grouped = set()
+        for member in Service_Group_Member.objects.values('group_id','service__service_name').order_by('service__service_name'):
+            by_id[member['group_id']]['services'].append(member['service__service_name'])
+            grouped.add(member['service__service_name'])
+
+        ungrouped = [service for service in Service.objects.values_list('service_name', flat=True).order_by('service_name') if not service in grouped]
+
+        service_groups = {'groups':groups, 'ungrouped':ungrouped}
+        cache.set('service_groups', service_groups)
+    else:
+        logger.debug('cache hit: %s', 'service_groups')
+
+    return service_groups
+
+
+def status(timeline):
+    """Determine the current status of each group from the timeline lookups
+
+    Uses the dashboard service status codes (0 = normal, 1 = active incident,
+    2 = active maintenance).  Returns a dictionary of status by group id.
+
+    """
+
+    statuses = {}
+    for group in members()['groups']:
+        statuses[group['id']] = 0
+        for service in group['services']:
+            if service in timeline['lookup']['incident']:
+                statuses[group['id']] = 1
+                break
+            elif service in timeline['lookup']['maintenance']:
+                statuses[group['id']] = 2
+
+    return statuses
+
+
+def _severity(event):
+    """How bad an event makes its day"""
+
+    if event['type__type'] == 'incident':
+        return INCIDENT if event['status__status'] == 'open' else INCIDENT_RESOLVED
+
+    return MAINTENANCE
+
+
+def days_get(start, end):
+    """Obtain the per group rollups for the dashboard events starting between
+    start and end (inclusive)
+
+    Returns a dictionary of group id to a list of (start, severity) tuples, one
+    per event that touched the group.
+
+    """
+
+    # Imported here since functions imports this module
+    from ssd.dashboard import functions
+
+    events_ns = functions.namespace_get(logger, 'events_ns')
+    groups_ns = functions.namespace_get(logger, 'groups_ns')
+
+    # Determine which UTC days overlap the requested window
+    day = start.astimezone(pytz.utc).date()
+    keys = {}
+    while day <= end.astimezone(pytz.utc).date():
+        keys['group_day_%s_%s_%s' % (events_ns, groups_ns, day.strftime('%Y%m%d'))] = day
+        day += datetime.timedelta(days=1)
+
+    # Grab whatever rollups we already have
+    buckets = cache.get_many(keys.keys())
+    logger.debug('group_day cache hits: %s of %s', len(buckets), len(keys))
+
+    missing = [day for key,day in keys.items() if not key in buckets]
+    if missing:
+        # Roll up the missing days from the dashboard event buckets
+        q_start = pytz.utc.localize(datetime.datetime.combine(min(missing), datetime.time()))
+        q_end = pytz.utc.localize(datetime.datetime.combine(max(missing) + datetime.timedelta(days=1), datetime.time())) - datetime.timedelta(microseconds=1)
+
+        service_group = {}
+        for group in members()['groups']:
+            for service in group['services']:
+                service_group[service] = group['id']
+
+        new_buckets = {}
+        for day in missing:
+            new_buckets['group_day_%s_%s_%s' % (events_ns, groups_ns, day.strftime('%Y%m%d'))] = {}
+
+        # The events have one row per service, so count each event once per group
+        seen = set()
+        for event in functions.events_day_get(logger, q_start, q_end):
+            group_id = service_group.get(event['event_service__service__service_name'])
+            if group_id == None or (group_id, event['id']) in seen:
+                continue
+            seen.add((group_id, event['id']))
+
+            key = 'group_day_%s_%s_%s' % (events_ns, groups_ns, event['start'].astimezone(pytz.utc).strftime('%Y%m%d'))
+            if key in new_buckets:
+                new_buckets[key].setdefault(group_id, []).append((event['start'], _severity(event)))
+
+        cache.set_many(new_buckets)
+        buckets.update(new_buckets)
+
+    # Assemble the window from the rollups, trimming the edges to the requested range
+    rollups = {}
+    for key in keys:
+        for group_id,entries in buckets[key].items():
+            rollups.setdefault(group_id, []).extend([entry for entry in entries if start <= entry[0] <= end])
+
+    return rollups
+
+
+def rows(dates, end, timezone, timeline):
+    """Build the dashboard rows of all groups for the given dates (in the
+    given timezone)
+
+    Each row is {'id', 'group_name', 'status', 'count', 'days':[{'severity', 'count'}]}
+    with one day per date.
+
+    """
+
+    tz = pytz.timezone(timezone)
+    rollups = days_get(dates[0], end)
+
+    group_rows = []
+    for group in members()['groups']:
+        days = dict((date.date(), {'severity':GREEN, 'count':0}) for date in dates)
+        for event_start,severity in rollups.get(group['id'], []):
+            day = days.get(event_start.astimezone(tz).date())
+            if day:
+                day['severity'] = max(day['severity'], severity)
+                day['count'] += 1
+
+        group_rows.append({
+            'id':group['id'],
+            'group_name':group['group_name'],
+            'status':timeline.get('groups', {}).get(group['id'], 0),
+            'count':len(group['services']),
+            'days':[days[date.date()] for date in dates]
+        })
+
+    return group_rows
@@ -0,0 +1,180 @@
+#
+# Copyright 2015 - Tom Alessi
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Event count histograms for SSD
+
+   Counts the incidents and maintenances starting in each day, week (starting
+   Monday) or month of a date range, in a given timezone.  The counting is
+   done by the database (GROUP BY the start date truncated to the hour, in
+   UTC), the hours are then shifted to the timezone and folded together into
+   days, weeks or months.  Truncating in UTC keeps the database from
+   converting timezones itself, which MySQL can only do when its timezone
+   tables are loaded (CONVERT_TZ returns NULL otherwise).
+
+   Histograms are cached per range, granularity and timezone under the
+   'event_count_ns' namespace, so they are dropped whenever an event is
+   written.
+
+"""
+
+
+import datetime
+import logging
+import pytz
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router
+from django.db.backends.util import typecast_timestamp
+from django.db.models import Count
+from ssd.dashboard.models import Event, Archive_Event
+from ssd.dashboard import archive, functions
+
+
+# Get an instance of the ssd logger
+logger = logging.getLogger(__name__)
+
+
+# Supported bucket sizes
+GRANULARITIES = ('day','week','month')
+
+# Longest range (in days) that can be counted at once
+HISTOGRAM_MAX_DAYS = getattr(settings, 'SSD_HISTOGRAM_MAX_DAYS', 3660)
+
+# MySQL truncation formats (percents are doubled for the query parameters)
+MYSQL_FORMATS = {'hour':'%%Y-%%m-%%d %%H:00:00', 'minute':'%%Y-%%m-%%d %%H:%%i:00'}
+
+
+def bounds(start, end, granularity):
+    """Widen a date range so that it starts and ends on whole buckets"""
+
+    if granularity == 'week':
+        start -= datetime.timedelta(days=start.weekday())
+        end += datetime.timedelta(days=6 - end.weekday())
+    elif granularity == 'month':
+        start = start.replace(day=1)
+        end = (end.replace(day=28) + datetime.timedelta(days=4)).replace(day=1) - datetime.timedelta(days=1)
+
+    return start, end
+
+
+def _bucket(date, granularity):
+    """The first day of the bucket holding a date"""
+
+    return bounds(date, date, granularity)[0]
+
+
+def _count(model, start, end, timezone):
+    """Count the events of one model per type and day, in SQL
+
+    Returns a list of (date, type, count) tuples, dates are in the timezone.
+
+    """
+
+    db = router.db_for_read(model)
+    connection = connections[db]
+    tz = pytz.timezone(timezone)
+
+    # Timezones that are not offset by whole hours (e.g. Asia/Kolkata) are
+    # counted by minute so that no bucket straddles midnight
+    precision = 'hour'
+    if any(date.utcoffset().seconds % 3600 for date in (start, end)):
+        precision = 'minute'
+
+    # The start dates are stored in UTC.  Django truncates on MySQL with
+    # CONVERT_TZ(start, 'UTC', ...), which needs the timezone tables even to
+    # convert to UTC, so the stored value is truncated as is there.
+    column = '%s.%s' % (connection.ops.quote_name(model._meta.db_table), connection.ops.quote_name('start'))
+    if connection.vendor == 'mysql':
+        sql, params = "CAST(DATE_FORMAT(%s, '%s') AS DATETIME)" % (column, MYSQL_FORMATS[precision]), []
+    else:
+        sql, params = connection.ops.datetime_trunc_sql(precision, column, 'UTC' if settings.USE_TZ else None)
+
+    counts = []
+    for row in model.objects.using(db).filter(start__range=[start,end]
+                                         ).extra(select={'bucket':sql}, select_params=params
+                                         ).values('bucket','type__type'
+                                         ).annotate(count=Count('id')
+                                         ).order_by():
+        bucket = row['bucket']
+        if bucket is None:
+            logger.warning('%s events could not be bucketed by the database', row['count'])
+            continue
+        # Some databases return the truncated date as a string
+        if not isinstance(bucket, datetime.datetime):
+            bucket = typecast_timestamp(str(bucket))
+        if settings.USE_TZ:
+            if bucket.tzinfo is None:
+                bucket = pytz.utc.localize(bucket)
+            bucket = bucket.astimezone(tz)
+        counts.append((bucket.date(), row['type__type'], row['count']))
+
+    return counts
+
+
+def counts(start, end, granularity, timezone):
+    """Count the incidents and maintenances per bucket between two dates
+    (inclusive, in the given timezone)
+
+    The range is widened to whole buckets.  Returns a list with one
+    {'date', 'end', 'incident', 'maintenance'} per bucket, oldest first, where
+    date and end are the first and last days of the bucket (YYYY-MM-DD).
+
+    """
+
+    start, end = bounds(start, end, granularity)
+
+    # Obtain the memcached namespace for the key event_count_
+    event_count_ns = functions.namespace_get(logger, 'event_count_ns')
+    histogram_key = 'histogram_%s_%s_%s_%s_%s' % (event_count_ns, granularity, timezone.replace(' ','_'), start.strftime('%Y%m%d'), end.strftime('%Y%m%d'))
+
+    histogram = cache.get(histogram_key)
+    if histogram == None:
+        logger.debug('cache miss: %s', histogram_key)
+
+        # Every bucket is listed, even without events
+        buckets = []
+        by_date = {}
+        day = start
+        while day <= end:
+            last = bounds(day, day, granularity)[1]
+            bucket = {'date':day.strftime('%Y-%m-%d'), 'end':last.strftime('%Y-%m-%d'), 'incident':0, 'maintenance':0}
+            buckets.append(bucket)
+            by_date[day] = bucket
+            day = last + datetime.timedelta(days=1)
+
+        # Query with the exact range in the timezone
+        tz = pytz.timezone(timezone)
+        q_start = tz.localize(datetime.datetime.combine(start, datetime.time()))
+        q_end = tz.localize(datetime.datetime.combine(end, datetime.time.max))
+
+        models = [Event]
+        # Only look in the archive if the range reaches back far enough
+        archive_horizon = archive.horizon()
+        if archive_horizon and q_start <= archive_horizon:
+            models.append(Archive_Event)
+
+        for model in models:
+            for date,type,count in _count(model, q_start, q_end, timezone):
+                bucket = by_date.get(_bucket(date, granularity))
+                if bucket and type in bucket:
+                    bucket[type] += count
+
+        histogram = buckets
+        cache.set(histogram_key, histogram)
+    else:
+        logger.debug('cache hit: %s', histogram_key)
+
+    return histogram
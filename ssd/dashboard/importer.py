@@ -0,0 +1,305 @@
+#
+# Copyright 2015 - Tom Alessi
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Bulk import of historical events for SSD
+
+   Events are read from CSV or newline delimited JSON in the same layout as
+   the event export (/search/export/csv and /search/export/json), so an
+   export from one SSD can be imported into another.  The id and archived
+   columns are ignored.
+
+     - type: incident or maintenance
+     - status: open/closed (incident) or planning/started/completed (maintenance)
+     - start, end: ISO 8601 dates, in the import timezone if no offset is given
+     - description, impact, coordinator
+     - services: service names ('; ' separated in CSV)
+     - updates: '<date> <update>' lines in CSV, a list of {date, update} in JSON
+
+   Service names are resolved once, events are written SSD_IMPORT_BATCH at a
+   time (one transaction per batch) and the caches are cleared once at the
+   end.  The events are inserted one at a time so the database assigns their
+   ids, their services, impacts, coordinators and updates with bulk inserts.
+   Invalid events are skipped and reported.
+
+"""
+
+
+import csv
+import datetime
+import json
+import logging
+import pytz
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.utils.dateparse import parse_datetime
+from ssd.dashboard.models import Event, Type, Status, Event_Service, Event_Update, Event_Impact, Event_Coordinator, Service
+from ssd.dashboard import availability, cachetags, feeds
+
+
+# Get an instance of the ssd logger
+logger = logging.getLogger(__name__)
+
+
+# Number of events written per transaction
+IMPORT_BATCH = getattr(settings, 'SSD_IMPORT_BATCH', 1000)
+
+# Supported input formats
+FORMATS = ('csv', 'json')
+
+# The statuses that are valid for each event type
+STATUSES = {
+    'incident':('open','closed'),
+    'maintenance':('planning','started','completed'),
+}
+
+# Number of invalid events reported in detail
+ERRORS_MAX = 100
+
+
+class InvalidEvent(ValueError):
+    """An event that cannot be imported"""
+    pass
+
+
+def read(f, format):
+    """Generate the raw events in a file, as (line number, event) tuples"""
+
+    if format == 'csv':
+        reader = csv.DictReader(f)
+        for event in reader:
+            event = dict((key, (value or '').decode('utf-8')) for key,value in event.items() if key)
+            event['services'] = [service.strip() for service in event.get('services','').split(';') if service.strip()]
+            updates = []
+            for line in event.get('updates','').splitlines():
+                if line.strip():
+                    date, _, update = line.strip().partition(' ')
+                    updates.append({'date':date, 'update':update})
+            event['updates'] = updates
+            yield reader.line_num, event
+    else:
+        for number,line in enumerate(f, 1):
+            if line.strip():
+                try:
+                    yield number, json.loads(line)
+                except ValueError as e:
+                    yield number, e
+
+
+def _date(value, tz, field):
+    """Parse an ISO 8601 date, localizing it to tz if it has no offset"""
+
+    try:
+        date = parse_datetime(value.strip())
+    except ValueError:
+        date = None
+    if not date:
+        raise InvalidEvent('invalid %s date: %r' % (field, value))
+
+    if date.tzinfo is None:
+        date = tz.localize(date)
+
+    return date
+
+
+def _text(data, field):
+    """Obtain a text field (stripped, '' if missing)"""
+
+    value = data.get(field)
+    if value is None:
+        return ''
+    if not isinstance(value, basestring):
+        raise InvalidEvent('%s must be text: %r' % (field, value))
+
+    return value.strip()
+
+
+def _list(data, field):
+    """Obtain a list field ([] if missing)"""
+
+    value = data.get(field)
+    if value is None:
+        return []
+    if not isinstance(value, list):
+        raise InvalidEvent('%s must be a list: %r' % (field, value))
+
+    return value
+
+
+def clean(event, services, tz):
+    """Validate a raw event and resolve its type, status and services
+
+    Raises InvalidEvent if the event is invalid.
+
+    """
+
+    if not isinstance(event, dict):
+        raise InvalidEvent('unreadable event: %s' % event)
+
+    type = _text(event, 'type')
+    if not type in STATUSES:
+        raise InvalidEvent('invalid type: %r' % type)
+
+    status = _text(event, 'status')
+    if not status in STATUSES[type]:
+        raise InvalidEvent('invalid %s status: %r' % (type, status))
+
+    description = _text(event, 'description')
+    if not description or len(description) > 1000:
+        raise InvalidEvent('description must be between 1 and 1000 characters')
+
+    if not _text(event, 'start'):
+        raise InvalidEvent('start date is required')
+    start = _date(_text(event, 'start'), tz, 'start')
+    end = _date(_text(event, 'end'), tz, 'end') if _text(event, 'end') else None
+    if end and end < start:
+        raise InvalidEvent('end date is before the start date')
+
+    service_ids = []
+    for service in _list(event, 'services'):
+        if not isinstance(service, basestring):
+            raise InvalidEvent('service names must be text: %r' % service)
+        if not service in services:
+            raise InvalidEvent('unknown service: %r' % service)
+        service_ids.append(services[service])
+    if not service_ids:
+        raise InvalidEvent('at least one service is required')
+
+    updates = []
+    for update in _list(event, 'updates'):
+        if not isinstance(update, dict):
+            raise InvalidEvent('updates must have a date and an update: %r' % update)
+        text = _text(update, 'update')
+        if not text or len(text) > 1000:
+            raise InvalidEvent('updates must be between 1 and 1000 characters')
+        updates.append((_date(_text(update, 'date'), tz, 'update'), text))
+
+    return {
+        'type':type,
+        'status':status,
+        'description':description,
+        'start':start,
+        'end':end,
+        'impact':_text(event, 'impact')[:1000],
+        'coordinator':_text(event, 'coordinator')[:250],
+        'services':sorted(set(service_ids)),
+        'updates':updates,
+    }
+
+
+def _write(events, types, statuses, user_id):
+    """Write one batch of cleaned events in a single transaction"""
+
+    db = router.db_for_write(Event)
+    connection = connections[db]
+
+    with transaction.atomic(using=db):
+        # bulk_create does not return the new ids, and picking them here would
+        # collide with events created at the same time, so let the database
+        # assign them one insert at a time
+        ids = [
+            Event.objects.using(db).create(type_id=types[event['type']], status_id=statuses[event['status']], description=event['description'],
+                                           start=event['start'], end=event['end'], user_id=user_id).id
+            for event in events
+        ]
+        Event_Service.objects.using(db).bulk_create([
+            Event_Service(event_id=id, service_id=service_id)
+            for id,event in zip(ids, events) for service_id in event['services']
+        ])
+        Event_Impact.objects.using(db).bulk_create([
+            Event_Impact(event_id=id, impact=event['impact'])
+            for id,event in zip(ids, events) if event['impact']
+        ])
+        Event_Coordinator.objects.using(db).bulk_create([
+            Event_Coordinator(event_id=id, coordinator=event['coordinator'])
+            for id,event in zip(ids, events) if event['coordinator']
+        ])
+
+        # The update date is set automatically when saved, so insert the updates raw
+        # to keep their original dates
+        updates = [
+            Event_Update(event_id=id, date=date, update=update, user_id=user_id)
+            for id,event in zip(ids, events) for date,update in sorted(event['updates'])
+        ]
+        fields = [field for field in Event_Update._meta.local_concrete_fields if not field.primary_key]
+        size = max(connection.ops.bulk_batch_size(fields, updates), 1)
+        for i in range(0, len(updates), size):
+            Event_Update._base_manager._insert(updates[i:i + size], fields=fields, using=db, raw=True)
+
+
+def run(f, format, user_id, timezone, batch=IMPORT_BATCH):
+    """Import the events in a file
+
+    Returns a tuple of (number of events imported, number of events skipped,
+    list of (line number, error) for the first ERRORS_MAX events skipped).
+
+    """
+
+    tz = pytz.timezone(timezone)
+
+    # Resolve the services, types and statuses once
+    services = dict(Service.objects.values_list('service_name','id'))
+    types = dict(Type.objects.values_list('type','id'))
+    statuses = dict(Status.objects.values_list('status','id'))
+
+    imported = 0
+    errors = []
+    skipped = 0
+    pending = []
+
+    # The span of the imported incidents for each service, to refresh the availability rollups
+    spans = {}
+
+    # The batches already written stay written if the import fails, so the
+    # rollups and caches are always brought up to date with them
+    try:
+        for number,event in read(f, format):
+            try:
+                event = clean(event, services, tz)
+            except InvalidEvent as e:
+                skipped += 1
+                if len(errors) < ERRORS_MAX:
+                    errors.append((number, str(e)))
+                continue
+
+            if event['type'] == 'incident':
+                end = event['end'] or datetime.datetime.now(pytz.utc)
+                for service_id in event['services']:
+                    first, last = spans.get(service_id, (event['start'], end))
+                    spans[service_id] = (min(first, event['start']), max(last, end))
+
+            pending.append(event)
+            if len(pending) == batch:
+                _write(pending, types, statuses, user_id)
+                imported += len(pending)
+                pending = []
+                logger.debug('Imported %s events', imported)
+
+        if pending:
+            _write(pending, types, statuses, user_id)
+            imported += len(pending)
+    finally:
+        logger.debug('Imported %s events, skipped %s', imported, skipped)
+
+        if imported:
+            # One service at a time to keep memory use bounded
+            for service_id,(first,last) in spans.items():
+                availability.refresh([service_id], first, last)
+
+            # Clear the cache once - don't discriminate and just clear everything that impacts events
+            cachetags.invalidate('events')
+            feeds.invalidate()
+
+    return imported, skipped, errors
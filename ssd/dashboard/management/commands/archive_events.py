@@ -0,0 +1,48 @@
+#
+# Copyright 2015 - Tom Alessi
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Move old closed incidents and completed maintenances into the archive
+
+   Intended to be run periodically (e.g. nightly from cron).  The age and
+   batch size default to SSD_ARCHIVE_AGE and SSD_ARCHIVE_BATCH.
+
+"""
+
+
+from optparse import make_option
+from django.core.management.base import BaseCommand
+from ssd.dashboard import archive
+
+
+class Command(BaseCommand):
+    help = 'Archive closed incidents and completed maintenances older than a given age'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--age',
+            type='int',
+            dest='age',
+            default=archive.ARCHIVE_AGE,
+            help='Archive events that ended more than this many days ago (default: %s)' % archive.ARCHIVE_AGE),
+        make_option('--batch',
+            type='int',
+            dest='batch',
+            default=archive.ARCHIVE_BATCH,
+            help='Number of events to move per transaction (default: %s)' % archive.ARCHIVE_BATCH),
+    )
+
+    def handle(self, *args, **options):
+        archived = archive.archive(age=options['age'], batch=options['batch'])
+        self.stdout.write('%s events archived.' % archived)
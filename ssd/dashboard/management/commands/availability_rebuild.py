@@ -0,0 +1,50 @@
+#
+# Copyright 2015 - Tom Alessi
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Rebuild the service availability rollups from the full incident history
+
+   Rollups are maintained as incidents are written, so this is only needed
+   after an upgrade or if the rollups are suspected to be incorrect.
+
+"""
+
+
+from django.core.cache import cache
+from django.core.management.base import NoArgsCommand
+from django.db.models import Min
+from ssd.dashboard import availability, router
+from ssd.dashboard.models import Event, Service, Archive_Event
+
+
+class Command(NoArgsCommand):
+    help = 'Rebuild the service availability rollups from the incident history'
+
+    def handle_noargs(self, **options):
+        # The history starts with the first incident, live or archived
+        starts = [model.objects.filter(type__type='incident').aggregate(Min('start'))['start__min'] for model in (Event, Archive_Event)]
+        starts = [start for start in starts if start]
+        if not starts:
+            self.stdout.write('No incidents found, nothing to rebuild.')
+            return
+        first = min(starts)
+
+        # One service at a time to keep memory use bounded
+        for service_id in Service.objects.values_list('id', flat=True):
+            availability.refresh([service_id], first)
+
+        router.write_mark()
+        cache.delete('availability')
+        self.stdout.write('Availability rollups rebuilt from %s.' % first)
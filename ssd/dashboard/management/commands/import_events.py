@@ -0,0 +1,77 @@
+#
+# Copyright 2015 - Tom Alessi
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Import historical events from a CSV or newline delimited JSON file
+
+   See ssd.dashboard.importer for the file layout.  The format is taken from
+   the file extension unless --format is given.
+
+"""
+
+
+import os
+from optparse import make_option
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from ssd.dashboard import importer
+
+
+class Command(BaseCommand):
+    args = '<file>'
+    help = 'Import incidents and maintenances from a CSV or JSON file'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--format',
+            dest='format',
+            choices=importer.FORMATS,
+            help='Format of the file: csv or json (default: the file extension)'),
+        make_option('--user',
+            dest='user',
+            help='The user that the events are recorded as created by'),
+        make_option('--timezone',
+            dest='timezone',
+            default=settings.TIME_ZONE,
+            help='Timezone of dates without an offset (default: %s)' % settings.TIME_ZONE),
+        make_option('--batch',
+            type='int',
+            dest='batch',
+            default=importer.IMPORT_BATCH,
+            help='Number of events to write per transaction (default: %s)' % importer.IMPORT_BATCH),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) != 1:
+            raise CommandError('Please specify the file to import.')
+
+        format = options['format'] or os.path.splitext(args[0])[1].lstrip('.').lower()
+        if format == 'ndjson':
+            format = 'json'
+        if not format in importer.FORMATS:
+            raise CommandError('Unknown format %r, please use --format.' % format)
+
+        if not options['user']:
+            raise CommandError('Please specify the user with --user.')
+        user = User.objects.filter(username=options['user']).values('id')
+        if not user:
+            raise CommandError('User %r does not exist.' % options['user'])
+
+        with open(args[0], 'rb') as f:
+            imported, skipped, errors = importer.run(f, format, user[0]['id'], options['timezone'], options['batch'])
+
+        for number,error in errors:
+            self.stderr.write('Line %s: %s' % (number, error))
+        self.stdout.write('%s events imported, %s skipped.' % (imported, skipped))
@@ -0,0 +1,411 @@
+#
+# Copyright 2015 - Tom Alessi
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Load test the admin write path with concurrent updates
+
+   Creates a throwaway test database (test_<name>) next to the configured
+   one, then has several threads update one incident (i_update), one
+   maintenance (m_update) and move escalation contacts (contact_switch) at the
+   same time, through the views as a logged in admin would.
+
+   Reports the throughput, the response times and the time spent taking the
+   row locks (functions.event_lock and the escalation contact lock) per view,
+   then checks that:
+     - no event lists a service (or email recipient) more than once
+     - no update was lost: every accepted update is recorded, and each event
+       ended up with the description, services and recipient of one single
+       update (the last one) rather than a mix of several
+     - the escalation contacts are numbered 1..n without gaps or duplicates
+
+   Requests that fail because a lock could not be taken in time (SQLite's
+   "database is locked", MySQL's lock wait timeouts and deadlocks) are retried
+   a few times, and the ones still failing are reported as lock timeouts on
+   their own.  Exits with an error if any check fails or any request fails
+   otherwise, so a clean run means the write path kept the data consistent
+   and it can be used as a regression gate.
+
+   SQLite has no row locks (select_for_update is ignored and writers lock the
+   whole database, a writer that finds it locked retries), run it against
+   MySQL to measure the row lock waits.
+
+"""
+
+
+import datetime
+import random
+import sys
+import tempfile
+import threading
+import time
+from functools import wraps
+from optparse import make_option
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import got_request_exception
+from django.db import connection, connections, OperationalError
+from django.db.models import Count
+from django.test.client import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from ssd.dashboard.models import Event, Type, Status, Service, Event_Service, Event_Email, Event_Update, Event_Impact, Event_Coordinator, Email, Escalation, Config_Email, Config_Escalation
+from ssd.dashboard import escalation, functions, trace
+
+
+# The views driven by the test, with how often each is picked
+VIEWS = (('i_update', 2), ('m_update', 2), ('contact_switch', 1))
+
+# Password of the admin user created in the test database
+PASSWORD = 'load-test'
+
+# MySQL errors raised when a lock could not be taken: lock wait timeout, deadlock
+MYSQL_LOCK_ERRORS = (1205, 1213)
+
+# Time each thread spent taking the row locks during its current request
+lock_waits = threading.local()
+
+# Exception raised by the view of each thread's current request, if any
+request_errors = threading.local()
+
+
+def _request_exception(sender, **kwargs):
+    """Remember the exception behind a failed request (got_request_exception)"""
+
+    request_errors.exception = sys.exc_info()[1]
+
+
+def _locked(e):
+    """Whether an exception means a lock could not be taken in time"""
+
+    if not isinstance(e, OperationalError):
+        return False
+    if e.args and e.args[0] in MYSQL_LOCK_ERRORS:
+        return True
+    return 'database is locked' in str(e)
+
+
+def _timed(lock):
+    """Wrap a lock function to add the time it takes to the thread's lock wait"""
+
+    @wraps(lock)
+    def _lock(*args, **kwargs):
+        started = time.time()
+        try:
+            return lock(*args, **kwargs)
+        finally:
+            lock_waits.total += time.time() - started
+    return _lock
+
+
+class Command(BaseCommand):
+    help = 'Load test the incident, maintenance and escalation contact updates with concurrent requests'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--threads',
+            type='int',
+            dest='threads',
+            default=8,
+            help='Number of concurrent admins (default: 8)'),
+        make_option('--requests',
+            type='int',
+            dest='requests',
+            default=50,
+            help='Number of requests per thread (default: 50)'),
+        make_option('--services',
+            type='int',
+            dest='services',
+            default=8,
+            help='Number of services to choose from (default: 8)'),
+        make_option('--contacts',
+            type='int',
+            dest='contacts',
+            default=6,
+            help='Number of escalation contacts (default: 6)'),
+        make_option('--retries',
+            type='int',
+            dest='retries',
+            default=20,
+            help='Number of times a request failing to take a lock is retried (default: 20)'),
+        make_option('--noinput',
+            action='store_false',
+            dest='interactive',
+            default=True,
+            help='Replace an existing test database without asking'),
+    )
+
+    def handle(self, *args, **options):
+        if options['threads'] < 1 or options['requests'] < 1 or options['services'] < 1 or options['contacts'] < 2 or options['retries'] < 0:
+            raise CommandError('Please use at least 1 thread, 1 request, 1 service, 2 contacts and 0 retries.')
+
+        # An in memory SQLite database cannot be shared by the threads
+        if connection.vendor == 'sqlite' and not connection.settings_dict.get('TEST_NAME'):
+            connection.settings_dict['TEST_NAME'] = tempfile.mktemp(prefix='ssd_load_test_', suffix='.sqlite3')
+
+        old_name = connection.settings_dict['NAME']
+        setup_test_environment()
+        connection.creation.create_test_db(verbosity=0, autoclobber=not options['interactive'])
+
+        # Time the lock calls themselves (both are looked up when called)
+        locks = (functions.event_lock, escalation._lock)
+        functions.event_lock, escalation._lock = [_timed(lock) for lock in locks]
+        got_request_exception.connect(_request_exception)
+        try:
+            fixture = self.setup(options['services'], options['contacts'])
+            results, elapsed = self.run(fixture, options['threads'], options['requests'], options['retries'])
+            self.report(results, elapsed)
+            problems = self.check(fixture, results)
+        finally:
+            got_request_exception.disconnect(_request_exception)
+            functions.event_lock, escalation._lock = locks
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        timeouts = [result for result in results if result['locked']]
+        if timeouts:
+            self.stderr.write('Warning: %s request(s) could not take a lock after %s retries, raise --retries or lower --threads.' % (
+                              len(timeouts), options['retries']))
+
+        if problems:
+            for problem in problems:
+                self.stderr.write('FAIL: %s' % problem)
+            raise CommandError('%s problem(s) found.' % len(problems))
+
+        self.stdout.write('All checks passed.')
+
+    def setup(self, services, contacts):
+        """Create the configuration, admin, services, events and contacts"""
+
+        for status in ('planning','started','completed','open','closed'):
+            Status.objects.create(status=status)
+        for type in ('incident','maintenance'):
+            Type.objects.create(type=type)
+        Config_Email.objects.create(enabled=0, email_format=0, from_address='', text_pager='',
+                                    incident_greeting='', incident_update='',
+                                    maintenance_greeting='', maintenance_update='', email_footer='')
+        Config_Escalation.objects.create(enabled=1, instructions='')
+
+        admin = User.objects.create_user('load_test', 'load_test@localhost', PASSWORD)
+        admin.is_staff = True
+        admin.save()
+
+        service_ids = [Service.objects.create(service_name='load-test-%s' % i).id for i in range(services)]
+        email_ids = [Email.objects.create(email='load-test-%s@localhost' % i).id for i in range(2)]
+
+        # In the server timezone, which the form dates are read in
+        now = timezone.localtime(timezone.now()).replace(second=0, microsecond=0)
+        events = {}
+        for type,status in (('incident','open'), ('maintenance','planning')):
+            event = Event.objects.create(type=Type.objects.get(type=type), description='initial',
+                                         status=Status.objects.get(status=status), start=now,
+                                         end=now + datetime.timedelta(hours=1) if type == 'maintenance' else None,
+                                         user=admin)
+            Event_Service.objects.create(event=event, service_id=service_ids[0])
+            if type == 'maintenance':
+                Event_Impact.objects.create(event=event, impact='initial')
+                Event_Coordinator.objects.create(event=event, coordinator='initial')
+            events[type] = event.id
+
+        contact_ids = [Escalation.objects.create(order=i + 1, name='load-test-%s' % i, contact_details='none', hidden=False).id
+                       for i in range(contacts)]
+
+        return {'services':service_ids, 'emails':email_ids, 'events':events, 'contacts':contact_ids, 'start':now}
+
+    def _request(self, client, view, fixture, tag):
+        """Build and send one request, returns the response and what was sent"""
+
+        if view == 'contact_switch':
+            sent = {'id':random.choice(fixture['contacts']), 'action':random.choice(('up','down'))}
+            return client.get('/admin/contact_switch', sent), sent
+
+        sent = {
+            'id':fixture['events']['incident' if view == 'i_update' else 'maintenance'],
+            's_date':fixture['start'].strftime('%Y-%m-%d'),
+            's_time':fixture['start'].strftime('%H:%M'),
+            'description':tag,
+            'update':tag,
+            'service':[str(id) for id in random.sample(fixture['services'], random.randint(1, len(fixture['services'])))],
+            'email_id':random.choice(fixture['emails'] + [''])
+        }
+        if view == 'm_update':
+            end = fixture['start'] + datetime.timedelta(hours=1)
+            sent.update({'e_date':end.strftime('%Y-%m-%d'), 'e_time':end.strftime('%H:%M'), 'impact':tag, 'coordinator':tag})
+
+        return client.post('/admin/%s' % view, sent), sent
+
+    def _send(self, client, view, fixture, tag, retries):
+        """Send one request, retrying it while it fails to take a lock
+
+        Returns what was sent, the error (None if it succeeded), whether the
+        error is a lock timeout and the number of retries.
+
+        """
+
+        for attempt in range(retries + 1):
+            if attempt:
+                # Back off a little, at random so the retries spread out
+                time.sleep(random.uniform(0, 0.01 * min(attempt, 10)))
+
+            request_errors.exception = None
+            try:
+                response, sent = self._request(client, view, fixture, tag)
+            except Exception as e:
+                sent, exception, error = None, e, '%s: %s' % (e.__class__.__name__, e)
+            else:
+                if response.status_code == 302:
+                    return sent, None, False, attempt
+                exception, error = request_errors.exception, 'HTTP %s' % response.status_code
+                if exception:
+                    error = '%s (%s: %s)' % (error, exception.__class__.__name__, exception)
+
+            if not _locked(exception):
+                return sent, error, False, attempt
+
+        return sent, error, True, retries
+
+    def _worker(self, number, fixture, requests, retries, barrier, results):
+        """Send requests as one admin"""
+
+        client = Client()
+        client.login(username='load_test', password=PASSWORD)
+        views = [view for view,weight in VIEWS for i in range(weight)]
+
+        barrier.wait()
+        try:
+            for i in range(requests):
+                view = random.choice(views)
+                tag = 'load-test-%s-%s' % (number, i)
+
+                lock_waits.total = 0.0
+                current = trace.start()
+                sent, error, locked, retried = self._send(client, view, fixture, tag, retries)
+                trace.stop()
+
+                results.append({'view':view, 'tag':tag, 'sent':sent, 'error':error, 'locked':locked,
+                                'retries':retried, 'time':current.total_time, 'lock_wait':lock_waits.total})
+        finally:
+            for conn in connections.all():
+                conn.close()
+
+    def run(self, fixture, threads, requests, retries):
+        """Run the workers, returns their results and the elapsed time"""
+
+        results = []
+        barrier = Barrier(threads + 1)
+        workers = [threading.Thread(target=self._worker, args=(number, fixture, requests, retries, barrier, results))
+                   for number in range(threads)]
+        for worker in workers:
+            worker.start()
+
+        # Let the workers log in before starting the clock
+        barrier.wait()
+        started = time.time()
+        for worker in workers:
+            worker.join()
+
+        return results, time.time() - started
+
+    def report(self, results, elapsed):
+        """Print the throughput, response and lock wait times per view"""
+
+        done = [result for result in results if not result['error']]
+        timeouts = [result for result in results if result['locked']]
+        self.stdout.write('%s requests in %.2fs: %.1f requests/s, %s failed, %s lock timeouts, %s retries' % (
+                          len(results), elapsed, len(done) / elapsed, len(results) - len(done) - len(timeouts),
+                          len(timeouts), sum(result['retries'] for result in results)))
+
+        self.stdout.write('%-16s %8s %8s %10s %10s %10s %10s %10s %12s %12s' % (
+                          'view', 'ok', 'failed', 'timeouts', 'retries', 'avg ms', 'p95 ms', 'max ms', 'lock avg ms', 'lock max ms'))
+        for view,weight in VIEWS:
+            ok = [result for result in done if result['view'] == view]
+            failed = len([result for result in results if result['view'] == view and result['error'] and not result['locked']])
+            locked = len([result for result in timeouts if result['view'] == view])
+            retried = sum(result['retries'] for result in results if result['view'] == view)
+            times = sorted([result['time'] * 1000 for result in ok]) or [0]
+            waits = [result['lock_wait'] * 1000 for result in ok] or [0]
+            self.stdout.write('%-16s %8s %8s %10s %10s %10.1f %10.1f %10.1f %12.1f %12.1f' % (
+                              view, len(ok), failed, locked, retried, sum(times) / len(times),
+                              times[min(len(times) - 1, int(len(times) * 0.95))], times[-1], sum(waits) / len(waits), max(waits)))
+
+        # Show a few of the failures
+        for result in [result for result in results if result['error'] and not result['locked']][:10]:
+            self.stderr.write('%s %s: %s' % (result['view'], result['tag'], result['error']))
+
+    def check(self, fixture, results):
+        """Check the invariants, returns a list of the problems found"""
+
+        # Lock timeouts are reported apart, they do not mean the data is wrong
+        problems = ['%s %s failed: %s' % (result['view'], result['tag'], result['error'])
+                    for result in results if result['error'] and not result['locked']]
+
+        # No service or recipient is listed twice for an event
+        for row in Event_Service.objects.values('event_id','service_id').annotate(count=Count('id')).filter(count__gt=1):
+            problems.append('Event %(event_id)s lists service %(service_id)s %(count)s times' % row)
+        for row in Event_Email.objects.values('event_id').annotate(count=Count('id')).filter(count__gt=1):
+            problems.append('Event %(event_id)s has %(count)s email recipients' % row)
+
+        for view,type in (('i_update','incident'), ('m_update','maintenance')):
+            event_id = fixture['events'][type]
+            done = [result for result in results if result['view'] == view and not result['error']]
+
+            # Every accepted update is recorded
+            recorded = set(Event_Update.objects.filter(event_id=event_id).values_list('update', flat=True))
+            lost = [result['tag'] for result in done if not result['tag'] in recorded]
+            if lost:
+                problems.append('%s lost %s of %s updates (e.g. %s)' % (type, len(lost), len(done), lost[0]))
+
+            if not done:
+                continue
+
+            # The event is entirely from one update: the one its description came from
+            description = Event.objects.filter(id=event_id).values_list('description', flat=True)[0]
+            last = [result for result in done if result['tag'] == description]
+            if not last:
+                problems.append('%s description %r is not from any update' % (type, description))
+                continue
+            sent = last[0]['sent']
+
+            services = set(Event_Service.objects.filter(event_id=event_id).values_list('service_id', flat=True))
+            if services != set([int(id) for id in sent['service']]):
+                problems.append('%s services %s are not those of its last update %s (%s)' % (
+                                type, sorted(services), description, sorted([int(id) for id in sent['service']])))
+
+            emails = list(Event_Email.objects.filter(event_id=event_id).values_list('email_id', flat=True))
+            if emails != ([sent['email_id']] if sent['email_id'] else []):
+                problems.append('%s email recipients %s are not those of its last update %s (%s)' % (
+                                type, emails, description, sent['email_id'] or 'none'))
+
+        # The contacts are still all there, numbered 1..n
+        orders = sorted(Escalation.objects.values_list('order', flat=True))
+        if orders != range(1, len(fixture['contacts']) + 1):
+            problems.append('Escalation contact orders are %s' % orders)
+
+        return problems
+
+
+class Barrier(object):
+    """Hold threads until all of them are waiting (Python 2 has no Barrier)"""
+
+    def __init__(self, parties):
+        self.parties = parties
+        self.waiting = 0
+        self.condition = threading.Condition()
+
+    def wait(self):
+        with self.condition:
+            self.waiting += 1
+            if self.waiting >= self.parties:
+                self.condition.notify_all()
+            while self.waiting < self.parties:
+                self.condition.wait()
@@ -0,0 +1,42 @@
+#
+# Copyright 2015 - Tom Alessi
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Deduplicate, re-encode and thumbnail new incident report screenshots
+
+   Intended to be run periodically (e.g. every minute from cron).
+
+"""
+
+
+from optparse import make_option
+from django.core.management.base import BaseCommand
+from ssd.dashboard import screenshots
+
+
+class Command(BaseCommand):
+    help = 'Process the screenshots of new incident reports'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--batch',
+            type='int',
+            dest='batch',
+            default=screenshots.SCREENSHOT_BATCH,
+            help='Maximum number of reports to process (default: %s)' % screenshots.SCREENSHOT_BATCH),
+    )
+
+    def handle(self, *args, **options):
+        processed = screenshots.process(batch=options['batch'])
+        self.stdout.write('%s incident reports processed.' % processed)
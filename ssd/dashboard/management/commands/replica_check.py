@@ -0,0 +1,109 @@
+#
+# Copyright 2015 - Tom Alessi
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Check which database the public read views read from
+
+   Requests the event search (which is never cached, so it always reads the
+   events) through the views as an anonymous user, and counts the event
+   queries run on the primary and on each read replica (SSD_REPLICAS).
+   Checks that:
+     - an anonymous request reads the events from a replica
+     - a client that just submitted a form (ssd_primary cookie) reads them
+       from the primary
+     - everyone reads them from the primary right after a write (while the
+       write mark set by router.write_mark is in the cache)
+
+   Nothing is written to the databases.  The last check sets the write mark,
+   so the public views use the primary for SSD_REPLICA_LAG seconds afterwards.
+
+"""
+
+
+import time
+from django.conf import settings
+from django.core.management.base import NoArgsCommand, CommandError
+from django.db import connections
+from django.test.client import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from ssd.dashboard import router
+
+
+# The public view requested, it reads the events on every request
+PATH = '/search/events'
+
+
+class Command(NoArgsCommand):
+    help = 'Check that the public read views read from the replicas, and from the primary after a write'
+
+    def handle_noargs(self, **options):
+        replicas = getattr(settings, 'SSD_REPLICAS', [])
+        if not replicas:
+            raise CommandError('No read replicas are configured (SSD_REPLICAS).')
+
+        # Wait out the write mark of any recent write
+        waited = 0
+        while router.write_recent():
+            if waited > router.REPLICA_LAG:
+                raise CommandError('The write mark did not expire after %s seconds, check the cache.' % router.REPLICA_LAG)
+            time.sleep(1)
+            waited += 1
+
+        aliases = ['default'] + list(replicas)
+        setup_test_environment()
+        try:
+            problems = []
+
+            reads = self.reads(aliases, Client())
+            if not sum(reads[alias] for alias in replicas) or reads['default']:
+                problems.append('anonymous reads did not use a replica')
+
+            client = Client()
+            client.cookies['ssd_primary'] = '1'
+            reads = self.reads(aliases, client)
+            if not reads['default'] or sum(reads[alias] for alias in replicas):
+                problems.append('reads after submitting a form (ssd_primary cookie) did not use the primary')
+
+            router.write_mark()
+            reads = self.reads(aliases, Client())
+            if not reads['default'] or sum(reads[alias] for alias in replicas):
+                problems.append('reads right after a write did not use the primary')
+        finally:
+            teardown_test_environment()
+
+        if problems:
+            for problem in problems:
+                self.stderr.write('FAIL: %s' % problem)
+            raise CommandError('%s problem(s) found.' % len(problems))
+
+        self.stdout.write('All checks passed.')
+
+    def reads(self, aliases, client):
+        """Request the view and count the event queries run on each database"""
+
+        debug = dict((alias, connections[alias].use_debug_cursor) for alias in aliases)
+        try:
+            for alias in aliases:
+                connections[alias].use_debug_cursor = True
+            response = client.get(PATH)
+            if response.status_code != 200:
+                raise CommandError('%s returned status %s.' % (PATH, response.status_code))
+            reads = dict((alias, len([query for query in connections[alias].queries if 'dashboard_event' in query['sql']])) for alias in aliases)
+        finally:
+            for alias in aliases:
+                connections[alias].use_debug_cursor = debug[alias]
+
+        self.stdout.write('%s: %s' % (PATH, ', '.join('%s %s' % (alias, reads[alias]) for alias in aliases)))
+        return reads
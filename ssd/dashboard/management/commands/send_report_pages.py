@@ -0,0 +1,38 @@
+#
+# Copyright 2015 - Tom Alessi
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Send the text page digest of incident reports received since the last page
+
+   Intended to be run periodically (e.g. every minute from cron) so that
+   reports received at the end of a busy period are not held back until the
+   next report arrives.
+
+"""
+
+
+from django.core.management.base import NoArgsCommand
+from ssd.dashboard.models import Config_Email, Config_Ireport
+from ssd.dashboard import notify
+
+
+class Command(NoArgsCommand):
+    help = 'Send the text page digest of recent incident reports'
+
+    def handle_noargs(self, **options):
+        # Only if email is enabled and report notifications are turned on
+        if Config_Email.objects.filter(id=Config_Email.objects.values('id')[0]['id']).values('enabled')[0]['enabled'] == 1:
+            if Config_Ireport.objects.filter(id=Config_Ireport.objects.values('id')[0]['id']).values('email_enabled')[0]['email_enabled'] == 1:
+                notify.email().page_reports()
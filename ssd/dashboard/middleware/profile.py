@@ -0,0 +1,111 @@
+#
+# Copyright 2015 - Tom Alessi
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Request profiling middleware for the SSD project
+
+	Profiles the requests chosen while profiling is armed from the SSD admin
+	(see ssd.dashboard.profiler).  Each process only looks up whether profiling
+	is armed every SSD_PROFILE_POLL seconds, so while it is disarmed a request
+	costs a single comparison.  Without SSD_PROFILE_DIR, the middleware removes
+	itself when Django starts.
+
+	Keep this after the trace middleware so a request can be traced and profiled
+	at once.
+
+"""
+
+import cProfile
+import logging
+import random
+import time
+from django.core.exceptions import MiddlewareNotUsed
+from ssd.dashboard import profiler, trace
+
+
+# Get an instance of the ssd logger
+logger = logging.getLogger(__name__)
+
+
+class ProfileMiddleware:
+
+	def __init__(self):
+
+		if not profiler.PROFILE_DIR:
+			raise MiddlewareNotUsed
+
+		self.armed = None
+		self.checked = 0
+
+	def process_request(self,request):
+
+		# Only look in the cache once in a while
+		now = time.time()
+		if now - self.checked >= profiler.PROFILE_POLL:
+			self.armed = profiler.armed()
+			self.checked = now
+
+		armed = self.armed
+		if not armed or request.path != armed['path'] or random.random() >= armed['rate']:
+			return None
+
+		if not profiler.claim(armed):
+			# All taken, stop checking until the next poll
+			self.armed = None
+			return None
+
+		trace.install()
+
+		# Use the trace of the trace middleware if this request is being traced
+		current = trace.current()
+		request.ssd_profile = {
+			'trace':current or trace.start(),
+			'owner':current is None,
+			'profile':cProfile.Profile()
+		}
+		request.ssd_profile['profile'].enable()
+
+		return None
+
+	def process_view(self,request,view_func,view_args,view_kwargs):
+
+		if getattr(request, 'ssd_profile', None):
+			request.ssd_profile['trace'].view = '%s.%s' % (view_func.__module__, view_func.__name__)
+
+		return None
+
+	def process_response(self,request,response):
+
+		capture = getattr(request, 'ssd_profile', None)
+		if capture:
+			capture['profile'].disable()
+			del request.ssd_profile
+
+			current = capture['trace']
+			current.status = response.status_code
+			if capture['owner']:
+				trace.stop()
+				meta = dict(current.fields())
+			else:
+				# The trace middleware finishes its own trace
+				meta = dict(current.snapshot())
+			meta.update({'method':request.method, 'path':request.path, 'query':request.META.get('QUERY_STRING', '')})
+
+			try:
+				profiler.save(capture['profile'], meta)
+			except (IOError, OSError) as e:
+				logger.error('Unable to save profile of %s: %s', request.path, e)
+
+		return response
@@ -0,0 +1,116 @@
+#
+# Copyright 2015 - Tom Alessi
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Read replica middleware for the SSD project
+
+	This middleware decides, per request, whether the dashboard reads may be
+	served from a read replica (see ssd.dashboard.router).  Only the public read
+	views are eligible, and only for anonymous users and clients whose last
+	successful staff write was more than SSD_REPLICA_LAG seconds ago, so admins
+	always read their own writes and replica lag is never visible right after a
+	change.
+
+	Since the cached data is shared, everyone reads from the primary for
+	SSD_REPLICA_LAG seconds after any write (see router.write_mark), so a lagging
+	replica never repopulates the cache with the data from before the write.
+
+"""
+
+import logging
+import random
+from django.conf import settings
+from ssd.dashboard import router
+
+
+# Get an instance of the ssd logger
+logger = logging.getLogger(__name__)
+
+
+# Public read only views that may be served from a replica
+REPLICA_VIEWS = (
+	'ssd.dashboard.views.main.index',
+	'ssd.dashboard.views.main.rows',
+	'ssd.dashboard.views.search.events',
+	'ssd.dashboard.views.search.graph',
+	'ssd.dashboard.views.search.histogram',
+	'ssd.dashboard.views.search.export_csv',
+	'ssd.dashboard.views.search.export_json',
+	'ssd.dashboard.views.incidents.i_detail',
+	'ssd.dashboard.views.maintenance.m_detail',
+	'ssd.dashboard.views.escalation.escalation',
+	'ssd.dashboard.views.availability.availability',
+	'ssd.dashboard.views.feeds.atom',
+	'ssd.dashboard.views.feeds.rss',
+	'ssd.dashboard.views.badges.svg',
+	'ssd.dashboard.views.badges.json',
+)
+
+
+class ReplicaMiddleware:
+
+	def process_request(self,request):
+
+		# Always start on the primary
+		router.replica_set(None)
+		router.wrote_reset()
+
+		return None
+
+	def process_view(self,request,view_func,view_args,view_kwargs):
+
+		replicas = getattr(settings, 'SSD_REPLICAS', [])
+		if not replicas or not request.method in ('GET', 'HEAD'):
+			return None
+
+		view = '%s.%s' % (view_func.__module__, view_func.__name__)
+		if not view in REPLICA_VIEWS:
+			return None
+
+		# Logged in users and anyone who recently made a change stay on the primary
+		if request.user.is_authenticated() or request.COOKIES.get('ssd_primary'):
+			logger.debug('Reading %s from the primary database', view)
+			return None
+
+		# So does everyone else right after a write, a lagging replica would
+		# otherwise repopulate the shared cache with the data from before it
+		if router.write_recent():
+			logger.debug('Reading %s from the primary database after a recent write', view)
+			return None
+
+		replica = random.choice(replicas)
+		logger.debug('Reading %s from replica: %s', view, replica)
+		router.replica_set(replica)
+
+		return None
+
+	def process_response(self,request,response):
+
+		router.replica_set(None)
+
+		# Pin a staff member who changed something to the primary until the replicas
+		# have caught up (the write itself was marked when it cleared the cache)
+		user = getattr(request, 'user', None)
+		if router.wrote() and user and user.is_staff:
+			response.set_cookie('ssd_primary', '1', max_age=router.REPLICA_LAG)
+		router.wrote_reset()
+
+		return response
+
+	def process_exception(self,request,exception):
+
+		router.replica_set(None)
+
+		return None
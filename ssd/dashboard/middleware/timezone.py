@@ -40,10 +40,10 @@ class TimezoneMiddleware:
 		# (the one in settings.py)
 		if request.COOKIES.get('tz_pref') == None:
 			set_timezone = settings.TIME_ZONE
-			logger.debug('tz_pref cookie is not set, using server timezone: %s' % set_timezone)
+			logger.debug('tz_pref cookie is not set, using server timezone: %s', set_timezone)
 		else:
 			set_timezone = request.COOKIES.get('tz_pref')
-			logger.debug('tz_pref cookie is set to: %s' % set_timezone)
+			logger.debug('tz_pref cookie is set to: %s', set_timezone)
 
         # Set the current timezone to either the server timezone, or the user requested one.  This will display
         # all times in templates in the desired timezone
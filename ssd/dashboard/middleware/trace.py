@@ -0,0 +1,80 @@
+#
+# Copyright 2015 - Tom Alessi
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Request tracing middleware for the SSD project
+
+	Traces a sample (SSD_TRACE_RATE, from 0 to 1) of the requests and logs one
+	line per traced request with the time spent in SQL, the cache and template
+	rendering (see ssd.dashboard.trace), e.g.:
+
+	  method=GET path=/ view=ssd.dashboard.views.main.index status=200 total_ms=41.2 sql=6 ...
+
+	The fields are also attached to the log record as 'ssd_trace' for handlers
+	that write structured logs.  With a rate of 0 (the default), the middleware
+	removes itself when Django starts and nothing is instrumented.
+
+"""
+
+import logging
+import random
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from ssd.dashboard import trace
+
+
+# Get an instance of the ssd logger
+logger = logging.getLogger(__name__)
+
+
+class TraceMiddleware:
+
+	def __init__(self):
+
+		self.rate = getattr(settings, 'SSD_TRACE_RATE', 0)
+		if not self.rate > 0:
+			raise MiddlewareNotUsed
+
+		trace.install()
+
+	def process_request(self,request):
+
+		# Discard anything left over by a request that did not finish
+		trace.stop()
+
+		if random.random() < self.rate:
+			request.ssd_trace = trace.start()
+
+		return None
+
+	def process_view(self,request,view_func,view_args,view_kwargs):
+
+		if getattr(request, 'ssd_trace', None):
+			request.ssd_trace.view = '%s.%s' % (view_func.__module__, view_func.__name__)
+
+		return None
+
+	def process_response(self,request,response):
+
+		if getattr(request, 'ssd_trace', None):
+			current = trace.stop()
+			if current:
+				current.status = response.status_code
+				fields = [('method', request.method), ('path', request.path)] + current.fields()
+				logger.info(' '.join(['%s=%%s' % name for name,value in fields]),
+					*[value for name,value in fields],
+					extra={'ssd_trace':dict(fields)})
+
+		return response
@@ -31,7 +31,7 @@ import time
 import uuid
 from django.db import models
 from django.contrib.auth.models import User
-from django.core.files.storage import FileSystemStorage
+from ssd.dashboard.storage import upload_storage
 
 
 class Service(models.Model):
@@ -40,6 +40,19 @@ class Service(models.Model):
     service_name = models.CharField(blank=False, max_length=50, unique=True)
 
 
+class Service_Group(models.Model):
+    """Groups of services, shown as a single (expandable) row on the dashboard"""
+
+    group_name = models.CharField(blank=False, max_length=50, unique=True)
+
+
+class Service_Group_Member(models.Model):
+    """Tie services to a group (a service belongs to at most one group)"""
+
+    group = models.ForeignKey(Service_Group)
+    service = models.ForeignKey(Service, unique=True)
+
+
 class Email(models.Model):
     """Email addresses that will be used for alerting"""
 
@@ -130,6 +143,79 @@ class Event_Update(models.Model):
     user = models.ForeignKey(User)
 
 
+class Service_Availability(models.Model):
+    """Daily incident downtime rollup for a service
+        - one entry per service per UTC day with downtime
+        - downtime is in seconds, with overlapping incidents merged
+
+    """
+
+    service = models.ForeignKey(Service)
+    date = models.DateField(blank=False)
+    downtime = models.IntegerField(blank=False)
+
+    class Meta:
+        unique_together = ('service', 'date')
+
+
+#-- Archive Models -- #
+#
+# Closed incidents and completed maintenances are moved here once they
+# are old enough (see ssd.dashboard.archive).  The relations to the event
+# use the same names as the live tables so that the same lookups
+# (e.g. 'event_service__service__service_name') work against both.
+
+
+class Archive_Event(models.Model):
+    """Archived events (keeps the original event id)"""
+
+    id = models.IntegerField(primary_key=True)
+    type = models.ForeignKey(Type)
+    date = models.DateTimeField(blank=False)
+    description = models.CharField(blank=False, max_length=1000)
+    start = models.DateTimeField(blank=False, db_index=True)
+    end = models.DateTimeField(null=True, blank=True)
+    status = models.ForeignKey(Status)
+    user = models.ForeignKey(User)
+
+
+class Archive_Event_Service(models.Model):
+    """Tie services to archived events"""
+
+    event = models.ForeignKey(Archive_Event, related_name='event_service')
+    service = models.ForeignKey(Service)
+
+
+class Archive_Event_Impact(models.Model):
+    """Archived event impact analysis (maintenance specific)"""
+
+    event = models.ForeignKey(Archive_Event, unique=True, related_name='event_impact')
+    impact = models.CharField(blank=False, max_length=1000)
+
+
+class Archive_Event_Coordinator(models.Model):
+    """Archived event coordinator (maintenance specific)"""
+
+    event = models.ForeignKey(Archive_Event, unique=True, related_name='event_coordinator')
+    coordinator = models.CharField(blank=False, max_length=250)
+
+
+class Archive_Event_Email(models.Model):
+    """Archived event email recipient"""
+
+    event = models.ForeignKey(Archive_Event, unique=True, related_name='event_email')
+    email = models.ForeignKey(Email)
+
+
+class Archive_Event_Update(models.Model):
+    """Updates to archived events"""
+
+    event = models.ForeignKey(Archive_Event, related_name='event_update')
+    date = models.DateTimeField(blank=False)
+    update = models.CharField(blank=False, max_length=1000)
+    user = models.ForeignKey(User)
+
+
 class Escalation(models.Model):
     """Escalation Contacts"""
 
@@ -221,10 +307,6 @@ class Config_Ireport(models.Model):
 class Ireport(models.Model):
     """User reported issues"""
 
-    # Obtain the user defined upload location
-    # This needs to match the wsgi.conf staticly served location or else images will not be viewable
-    fs = FileSystemStorage(Config_Ireport.objects.filter(id=Config_Ireport.objects.values('id')[0]['id']).values('upload_path')[0]['upload_path'])
-
     def _upload_to(instance, filename):
         """Rename uploaded images to a random (standard) name"""
 
@@ -245,6 +327,19 @@ class Ireport(models.Model):
     email = models.CharField(blank=False, max_length=50)
     detail = models.CharField(blank=False, max_length=160)
     extra = models.CharField(null=False, blank=True, max_length=1000)
-    screenshot1 = models.ImageField(null=False, blank=True, storage=fs, upload_to=_upload_to)
-    screenshot2 = models.ImageField(null=False, blank=True, storage=fs, upload_to=_upload_to)
+    screenshot1 = models.ImageField(null=False, blank=True, storage=upload_storage, upload_to=_upload_to)
+    screenshot2 = models.ImageField(null=False, blank=True, storage=upload_storage, upload_to=_upload_to)
+
+
+class Screenshot(models.Model):
+    """Processed incident report screenshots
+
+    Each unique upload (by content hash) is stored once along with a thumbnail,
+    and every report with that content points at the same image.
+
+    """
+
+    hash = models.CharField(blank=False, max_length=64, unique=True)
+    image = models.CharField(blank=False, max_length=100, db_index=True)
+    thumbnail = models.CharField(null=False, blank=True, max_length=100)
 
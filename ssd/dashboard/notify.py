@@ -20,13 +20,18 @@
 
 """
 
+import datetime
 import logging
+from django.conf import settings
+from django.core.cache import cache
 from django.core.mail import EmailMessage, EmailMultiAlternatives
+from django.db.models import Count
 from django.template.loader import get_template
 from django.template import Context
 from django.utils import timezone as jtz
 from ssd.dashboard.models import Email
 from ssd.dashboard.models import Event
+from ssd.dashboard.models import Ireport
 from ssd.dashboard.models import Config_Email, Config_Systemurl
 
 
@@ -34,6 +39,13 @@ from ssd.dashboard.models import Config_Email, Config_Systemurl
 logger = logging.getLogger(__name__)
 
 
+# Incident report pages are sent at most once per window (seconds)
+PAGER_WINDOW = getattr(settings, 'SSD_PAGER_WINDOW', 60)
+
+# Number of distinct report details included in a digest page
+PAGER_DIGEST_TOP = getattr(settings, 'SSD_PAGER_DIGEST_TOP', 3)
+
+
 class email:
 
     """
@@ -67,7 +79,48 @@ class email:
             pager.send()
         except Exception, e:
             # Log to the error log and return the error to the caller
-            logger.error('Error sending text page: %s' % e)
+            logger.error('Error sending text page: %s', e)
+
+
+    def page_reports(self):
+        """
+        Send a text page about new incident reports, at most once per PAGER_WINDOW seconds
+          - The first report after a quiet period is paged right away
+          - Reports that arrive while the window is open are sent as one digest (a count and
+            the most common details) by the first report after it closes, or by the
+            send_report_pages command (run from cron) if no other report arrives
+
+        """
+
+        # A page was sent within the window, this report will be in the next digest
+        if not cache.add('pager_window', True, PAGER_WINDOW):
+            logger.debug('Incident report page deferred to the next digest')
+            return
+
+        now = jtz.now()
+
+        # Reports since the last page (if that is unknown, the last window)
+        since = cache.get('pager_sent')
+        if since == None:
+            since = now - datetime.timedelta(seconds=PAGER_WINDOW)
+
+        reports = Ireport.objects.filter(date__gt=since, date__lte=now)
+        count = reports.count()
+        cache.set('pager_sent', now, None)
+
+        if count == 0:
+            # Nothing to send, so do not hold the window open
+            cache.delete('pager_window')
+            return
+
+        # One report is paged as it always was
+        details = reports.values('detail').annotate(reports=Count('id')).order_by('-reports','detail')[:PAGER_DIGEST_TOP]
+        if count == 1:
+            self.page(details[0]['detail'])
+            return
+
+        message = '%s incident reports: %s' % (count, ' | '.join(['%s (x%s)' % (detail['detail'],detail['reports']) for detail in details]))
+        self.page(message)
 
 
     def email_event(self,id,email_id,set_timezone,new):
@@ -78,7 +131,7 @@ class email:
         """
 
 
-        logger.debug('Sending email for event: %s' % id)
+        logger.debug('Sending email for event: %s', id)
 
         # Obain the incident detail
         details = Event.objects.filter(id=id).values(
@@ -174,7 +227,7 @@ class email:
             msg.send()
         except Exception, e:
             # Log to the error log and return the error to the caller
-            logger.error('Error sending event email: %s' % e)
+            logger.error('Error sending event email: %s', e)
             return
 
         return 'success'
@@ -0,0 +1,175 @@
+#
+# Copyright 2015 - Tom Alessi
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""On demand request profiling for SSD
+
+   An admin arms profiling for one URL path with the fraction of its requests
+   to profile, the most profiles to capture and how long to stay armed.  The
+   armed state is kept in the cache so every process sees it, and the captures
+   are counted with cache.incr so they are not overrun when several processes
+   profile at once.
+
+   Each captured request is written to SSD_PROFILE_DIR as <name>.prof (cProfile
+   stats, for pstats, snakeviz or flameprof) and <name>.json (the request, its
+   timings, queries and cache misses).
+
+"""
+
+
+import datetime
+import json
+import logging
+import os
+import re
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+
+
+# Get an instance of the ssd logger
+logger = logging.getLogger(__name__)
+
+
+# Where the captures are written (profiling is unavailable if not set)
+PROFILE_DIR = getattr(settings, 'SSD_PROFILE_DIR', None)
+
+# How often (in seconds) each process checks whether profiling has been armed
+PROFILE_POLL = getattr(settings, 'SSD_PROFILE_POLL', 10)
+
+# Capture names are generated, anything else is refused
+NAME = re.compile(r'^[0-9]{8}T[0-9]{12}_[0-9a-f]{8}$')
+
+
+def arm(path, rate, count, minutes):
+    """Profile the given fraction of the requests to a path, until count
+    profiles have been captured or the minutes pass"""
+
+    armed = {
+        'id':uuid.uuid4().hex,
+        'path':path,
+        'rate':rate,
+        'count':count,
+        'expires':datetime.datetime.utcnow() + datetime.timedelta(minutes=minutes)
+    }
+
+    # Start the counter first, so the captures can always be claimed
+    cache.set('profile_taken_%s' % armed['id'], 0, minutes * 60)
+    cache.set('profile_armed', armed, minutes * 60)
+    logger.debug('Profiling armed for %s: %s', path, armed)
+
+
+def disarm():
+    """Stop profiling"""
+
+    cache.delete('profile_armed')
+    logger.debug('Profiling disarmed')
+
+
+def armed():
+    """The current profiling settings, or None if disarmed"""
+
+    return cache.get('profile_armed')
+
+
+def claim(armed):
+    """Claim one of the captures, returns False if they have all been taken"""
+
+    try:
+        taken = cache.incr('profile_taken_%s' % armed['id'])
+    except ValueError:
+        # The counter expired (or was evicted)
+        return False
+
+    # Whoever takes the last capture disarms
+    if taken >= armed['count']:
+        current = cache.get('profile_armed')
+        if current and current['id'] == armed['id']:
+            disarm()
+
+    return taken <= armed['count']
+
+
+def _path(name, ext):
+    """The file of a capture"""
+
+    if not NAME.match(name):
+        raise ValueError('Invalid profile name: %s' % name)
+
+    return os.path.join(PROFILE_DIR, '%s.%s' % (name, ext))
+
+
+def save(profile, meta):
+    """Write a profile and its metadata, returns the capture name"""
+
+    now = datetime.datetime.utcnow()
+    name = '%s_%s' % (now.strftime('%Y%m%dT%H%M%S%f'), uuid.uuid4().hex[:8])
+    meta = dict(meta, name=name, date=now.strftime('%Y-%m-%d %H:%M:%S UTC'))
+
+    if not os.path.isdir(PROFILE_DIR):
+        os.makedirs(PROFILE_DIR)
+
+    profile.dump_stats(_path(name, 'prof'))
+    f = open(_path(name, 'json'), 'w')
+    json.dump(meta, f, indent=2, sort_keys=True)
+    f.close()
+
+    logger.debug('Saved profile %s of %s', name, meta.get('path'))
+    return name
+
+
+def captures():
+    """The metadata of every capture, newest first"""
+
+    if not PROFILE_DIR or not os.path.isdir(PROFILE_DIR):
+        return []
+
+    found = []
+    for file in os.listdir(PROFILE_DIR):
+        name, ext = os.path.splitext(file)
+        if ext != '.json' or not NAME.match(name) or not os.path.exists(_path(name, 'prof')):
+            continue
+        try:
+            f = open(_path(name, 'json'))
+            meta = json.load(f)
+            f.close()
+        except (IOError, ValueError) as e:
+            logger.error('Unable to read profile %s: %s', name, e)
+            continue
+        meta['name'] = name
+        meta['size'] = os.path.getsize(_path(name, 'prof'))
+        found.append(meta)
+
+    return sorted(found, key=lambda meta: meta['name'], reverse=True)
+
+
+def open_capture(name):
+    """Open the profile of a capture for reading
+
+    Raises ValueError for an invalid name and IOError if it does not exist.
+
+    """
+
+    return open(_path(name, 'prof'), 'rb')
+
+
+def delete(name):
+    """Delete a capture"""
+
+    for ext in ('prof', 'json'):
+        if os.path.exists(_path(name, ext)):
+            os.remove(_path(name, ext))
+
+    logger.debug('Deleted profile %s', name)
@@ -0,0 +1,95 @@
+#
+# Copyright 2015 - Tom Alessi
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Rate limiting for SSD
+
+   Cache backed sliding window counters.  Up to 'capacity' requests are
+   allowed per 'period' seconds: each window of one period has its own counter
+   and the counter of the previous window is weighed by how much of it still
+   overlaps the last period.  Counters are only changed with cache.add, incr
+   and decr, which memcached does atomically, so concurrent requests (from any
+   process) cannot go over the limit.  Checking one never touches the database.
+
+"""
+
+import logging
+import math
+import time
+from django.conf import settings
+from django.core.cache import cache
+
+
+# Get an instance of the ssd logger
+logger = logging.getLogger(__name__)
+
+
+# Incident reports allowed per client IP and for all clients, as (capacity, period in seconds)
+IREPORT_RATE = getattr(settings, 'SSD_IREPORT_RATE', (5, 300))
+IREPORT_GLOBAL_RATE = getattr(settings, 'SSD_IREPORT_GLOBAL_RATE', (60, 60))
+
+# Request header holding the client IP when SSD is behind a proxy (e.g. HTTP_X_FORWARDED_FOR)
+CLIENT_IP_HEADER = getattr(settings, 'SSD_CLIENT_IP_HEADER', None)
+
+
+def client_ip(request):
+    """Obtain the IP address of the client"""
+
+    if CLIENT_IP_HEADER and CLIENT_IP_HEADER in request.META:
+        # The first address is the original client
+        return request.META[CLIENT_IP_HEADER].split(',')[0].strip()
+
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def consume(key, capacity, period):
+    """Count a request against a limit
+
+    Returns 0 if the request is allowed, otherwise the number of seconds until
+    it would be.  Rejected requests are not counted.
+
+    """
+
+    now = time.time()
+    window = int(now // period)
+    current = '%s_%s' % (key, window)
+
+    # The next window still weighs this counter, so keep it for two periods
+    cache.add(current, 0, period * 2)
+    try:
+        count = cache.incr(current)
+    except ValueError:
+        # Expired (or evicted) since it was added
+        cache.add(current, 1, period * 2)
+        count = 1
+
+    elapsed = now - window * period
+    previous = cache.get('%s_%s' % (key, window - 1), 0)
+    if previous * (period - elapsed) / period + count <= capacity:
+        return 0
+
+    # Over the limit, give the request back
+    try:
+        cache.decr(current)
+    except ValueError:
+        pass
+    count -= 1
+
+    if count >= capacity:
+        # Full for this window, wait for the next one
+        return int(math.ceil(period - elapsed))
+
+    # Wait until enough of the previous window has slid out
+    return max(1, int(math.ceil(period * (1 - float(capacity - count - 1) / previous) - elapsed)))
@@ -0,0 +1,109 @@
+#
+# Copyright 2015 - Tom Alessi
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Database router for the SSD project
+
+   Sends dashboard reads to a read replica (one of SSD_REPLICAS) when the
+   current request has been marked as replica safe by
+   ssd.dashboard.middleware.replica.ReplicaMiddleware.  Everything else,
+   including all writes, goes to the default (primary) database.
+
+   The cached data is shared by everyone, so it must not be rebuilt from a
+   replica that has not caught up with a write yet.  Every write marks the
+   cache (write_mark) and all reads stay on the primary for SSD_REPLICA_LAG
+   seconds afterwards.
+
+"""
+
+
+import threading
+from django.conf import settings
+from django.core.cache import cache
+
+
+# Per thread request state, set by the replica middleware
+state = threading.local()
+
+# How long (in seconds) the replicas may take to catch up with a write
+REPLICA_LAG = getattr(settings, 'SSD_REPLICA_LAG', 5)
+
+
+def replica_set(alias):
+    """Send dashboard reads for the current request to the given replica (or
+    back to the primary if alias is None)
+
+    """
+
+    state.replica = alias
+
+
+def replica_get():
+    """Obtain the replica in use for the current request (or None)"""
+
+    return getattr(state, 'replica', None)
+
+
+def write_mark():
+    """Keep every request on the primary until the replicas have caught up
+    with a write
+
+    Must be called before the cached data the write affects is cleared.
+
+    """
+
+    if getattr(settings, 'SSD_REPLICAS', []):
+        cache.set('replica_hold', 1, REPLICA_LAG)
+        state.wrote = True
+
+
+def wrote():
+    """Whether the current request has written anything (see write_mark)"""
+
+    return getattr(state, 'wrote', False)
+
+
+def wrote_reset():
+    """Start a new request without any writes"""
+
+    state.wrote = False
+
+
+def write_recent():
+    """Whether there was a write within the last SSD_REPLICA_LAG seconds"""
+
+    return cache.get('replica_hold') is not None
+
+
+class ReplicaRouter(object):
+
+    def db_for_read(self, model, **hints):
+        # Only the dashboard data is read from a replica
+        if model._meta.app_label == 'dashboard':
+            return replica_get()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replicas hold the same data as the primary
+        return True
+
+    def allow_syncdb(self, db, model):
+        # Replicas are populated by replication, not syncdb
+        if db in getattr(settings, 'SSD_REPLICAS', []):
+            return False
+        return None
@@ -0,0 +1,214 @@
+#
+# Copyright 2015 - Tom Alessi
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Incident report screenshot processing for SSD
+
+   Uploaded screenshots are saved as-is when a report is submitted and are
+   processed afterwards by 'python manage.py process_screenshots' (e.g. every
+   minute from cron):
+     - identical uploads (by SHA-256 of their content) are stored only once
+     - images larger than SSD_SCREENSHOT_MAX pixels, or in a format that does
+       not compress, are re-encoded
+     - a thumbnail of at most SSD_THUMBNAIL_SIZE pixels is generated for the
+       incident report list and detail pages
+
+"""
+
+import hashlib
+import io
+import logging
+from PIL import Image
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from ssd.dashboard.models import Ireport, Screenshot
+from ssd.dashboard.storage import upload_storage
+
+
+# Get an instance of the ssd logger
+logger = logging.getLogger(__name__)
+
+
+# Largest width/height (in pixels) that a screenshot is stored at
+SCREENSHOT_MAX = getattr(settings, 'SSD_SCREENSHOT_MAX', 1600)
+
+# Largest width/height (in pixels) of a thumbnail
+THUMBNAIL_SIZE = getattr(settings, 'SSD_THUMBNAIL_SIZE', 200)
+
+# Number of reports to process per run
+SCREENSHOT_BATCH = 100
+
+# The screenshot fields of an incident report
+FIELDS = ('screenshot1', 'screenshot2')
+
+# Formats that are kept as uploaded (if they are not oversized), with their extension
+FORMATS = {'JPEG':'.jpg', 'PNG':'.png', 'GIF':'.gif'}
+
+
+def encode(image):
+    """Encode an image, keeping transparency where there is some"""
+
+    output = io.BytesIO()
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image.save(output, 'PNG', optimize=True)
+        extension = '.png'
+    else:
+        image.convert('RGB').save(output, 'JPEG', quality=85, optimize=True)
+        extension = '.jpg'
+
+    return output.getvalue(), extension
+
+
+def store(name):
+    """Store an uploaded file once per unique content
+
+    Returns the name of the stored image, which may belong to an earlier upload
+    with the same content.
+
+    """
+
+    f = upload_storage.open(name)
+    try:
+        data = f.read()
+    finally:
+        f.close()
+
+    content_hash = hashlib.sha256(data).hexdigest()
+
+    # Identical to an earlier upload
+    existing = Screenshot.objects.filter(hash=content_hash).values('image')
+    if existing:
+        logger.debug('Screenshot %s is a duplicate of %s', name,existing[0]['image'])
+        return existing[0]['image']
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except (IOError, SyntaxError) as e:
+        # Not something we can decode, keep it as it is without a thumbnail
+        logger.error('Unable to process screenshot %s: %s', name,e)
+        Screenshot.objects.create(hash=content_hash, image=name, thumbnail='')
+        return name
+
+    # Re-encode oversized images and formats that do not compress
+    if max(image.size) > SCREENSHOT_MAX or not image.format in FORMATS:
+        image.thumbnail((SCREENSHOT_MAX, SCREENSHOT_MAX), Image.ANTIALIAS)
+        data, extension = encode(image)
+    else:
+        extension = FORMATS[image.format]
+
+    thumbnail = image.copy()
+    thumbnail.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.ANTIALIAS)
+    thumbnail_data, thumbnail_extension = encode(thumbnail)
+
+    # Content addressed names, spread over directories by the start of the hash
+    base = 'screenshots/%s/%s' % (content_hash[:2], content_hash)
+    image_name = upload_storage.save(base + extension, ContentFile(data))
+    thumbnail_name = upload_storage.save(base + '_thumb' + thumbnail_extension, ContentFile(thumbnail_data))
+
+    try:
+        with transaction.atomic():
+            Screenshot.objects.create(hash=content_hash, image=image_name, thumbnail=thumbnail_name)
+    except IntegrityError:
+        # Another process stored the same content first
+        upload_storage.delete(image_name)
+        upload_storage.delete(thumbnail_name)
+        return Screenshot.objects.filter(hash=content_hash).values('image')[0]['image']
+
+    return image_name
+
+
+def release(name):
+    """Delete an uploaded file (and its thumbnail) once no report uses it"""
+
+    if Ireport.objects.filter(Q(screenshot1=name) | Q(screenshot2=name)).exists():
+        return
+
+    for screenshot in Screenshot.objects.filter(image=name).values('id','thumbnail'):
+        if screenshot['thumbnail']:
+            upload_storage.delete(screenshot['thumbnail'])
+        Screenshot.objects.filter(id=screenshot['id']).delete()
+
+    try:
+        upload_storage.delete(name)
+    except (OSError, IOError):
+        pass
+
+
+def process(batch=SCREENSHOT_BATCH):
+    """Process the screenshots of reports that have not been processed yet
+
+    Returns the number of reports processed.
+
+    """
+
+    # Reports with a screenshot that is not a processed image
+    processed_images = Screenshot.objects.values('image')
+    pending = Q()
+    for field in FIELDS:
+        pending |= ~Q(**{field:''}) & ~Q(**{'%s__in' % field:processed_images})
+    reports = Ireport.objects.filter(pending).order_by('id').values('id','screenshot1','screenshot2')[:batch]
+
+    processed = 0
+    for report in reports:
+        changes = {}
+        for field in FIELDS:
+            name = report[field]
+            if not name or Screenshot.objects.filter(image=name).exists():
+                continue
+
+            image = store(name)
+            if image != name:
+                changes[field] = image
+
+        # Point the report at the stored images and remove the originals
+        if changes:
+            Ireport.objects.filter(id=report['id']).update(**changes)
+            for field in changes:
+                release(report[field])
+
+        processed += 1
+
+    logger.debug('Processed screenshots for %s incident reports', processed)
+
+    return processed
+
+
+def annotate(reports):
+    """Add the screenshot and thumbnail URLs to a list of incident report values
+
+    Adds screenshot1_url, screenshot2_url, thumbnail1_url and thumbnail2_url,
+    which are empty if there is no such file (thumbnails do not exist until the
+    screenshot has been processed).
+
+    """
+
+    reports = list(reports)
+
+    names = [report[field] for report in reports for field in FIELDS if report.get(field)]
+    thumbnails = dict(Screenshot.objects.filter(image__in=names).exclude(thumbnail='').values_list('image','thumbnail'))
+
+    for report in reports:
+        for number,field in enumerate(FIELDS, 1):
+            report['%s_url' % field] = ''
+            report['thumbnail%s_url' % number] = ''
+            if report.get(field):
+                report['%s_url' % field] = upload_storage.url(report[field])
+                if report[field] in thumbnails:
+                    report['thumbnail%s_url' % number] = upload_storage.url(thumbnails[report[field]])
+
+    return reports
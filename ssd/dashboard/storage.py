@@ -0,0 +1,198 @@
+#
+# Copyright 2015 - Tom Alessi
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Upload storage for SSD
+
+   Incident report screenshots are stored through upload_storage, which
+   resolves the configured backend (SSD_UPLOAD_STORAGE) and upload path
+   (Config_Ireport.upload_path) when it is used rather than when the models
+   are imported, so changes to the upload path take effect without a restart.
+
+   Backends:
+     - FileSystemUploadStorage: a local directory (the default)
+     - SharedUploadStorage: a directory shared by several nodes (e.g. NFS)
+     - Any other Django storage class (e.g. an object store backend), which
+       is configured through its own settings
+
+"""
+
+import errno
+import logging
+import os
+import tempfile
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import locks
+from django.core.files.storage import Storage, FileSystemStorage
+from django.utils.module_loading import import_by_path
+
+
+# Get an instance of the ssd logger
+logger = logging.getLogger(__name__)
+
+
+# The storage class used for uploads
+UPLOAD_STORAGE = getattr(settings, 'SSD_UPLOAD_STORAGE', 'ssd.dashboard.storage.FileSystemUploadStorage')
+
+# The URL that the upload location is served from (see wsgi.conf)
+UPLOAD_URL = getattr(settings, 'SSD_UPLOAD_URL', '/uploads/')
+
+
+def upload_path():
+    """Obtain the user defined upload location"""
+
+    # Imported here since the models import this module
+    from ssd.dashboard.models import Config_Ireport
+
+    path = cache.get('ireport_upload_path')
+    if path == None:
+        logger.debug('cache miss: ireport_upload_path')
+        path = Config_Ireport.objects.filter(id=Config_Ireport.objects.values('id')[0]['id']).values('upload_path')[0]['upload_path']
+        cache.set('ireport_upload_path', path)
+    else:
+        logger.debug('cache hit: ireport_upload_path')
+
+    return path
+
+
+def local():
+    """Determine if the upload backend stores files in a local/shared directory"""
+
+    return issubclass(import_by_path(UPLOAD_STORAGE), FileSystemStorage)
+
+
+class FileSystemUploadStorage(FileSystemStorage):
+    """Store uploads in a local directory served from UPLOAD_URL"""
+
+    def __init__(self, location=None, base_url=None):
+        if base_url == None:
+            base_url = UPLOAD_URL
+        super(FileSystemUploadStorage, self).__init__(location=location, base_url=base_url)
+
+
+class SharedUploadStorage(FileSystemUploadStorage):
+    """Store uploads in a directory shared by all nodes
+
+    Each upload is written to a temporary file in the destination directory and
+    then linked into place, so other nodes never see a partially written file and
+    two nodes can never overwrite each other's uploads.
+
+    """
+
+    def _save(self, name, content):
+        full_path = self.path(name)
+
+        # Create any intermediate directories that do not exist
+        directory = os.path.dirname(full_path)
+        if not os.path.exists(directory):
+            try:
+                os.makedirs(directory)
+            except OSError as e:
+                # Another node created it first
+                if e.errno != errno.EEXIST:
+                    raise
+
+        # Write the upload to a temporary file next to the destination
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                locks.lock(f, locks.LOCK_EX)
+                for chunk in content.chunks():
+                    f.write(chunk)
+
+            # Link it into place, choosing a new name if someone else took this one
+            while True:
+                try:
+                    os.link(tmp_path, full_path)
+                    break
+                except OSError as e:
+                    if e.errno != errno.EEXIST:
+                        raise
+                    name = self.get_available_name(name)
+                    full_path = self.path(name)
+        finally:
+            os.remove(tmp_path)
+
+        if settings.FILE_UPLOAD_PERMISSIONS is not None:
+            os.chmod(full_path, settings.FILE_UPLOAD_PERMISSIONS)
+
+        return name
+
+
+class UploadStorage(Storage):
+    """Storage that hands every operation to the configured upload backend"""
+
+    def __init__(self):
+        # Backends already built by this process, by upload path
+        self._backends = {}
+
+    def backend(self):
+        """Obtain the backend for the current upload path"""
+
+        path = upload_path()
+        if not path in self._backends:
+            storage_class = import_by_path(UPLOAD_STORAGE)
+
+            # Directory backends are rooted at the upload path, others configure themselves
+            if issubclass(storage_class, FileSystemStorage):
+                self._backends[path] = storage_class(location=path)
+            else:
+                self._backends[path] = storage_class()
+
+        return self._backends[path]
+
+    def open(self, name, mode='rb'):
+        return self.backend().open(name, mode)
+
+    def save(self, name, content):
+        return self.backend().save(name, content)
+
+    def get_valid_name(self, name):
+        return self.backend().get_valid_name(name)
+
+    def get_available_name(self, name):
+        return self.backend().get_available_name(name)
+
+    def path(self, name):
+        return self.backend().path(name)
+
+    def delete(self, name):
+        return self.backend().delete(name)
+
+    def exists(self, name):
+        return self.backend().exists(name)
+
+    def listdir(self, path):
+        return self.backend().listdir(path)
+
+    def size(self, name):
+        return self.backend().size(name)
+
+    def url(self, name):
+        return self.backend().url(name)
+
+    def accessed_time(self, name):
+        return self.backend().accessed_time(name)
+
+    def created_time(self, name):
+        return self.backend().created_time(name)
+
+    def modified_time(self, name):
+        return self.backend().modified_time(name)
+
+
+# The storage used by the incident report screenshots
+upload_storage = UploadStorage()
@@ -0,0 +1,197 @@
+#
+# Copyright 2015 - Tom Alessi
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Request tracing for SSD
+
+   A trace records where the time of one request goes:
+     - sql: the queries run on every database connection
+     - cache: the cache calls (and how many of the keys read were missing)
+     - render: the template rendering
+
+   The cache and template instrumentation is only installed (by install) when
+   tracing is enabled or a request is profiled, and does nothing for the
+   requests that are not being traced.  Queries are only recorded while a
+   trace is running.
+
+"""
+
+
+import threading
+import time
+from functools import wraps
+from django.core.cache import cache
+from django.db import connections
+from django.template.base import Template
+
+
+# The trace of the request being handled by this thread (if any)
+_local = threading.local()
+
+# Guards installing the instrumentation once per process
+_install_lock = threading.Lock()
+_installed = False
+
+# The cache methods that are timed
+CACHE_METHODS = ('get','get_many','set','set_many','add','delete','delete_many','incr','decr')
+
+
+class Trace(object):
+    """The spans collected for one request"""
+
+    def __init__(self):
+        self.view = None
+        self.status = None
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.cache_count = 0
+        self.cache_misses = 0
+        self.cache_time = 0.0
+        self.render_time = 0.0
+        self.total_time = 0.0
+
+        # Nested calls (e.g. included templates) are only timed once
+        self._depth = {'cache':0, 'render':0}
+
+        # Record the queries of every connection used by this thread
+        self._queries = {}
+        for connection in connections.all():
+            self._queries[connection.alias] = (connection.use_debug_cursor, len(connection.queries))
+            connection.use_debug_cursor = True
+
+        self._start = time.time()
+
+    def snapshot(self):
+        """Collect the time and queries so far, leaving the trace running"""
+
+        self.total_time = time.time() - self._start
+
+        self.sql_count = 0
+        self.sql_time = 0.0
+        for connection in connections.all():
+            queries = connection.queries[self._queries.get(connection.alias, (None, 0))[1]:]
+            self.sql_count += len(queries)
+            self.sql_time += sum([float(query['time']) for query in queries])
+
+        return self.fields()
+
+    def finish(self):
+        """Stop timing and collect the queries"""
+
+        self.snapshot()
+
+        for connection in connections.all():
+            if connection.alias in self._queries:
+                connection.use_debug_cursor = self._queries[connection.alias][0]
+
+    def fields(self):
+        """The trace as a list of (name, value) pairs (times in milliseconds)"""
+
+        return [
+            ('view', self.view),
+            ('status', self.status),
+            ('total_ms', round(self.total_time * 1000, 1)),
+            ('sql', self.sql_count),
+            ('sql_ms', round(self.sql_time * 1000, 1)),
+            ('cache', self.cache_count),
+            ('cache_miss', self.cache_misses),
+            ('cache_ms', round(self.cache_time * 1000, 1)),
+            ('render_ms', round(self.render_time * 1000, 1)),
+        ]
+
+    def __str__(self):
+        return ' '.join(['%s=%s' % field for field in self.fields()])
+
+
+def current():
+    """The trace running in this thread, or None"""
+
+    return getattr(_local, 'trace', None)
+
+
+def start():
+    """Start tracing the request handled by this thread"""
+
+    stop()
+    _local.trace = Trace()
+    return _local.trace
+
+
+def stop():
+    """Stop the trace running in this thread (if any) and return it"""
+
+    trace = current()
+    _local.trace = None
+    if trace:
+        trace.finish()
+    return trace
+
+
+def _span(kind, function, account):
+    """Wrap a function so that its time (and result) is added to the current
+    trace, if there is one
+
+    account(trace, seconds, args, result) records the call.
+
+    """
+
+    @wraps(function)
+    def _traced(*args, **kwargs):
+        trace = current()
+        if trace is None or trace._depth[kind]:
+            return function(*args, **kwargs)
+
+        trace._depth[kind] += 1
+        started = time.time()
+        try:
+            result = function(*args, **kwargs)
+        finally:
+            trace._depth[kind] -= 1
+        account(trace, time.time() - started, args, result)
+        return result
+    return _traced
+
+
+def _cache_account(method):
+    def account(trace, seconds, args, result):
+        trace.cache_count += 1
+        trace.cache_time += seconds
+        if method == 'get' and result is None:
+            trace.cache_misses += 1
+        elif method == 'get_many':
+            trace.cache_misses += len(args[0]) - len(result)
+    return account
+
+
+def _render_account(trace, seconds, args, result):
+    trace.render_time += seconds
+
+
+def install():
+    """Install the cache and template instrumentation (once)"""
+
+    global _installed
+
+    with _install_lock:
+        if _installed:
+            return
+
+        # Every module shares the one default cache object
+        for method in CACHE_METHODS:
+            setattr(cache, method, _span('cache', getattr(cache, method), _cache_account(method)))
+
+        Template.render = _span('render', Template.render, _render_account)
+
+        _installed = True
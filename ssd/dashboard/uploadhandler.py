@@ -0,0 +1,119 @@
+#
+# Copyright 2015 - Tom Alessi
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Upload handler for SSD incident reports
+
+   Enforces the incident report screenshot size limit while the upload is
+   streamed in, rather than after Django has buffered every file.  A request
+   that is too large is rejected from its Content-Length without reading the
+   body, and a file that grows past the limit stops the upload at that chunk
+   (the rest of the body is then read and discarded, so the client gets the
+   error page rather than a connection reset).
+
+   When an upload is rejected, request.upload_error is set to a tuple of
+   (field name or None, error message) for the view to report.
+
+"""
+
+import logging
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from django.http import QueryDict
+from django.utils.datastructures import MultiValueDict
+from ssd.dashboard.models import Config_Ireport
+
+
+# Get an instance of the ssd logger
+logger = logging.getLogger(__name__)
+
+
+# Number of screenshots that may be uploaded with a report
+SCREENSHOTS = 2
+
+# Allowance for the non file form fields and multipart headers in a request
+FORM_OVERHEAD = 16384
+
+
+def ireport_file_size():
+    """Obtain the maximum size of a single screenshot"""
+
+    file_size = cache.get('ireport_file_size')
+    if file_size == None:
+        logger.debug('cache miss: ireport_file_size')
+        file_size = Config_Ireport.objects.filter(id=Config_Ireport.objects.values('id')[0]['id']).values('file_size')[0]['file_size']
+        cache.set('ireport_file_size', file_size)
+    else:
+        logger.debug('cache hit: ireport_file_size')
+
+    return file_size
+
+
+class IreportUploadHandler(FileUploadHandler):
+    """Enforce the per file and per request screenshot limits
+
+    This handler must run before the default handlers; it passes the data on
+    untouched and only stops the upload when a limit is exceeded.
+
+    """
+
+    def __init__(self, request=None):
+        super(IreportUploadHandler, self).__init__(request)
+
+        # Read the limits once per request
+        self.file_size = ireport_file_size()
+        self.total_size = getattr(settings, 'SSD_IREPORT_UPLOAD_TOTAL', self.file_size * SCREENSHOTS)
+
+        # Bytes received for the current file and for the whole request
+        self.size = 0
+        self.received = 0
+
+    def abort(self, field_name, message):
+        """Record the reason an upload was rejected"""
+
+        logger.debug('Upload rejected: %s', message)
+        self.request.upload_error = (field_name, message)
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        # The request can never be valid, so do not read any of it
+        if content_length > self.total_size + FORM_OVERHEAD:
+            self.abort(None, 'Upload too large (%s bytes) - please reduce the total size of the uploads to below %s bytes.' % (content_length,self.total_size))
+            return QueryDict('', encoding=encoding), MultiValueDict()
+
+        return None
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None):
+        super(IreportUploadHandler, self).new_file(field_name, file_name, content_type, content_length, charset)
+        self.size = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.size += len(raw_data)
+        self.received += len(raw_data)
+
+        if self.size > self.file_size:
+            self.abort(self.field_name, 'File too large - please reduce the size of the upload to below %s bytes.' % self.file_size)
+            raise StopUpload()
+
+        if self.received > self.total_size:
+            self.abort(self.field_name, 'Uploads too large - please reduce the total size of the uploads to below %s bytes.' % self.total_size)
+            raise StopUpload()
+
+        # Hand the data to the next handler
+        return raw_data
+
+    def file_complete(self, file_size):
+        # The next handler builds the uploaded file
+        return None
@@ -19,14 +19,16 @@
 
 import logging
 from django.conf import settings
-from django.core.cache import cache, get_cache
+from django.core.cache import get_cache
 from ssd.dashboard.decorators import staff_member_required_ssd
 from django.shortcuts import render_to_response
+from django.http import HttpResponse, HttpResponseRedirect
 from django.template import RequestContext
 from django.contrib import messages
 from django import get_version
 from ssd.dashboard.models import Config_Admin
-from ssd.dashboard.forms import AdminConfigForm
+from ssd.dashboard.forms import AdminConfigForm, ArmProfileForm, ProfileForm
+from ssd.dashboard import cachetags, profiler
 
 
 # Get an instance of the ssd logger
@@ -39,7 +41,7 @@ def main(request):
 
     """
 
-    logger.debug('%s view being executed.' % 'admin.main')
+    logger.debug('%s view being executed.', 'admin.main')
 
     # Print the page
     return render_to_response(
@@ -58,7 +60,7 @@ def cache_status(request):
 
     """
 
-    logger.debug('%s view being executed.' % 'admin.cache_status')
+    logger.debug('%s view being executed.', 'admin.cache_status')
 
     m_stats = []
 
@@ -98,7 +100,7 @@ def cache_status(request):
                         rows[key].append(value)
 
         except Exception as e:
-            logger.error('Cannot obtain cache settings: %s' % e)
+            logger.error('Cannot obtain cache settings: %s', e)
     else:
         logger.debug('No caches are defined.')
 
@@ -123,14 +125,14 @@ def admin_config(request):
 
     """
 
-    logger.debug('%s view being executed.' % 'admin.admin_config')
+    logger.debug('%s view being executed.', 'admin.admin_config')
 
     # If this is a POST, then validate the form and save the data
     if request.method == 'POST':
 
         # Check the form elements
         form = AdminConfigForm(request.POST)
-        logger.debug('Form submit (POST): %s, with result: %s' % ('AdminConfigForm',form))
+        logger.debug('Form submit (POST): %s, with result: %s', 'AdminConfigForm',form)
 
         if form.is_valid():
             # Obtain the cleaned data
@@ -140,7 +142,7 @@ def admin_config(request):
             Config_Admin.objects.filter(id=Config_Admin.objects.values('id')[0]['id']).update(link_enabled=link_enabled)
 
             # Clear the cache
-            cache.delete('display_admin')
+            cachetags.invalidate('config')
 
             # Set a success message
             messages.add_message(request, messages.SUCCESS, 'Preferences saved successfully')
@@ -167,4 +169,130 @@ def admin_config(request):
           'nav_sub':'admin_config'
        },
        context_instance=RequestContext(request)
-    )
\ No newline at end of file
+    )
+
+
+@staff_member_required_ssd
+def profiles(request):
+    """Request Profiling View
+
+    Arm profiling for a URL path and list the captured profiles
+
+    """
+
+    logger.debug('%s view being executed.', 'admin.profiles')
+
+    # If this is a POST, then validate the form and arm profiling
+    if request.method == 'POST':
+
+        # Check the form elements
+        form = ArmProfileForm(request.POST)
+        logger.debug('Form submit (POST): %s, with result: %s', 'ArmProfileForm',form)
+
+        if form.is_valid():
+            # Obtain the cleaned data
+            path = form.cleaned_data['path']
+            rate = form.cleaned_data['rate']
+            count = form.cleaned_data['count']
+            minutes = form.cleaned_data['minutes']
+
+            profiler.arm(path, rate, count, minutes)
+
+            # Set a success message
+            messages.add_message(request, messages.SUCCESS, 'Profiling armed for %s.' % path)
+
+            # Redirect to the profiling page
+            return HttpResponseRedirect('/admin/profiles')
+        else:
+            messages.add_message(request, messages.ERROR, 'Invalid data entered, please correct the errors below:')
+
+    # Not a POST or a failed form submit
+    else:
+        # Create a blank form
+        form = ArmProfileForm()
+
+    # Print the page
+    return render_to_response(
+       'admin/profiles.html',
+       {
+          'title':'System Status Dashboard | Admin - Request Profiling',
+          'form':form,
+          'enabled':bool(profiler.PROFILE_DIR),
+          'armed':profiler.armed(),
+          'poll':profiler.PROFILE_POLL,
+          'captures':profiler.captures(),
+          'nav_section':'admin',
+          'nav_sub':'profiles'
+       },
+       context_instance=RequestContext(request)
+    )
+
+
+@staff_member_required_ssd
+def profile_disarm(request):
+    """Stop profiling"""
+
+    logger.debug('%s view being executed.', 'admin.profile_disarm')
+
+    if request.method == 'POST':
+        profiler.disarm()
+        messages.add_message(request, messages.SUCCESS, 'Profiling disarmed.')
+    else:
+        messages.add_message(request, messages.ERROR, 'Invalid request.')
+
+    return HttpResponseRedirect('/admin/profiles')
+
+
+@staff_member_required_ssd
+def profile_download(request):
+    """Download a captured profile"""
+
+    logger.debug('%s view being executed.', 'admin.profile_download')
+
+    # Check the form elements
+    form = ProfileForm(request.GET)
+    logger.debug('Form submit (GET): %s, with result: %s', 'ProfileForm',form)
+
+    if form.is_valid():
+        name = form.cleaned_data['name']
+
+        try:
+            f = profiler.open_capture(name)
+        except IOError:
+            messages.add_message(request, messages.ERROR, 'That profile no longer exists, perhaps someone else deleted it?')
+            return HttpResponseRedirect('/admin/profiles')
+
+        response = HttpResponse(f.read(), content_type='application/octet-stream')
+        f.close()
+        response['Content-Disposition'] = 'attachment; filename="ssd_%s.prof"' % name
+
+        return response
+
+    # Invalid request
+    messages.add_message(request, messages.ERROR, 'Invalid request.')
+    return HttpResponseRedirect('/admin/profiles')
+
+
+@staff_member_required_ssd
+def profile_delete(request):
+    """Delete a captured profile"""
+
+    logger.debug('%s view being executed.', 'admin.profile_delete')
+
+    if request.method == 'POST':
+
+        # Check the form elements
+        form = ProfileForm(request.POST)
+        logger.debug('Form submit (POST): %s, with result: %s', 'ProfileForm',form)
+
+        if form.is_valid():
+            profiler.delete(form.cleaned_data['name'])
+
+            # Set a message that delete was successful
+            messages.add_message(request, messages.SUCCESS, 'Profile successfully deleted.')
+
+            return HttpResponseRedirect('/admin/profiles')
+
+    # Invalid request
+    messages.add_message(request, messages.ERROR, 'Invalid request.')
+    return HttpResponseRedirect('/admin/profiles')
@@ -0,0 +1,46 @@
+#
+# Copyright 2015 - Tom Alessi
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""This module contains all of the service availability functions of SSD."""
+
+
+import json
+import logging
+from django.http import HttpResponse
+from ssd.dashboard import availability as engine
+
+
+# Get an instance of the ssd logger
+logger = logging.getLogger(__name__)
+
+
+def availability(request):
+    """Service Availability View
+
+    Return the 30/90/365 day availability percentages of all services (JSON)
+
+    """
+
+    logger.debug('%s view being executed.', 'availability.availability')
+
+    services = []
+    for row in engine.get():
+        services.append({
+                         'service':row['service'],
+                         'availability':dict(('%s' % window, row['d%s' % window]) for window in engine.WINDOWS)
+                        })
+
+    return HttpResponse(json.dumps({'services':services}), content_type='application/json')
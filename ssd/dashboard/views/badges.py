@@ -0,0 +1,89 @@
+#
+# Copyright 2015 - Tom Alessi
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""This module contains all of the service badge functions of SSD."""
+
+
+import logging
+from django.http import HttpResponse, HttpResponseNotModified, HttpResponseBadRequest, Http404
+from django.utils.cache import patch_cache_control
+from ssd.dashboard import badges as engine
+from ssd.dashboard import functions
+from ssd.dashboard.forms import BadgeForm
+
+
+# Get an instance of the ssd logger
+logger = logging.getLogger(__name__)
+
+
+# Content type of each badge format
+CONTENT_TYPES = {'svg':'image/svg+xml', 'json':'application/json'}
+
+
+def _badge(request, format):
+    """Serve the precomputed badge of a service in the requested format"""
+
+    form = BadgeForm(request.GET)
+    logger.debug('Form submit (GET): %s, with result: %s', 'BadgeForm',form)
+
+    if not form.is_valid():
+        return HttpResponseBadRequest('Invalid request')
+
+    # The badges are built along with the timeline
+    service = form.cleaned_data['service']
+    ns = engine.namespace()
+    badge = engine.get(ns, service)
+    if not badge:
+        # Not cached (e.g. evicted), build it from the timeline
+        badge = engine.build_one(ns, functions.timeline_get(logger), service)
+        if not badge:
+            raise Http404
+
+    etag = badge['%s_etag' % format]
+    if request.META.get('HTTP_IF_NONE_MATCH') == etag:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(badge[format], content_type=CONTENT_TYPES[format])
+
+    # Let browsers and proxies keep it, they can revalidate cheaply with the ETag
+    response['ETag'] = etag
+    response['Access-Control-Allow-Origin'] = '*'
+    patch_cache_control(response, public=True, max_age=engine.BADGE_MAX_AGE)
+    return response
+
+
+def svg(request):
+    """SVG Badge View
+
+    Show the current status of a service (?service=<name>) as an SVG image
+
+    """
+
+    logger.debug('%s view being executed.', 'badges.svg')
+
+    return _badge(request, 'svg')
+
+
+def json(request):
+    """JSON Badge View
+
+    Show the current status of a service (?service=<name>) as JSON
+
+    """
+
+    logger.debug('%s view being executed.', 'badges.json')
+
+    return _badge(request, 'json')
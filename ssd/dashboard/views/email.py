@@ -39,14 +39,14 @@ def email_config(request):
 
     """
 
-    logger.debug('%s view being executed.' % 'email.email_config')
+    logger.debug('%s view being executed.', 'email.email_config')
 
     # If this is a POST, then validate the form and save the data
     if request.method == 'POST':
 
         # Check the form elements
         form = EmailConfigForm(request.POST)
-        logger.debug('Form submit (POST): %s, with result: %s' % ('EmailConfigForm',form))
+        logger.debug('Form submit (POST): %s, with result: %s', 'EmailConfigForm',form)
 
         if form.is_valid():
             # Obtain the cleaned data
@@ -118,14 +118,14 @@ def email_recipients(request):
 
     """
 
-    logger.debug('%s view being executed.' % 'email.email_recipients')
+    logger.debug('%s view being executed.', 'email.email_recipients')
 
     # If this is a POST, then validate the form and save the data
     if request.method == 'POST':
 
         # Check the form elements
         form = AddRecipientForm(request.POST)
-        logger.debug('Form submit (POST): %s, with result: %s' % ('AddRecipientForm',form))
+        logger.debug('Form submit (POST): %s, with result: %s', 'AddRecipientForm',form)
 
         if form.is_valid():
 
@@ -170,7 +170,7 @@ def email_recipients(request):
 def recipient_delete(request):
     """Remove Email Recipients"""
 
-    logger.debug('%s view being executed.' % 'email.recipient_delete')
+    logger.debug('%s view being executed.', 'email.recipient_delete')
 
     # If this is a POST, then validate the form and save the data, otherise send them
     # to the main recipients page
@@ -178,7 +178,7 @@ def recipient_delete(request):
 
         # Check the form elements
         form = DeleteRecipientForm(request.POST)
-        logger.debug('Form submit (POST): %s, with result: %s' % ('DeleteRecipientForm',form))
+        logger.debug('Form submit (POST): %s, with result: %s', 'DeleteRecipientForm',form)
 
         if form.is_valid():
 
@@ -207,7 +207,7 @@ def recipient_delete(request):
 
     # Make sure we have an ID and we are confirming that the recipient should be removed
     form = DeleteRecipientForm(request.GET)
-    logger.debug('Form submit (GET): %s, with result: %s' % ('DeleteRecipientForm',form))
+    logger.debug('Form submit (GET): %s, with result: %s', 'DeleteRecipientForm',form)
 
     if form.is_valid():
 
@@ -250,14 +250,14 @@ def recipient_modify(request):
 
     """
 
-    logger.debug('%s view being executed.' % 'email.recipient_modify')
+    logger.debug('%s view being executed.', 'email.recipient_modify')
 
     # If this is a POST, then validate the form and save the data, otherise do nothing
     if request.method == 'POST':
 
         # Check the form elements
         form = XEditableModifyForm(request.POST)
-        logger.debug('Form submit (POST): %s, with result: %s' % ('XEditableModifyForm',form))
+        logger.debug('Form submit (POST): %s, with result: %s', 'XEditableModifyForm',form)
 
         if form.is_valid():
             pk = form.cleaned_data['pk']
@@ -266,7 +266,7 @@ def recipient_modify(request):
 
             # Add the column we are updating (but only allow specific values)
             if not name == 'email':
-                logger.error('Invalid column specified during recipient modification: %s' % name)
+                logger.error('Invalid column specified during recipient modification: %s', name)
                 return HttpResponseBadRequest('An error was encountered with this request.')
 
             filter = {}
@@ -282,15 +282,15 @@ def recipient_modify(request):
             try:
                 Email.objects.filter(id=pk).update(**filter)
             except Exception as e:
-                logger.error('%s: Error saving update: %s' % ('email.recipient_modify',e))
+                logger.error('%s: Error saving update: %s', 'email.recipient_modify',e)
                 return HttpResponseBadRequest('An error was encountered with this request.')
 
             return HttpResponse('Value successfully modified')
 
         else:
-            logger.error('%s: invalid form: %s' % ('email.recipient_modify',form.errors))
+            logger.error('%s: invalid form: %s', 'email.recipient_modify',form.errors)
             return HttpResponseBadRequest('Invalid request')
     else:
-        logger.error('%s: Invalid request: GET received but only POST accepted.' % ('email.recipient_modify'))
+        logger.error('%s: Invalid request: GET received but only POST accepted.', 'email.recipient_modify')
         messages.add_message(request, messages.ERROR, 'Invalid request.')
         return HttpResponseRedirect('/admin/email_recipients')
@@ -24,16 +24,27 @@ from ssd.dashboard.decorators import staff_member_required_ssd
 from django.shortcuts import render_to_response
 from django.http import HttpResponse, HttpResponseRedirect, HttpResponseBadRequest
 from django.template import RequestContext
-from django.db.models import F
 from django.contrib import messages
 from ssd.dashboard.models import Config_Escalation, Escalation
-from ssd.dashboard.forms import AddContactForm, EscalationConfigForm, XEditableModifyForm, SwitchContactForm, RemoveContactForm
+from ssd.dashboard.forms import AddContactForm, EscalationConfigForm, XEditableModifyForm, SwitchContactForm, RemoveContactForm, ReorderContactsForm
+from ssd.dashboard import cachetags
+from ssd.dashboard import escalation as engine
 
 
 # Get an instance of the ssd logger
 logger = logging.getLogger(__name__)
 
 
+@cachetags.cached('escalation_page', ('escalation',))
+def _escalation():
+    """Obtain the shown escalation contacts and the instructions"""
+
+    return {
+        'contacts':list(Escalation.objects.filter(hidden=False).values('id','name','contact_details').order_by('order')),
+        'instructions':Config_Escalation.objects.filter(id=Config_Escalation.objects.values('id')[0]['id']).values('instructions')[0]['instructions']
+    }
+
+
 def escalation(request):
     """Escalation page
 
@@ -42,7 +53,7 @@ def escalation(request):
 
     """
 
-    logger.debug('%s view being executed.' % 'escalation.escalation')
+    logger.debug('%s view being executed.', 'escalation.escalation')
 
     # If this functionality is disabled in the admin, let the user know
     enable_escalation = cache.get('enable_escalation')
@@ -54,16 +65,16 @@ def escalation(request):
         messages.add_message(request, messages.ERROR, 'Your system administrator has disabled the escalation path functionality')
         return HttpResponseRedirect('/')
 
-    # Obtain the escalation contacts
-    contacts = Escalation.objects.filter(hidden=False).values('id','name','contact_details').order_by('order')
+    # Obtain the escalation contacts and instructions
+    page = _escalation()
 
     # Print the page
     return render_to_response(
        'escalation/escalation.html',
        {
           'title':'System Status Dashboard | Escalation Path',
-          'contacts':contacts,
-          'instructions':Config_Escalation.objects.filter(id=Config_Escalation.objects.values('id')[0]['id']).values('instructions')[0]['instructions']
+          'contacts':page['contacts'],
+          'instructions':page['instructions']
        },
        context_instance=RequestContext(request)
     )
@@ -75,14 +86,14 @@ def escalation_config(request):
 
     """
 
-    logger.debug('%s view being executed.' % 'escalation.escalation_config')
+    logger.debug('%s view being executed.', 'escalation.escalation_config')
 
     # If this is a POST, then validate the form and save the data
     if request.method == 'POST':
 
         # Check the form elements
         form = EscalationConfigForm(request.POST)
-        logger.debug('Form submit (POST): %s, with result: %s' % ('EscalationConfigForm',form))
+        logger.debug('Form submit (POST): %s, with result: %s', 'EscalationConfigForm',form)
 
         if form.is_valid():
             # Obtain the cleaned data
@@ -93,7 +104,7 @@ def escalation_config(request):
             Config_Escalation.objects.filter(id=Config_Escalation.objects.values('id')[0]['id']).update(enabled=enabled,instructions=instructions)
 
             # Clear the cache
-            cache.delete('enable_escalation')
+            cachetags.invalidate('escalation')
 
             # Set a success message
             messages.add_message(request, messages.SUCCESS, 'Escalation configuration saved successfully')
@@ -129,34 +140,27 @@ def escalation_contacts(request):
 
     """
 
-    logger.debug('%s view being executed.' % 'escalation.escalation_contacts')
+    logger.debug('%s view being executed.', 'escalation.escalation_contacts')
 
     # If this is a POST, then validate the form and save the data
     if request.method == 'POST':
 
         # Check the form elements
         form = AddContactForm(request.POST)
-        logger.debug('Form submit (POST): %s, with result: %s' % ('AddContactForm',form))
+        logger.debug('Form submit (POST): %s, with result: %s', 'AddContactForm',form)
 
         if form.is_valid():
             name = form.cleaned_data['name']
             contact_details = form.cleaned_data['contact_details']
 
-            # Obtain the last entry
-            order = Escalation.objects.values('order').order_by('-order')[:1]
-
-            # If there are no entries, this will be 1
-            if not order:
-                order = 1
-            # Increase the order by 1
-            else:
-                order = order[0]['order'] + 1
-
+            # Add it to the end of the order
             # Don't allow duplicates
             try:
-                Escalation(order=order,name=name,contact_details=contact_details,hidden=True).save()
+                engine.append(name=name,contact_details=contact_details,hidden=True)
             except IntegrityError:
                 pass
+            else:
+                cachetags.invalidate('escalation')
 
             # Send them back so they can see the newly created email addresses
             # incident
@@ -192,7 +196,7 @@ def escalation_contacts(request):
 def contact_switch(request):
     """Switch Contacts Around or Hide Them"""
 
-    logger.debug('%s view being executed.' % 'escalation.contact_switch')
+    logger.debug('%s view being executed.', 'escalation.contact_switch')
 
     # If this is a GET, then validate the form and save the data, otherise send them
     # to the main escalation page
@@ -200,15 +204,12 @@ def contact_switch(request):
 
         # Check the form elements
         form = SwitchContactForm(request.GET)
-        logger.debug('Form submit (GET): %s, with result: %s' % ('SwitchContactForm',form))
+        logger.debug('Form submit (GET): %s, with result: %s', 'SwitchContactForm',form)
 
         if form.is_valid():
             id = form.cleaned_data['id']
             action = form.cleaned_data['action']
 
-            # Obtain all id's and orders and put into a dictionary
-            orders = Escalation.objects.values('id','order').order_by('order')
-
             # Run through the orders and see if we need to change anything
             # If we are moving up, switch places with the previous
             # If we are moving down, switch places with the next
@@ -216,49 +217,14 @@ def contact_switch(request):
             # If we are unhiding, add to the end
 
 
-            # Move this up, meaning decrease the order (only if greater than 1)
-            if action == 'up':
-
-                # Get the order
-                id_order = Escalation.objects.filter(id=id).values('order')[0]['order']
-
-                # If the order if greater than 1, move it
-                if id_order > 1:
+            # Move this up or down (nothing happens at the top or bottom)
+            if action == 'up' or action == 'down':
 
-                    # Get the id of the one before this one so we can switch places with it
-                    after_order = id_order - 1
-                    after_id = Escalation.objects.filter(order=after_order).values('id')[0]['id']
-
-                    # Switch places
-                    Escalation.objects.filter(id=id).update(order=F('order')-1)
-                    Escalation.objects.filter(id=after_id).update(order=F('order')+1)
-
-                # Set a success message
-                messages.add_message(request, messages.SUCCESS, 'Escalation contacts successfully modified.')
-
-            # Move this down, meaning increase the order
-            elif action == "down":
-
-                # Get the order
-                id_order = Escalation.objects.filter(id=id).values('order')[0]['order']
-
-                # If it's already at the bottom, don't do anything
-                # Get a count of contacts
-                contacts_count = Escalation.objects.count()
-
-                # If the order is less than the total, move it down (otherwise it's already at the bottom)
-                if id_order < contacts_count:
-
-                    # Get the id of the one after this one so we can switch places with it
-                    after_order = id_order + 1
-                    after_id = Escalation.objects.filter(order=after_order).values('id')[0]['id']
-
-                    # Switch places
-                    Escalation.objects.filter(id=id).update(order=F('order')+1)
-                    Escalation.objects.filter(id=after_id).update(order=F('order')-1)
-
-                # Set a success message
-                messages.add_message(request, messages.SUCCESS, 'Escalation contacts successfully modified.')
+                if engine.move(id, -1 if action == 'up' else 1):
+                    # Set a success message
+                    messages.add_message(request, messages.SUCCESS, 'Escalation contacts successfully modified.')
+                else:
+                    messages.add_message(request, messages.ERROR, 'That contact has been removed, perhaps someone else deleted it?')
 
             # Hide
             elif action == 'hide':
@@ -277,6 +243,9 @@ def contact_switch(request):
                 # Set an error message
                 messages.add_message(request, messages.ERROR, 'Unknown request type - contact not modified.')
 
+            # Clear the cache
+            cachetags.invalidate('escalation')
+
         # Invalid form
         else:
             messages.add_message(request, messages.ERROR, 'There was an error processing your request: %s' % form.errors)
@@ -285,38 +254,63 @@ def contact_switch(request):
     return HttpResponseRedirect('/admin/escalation_contacts')
 
 
+@staff_member_required_ssd
+def contact_reorder(request):
+    """Set the order of all contacts
+        - This occurs only via AJAX (drag and drop) from the escalation_contacts view (it's a POST)
+
+    """
+
+    logger.debug('%s view being executed.', 'escalation.contact_reorder')
+
+    # If this is a POST, then validate the form and save the data, otherise do nothing
+    if request.method == 'POST':
+
+        # Check the form elements
+        form = ReorderContactsForm(request.POST)
+        logger.debug('Form submit (POST): %s, with result: %s', 'ReorderContactsForm',form)
+
+        if form.is_valid():
+            try:
+                engine.reorder(form.cleaned_data['order'])
+            except ValueError as e:
+                return HttpResponseBadRequest(str(e))
+
+            # Clear the cache
+            cachetags.invalidate('escalation')
+
+            return HttpResponse('Order successfully modified')
+
+        else:
+            logger.error('%s: invalid form: %s', 'escalation.contact_reorder',form.errors)
+            return HttpResponseBadRequest('Invalid request')
+    else:
+        logger.error('%s: Invalid request: GET received but only POST accepted.', 'escalation.contact_reorder')
+        messages.add_message(request, messages.ERROR, 'Invalid request.')
+        return HttpResponseRedirect('/admin/escalation_contacts')
+
+
 @staff_member_required_ssd
 def contact_delete(request):
     """Remove Contact"""
 
-    logger.debug('%s view being executed.' % 'escalation.contact_delete')
+    logger.debug('%s view being executed.', 'escalation.contact_delete')
 
     # If it's a POST, then we are going to delete it after confirmation
     if request.method == 'POST':
 
         # Check the form elements
         form = RemoveContactForm(request.POST)
-        logger.debug('Form submit (POST): %s, with result: %s' % ('RemoveContactForm',form))
+        logger.debug('Form submit (POST): %s, with result: %s', 'RemoveContactForm',form)
 
         if form.is_valid():
             id = form.cleaned_data['id']
 
-            # Delete the contact and then re-order what's left (if there's more than 1)
-            Escalation.objects.filter(id=id).delete()
-
-            # Get the orders
-            orders = Escalation.objects.values('id','order').order_by('order')
+            # Delete the contact and move the ones after it up
+            engine.remove(id)
 
-            # If there's more than 1, re-order
-            if orders > 1:
-                # Start a counter at 1 and reset the orders
-                counter = 1
-                for contact in orders:
-                    Escalation.objects.filter(id=contact['id']).update(order=counter)
-                    counter += 1
-            # There is only 1 so set it's order to 1
-            else:
-                Escalation.objects.filter(id=id).update(order=1)
+            # Clear the cache
+            cachetags.invalidate('escalation')
 
             # Set a message that delete was successful
             messages.add_message(request, messages.SUCCESS, 'Contact successfully removed.')
@@ -328,7 +322,7 @@ def contact_delete(request):
 
     # Make sure we have an ID
     form = RemoveContactForm(request.GET)
-    logger.debug('Form submit (GET): %s, with result: %s' % ('RemoveContactForm',form))
+    logger.debug('Form submit (GET): %s, with result: %s', 'RemoveContactForm',form)
 
     if form.is_valid():
 
@@ -371,14 +365,14 @@ def contact_modify(request):
 
     """
 
-    logger.debug('%s view being executed.' % 'escalation.contact_modify')
+    logger.debug('%s view being executed.', 'escalation.contact_modify')
 
     # If this is a POST, then validate the form and save the data, otherise do nothing
     if request.method == 'POST':
 
         # Check the form elements
         form = XEditableModifyForm(request.POST)
-        logger.debug('Form submit (POST): %s, with result: %s' % ('XEditableModifyForm',form))
+        logger.debug('Form submit (POST): %s, with result: %s', 'XEditableModifyForm',form)
 
         if form.is_valid():
             pk = form.cleaned_data['pk']
@@ -389,7 +383,7 @@ def contact_modify(request):
             if name == 'name' or name == 'contact_details':
                 pass
             else:
-                logger.error('Invalid column specified during contact modification: %s' % name)
+                logger.error('Invalid column specified during contact modification: %s', name)
                 return HttpResponseBadRequest('An error was encountered with this request.')
 
             filter = {}
@@ -399,16 +393,19 @@ def contact_modify(request):
             try:
                 Escalation.objects.filter(id=pk).update(**filter)
             except Exception as e:
-                logger.error('%s: Error saving update: %s' % ('escalation.contact_modify',e))
+                logger.error('%s: Error saving update: %s', 'escalation.contact_modify',e)
                 return HttpResponseBadRequest('An error was encountered with this request.')
 
+            # Clear the cache
+            cachetags.invalidate('escalation')
+
             return HttpResponse('Value successfully modified')
 
         else:
-            logger.error('%s: invalid form: %s' % ('escalation.contact_modify',form.errors))
+            logger.error('%s: invalid form: %s', 'escalation.contact_modify',form.errors)
             return HttpResponseBadRequest('Invalid request')
     else:
-        logger.error('%s: Invalid request: GET received but only POST accepted.' % ('escalation.contact_modify'))
+        logger.error('%s: Invalid request: GET received but only POST accepted.', 'escalation.contact_modify')
         messages.add_message(request, messages.ERROR, 'Invalid request.')
         return HttpResponseRedirect('/admin/escalation_contacts')
 
@@ -18,13 +18,15 @@
 
 
 import logging
-from django.core.cache import cache
 from django.contrib.auth.models import User
 from ssd.dashboard.decorators import staff_member_required_ssd
 from django.contrib import messages
 from django.http import HttpResponse, HttpResponseRedirect, HttpResponseBadRequest
+from django.shortcuts import render_to_response
+from django.template import RequestContext
 from ssd.dashboard.models import Event_Update
-from ssd.dashboard.forms import XEditableModifyForm
+from ssd.dashboard.forms import XEditableModifyForm, ImportEventsForm
+from ssd.dashboard import cachetags, feeds, functions, importer
 
 
 # Get an instance of the ssd logger
@@ -38,14 +40,14 @@ def update_modify(request):
 
     """
 
-    logger.debug('%s view being executed.' % 'events.update_modify')
+    logger.debug('%s view being executed.', 'events.update_modify')
 
     # If this is a POST, then validate the form and save the data, otherise do nothing
     if request.method == 'POST':
 
         # Check the form elements
         form = XEditableModifyForm(request.POST)
-        logger.debug('Form submit (POST): %s, with result: %s' % ('XEditableModifyForm',form))
+        logger.debug('Form submit (POST): %s, with result: %s', 'XEditableModifyForm',form)
 
         if form.is_valid():
             pk = form.cleaned_data['pk']
@@ -54,7 +56,7 @@ def update_modify(request):
 
             # Add the column we are updating (but only allow specific values)
             if not name == 'update':
-                logger.error('Invalid column specified during event update modification: %s' % name)
+                logger.error('Invalid column specified during event update modification: %s', name)
                 return HttpResponseBadRequest('An error was encountered with this request.')
 
             filter = {}
@@ -67,18 +69,77 @@ def update_modify(request):
             try:
                 Event_Update.objects.filter(id=pk).update(**filter)
             except Exception as e:
-                logger.error('%s: Error saving update: %s' % ('events.update_modify',e))
+                logger.error('%s: Error saving update: %s', 'events.update_modify',e)
                 return HttpResponseBadRequest('An error was encountered with this request.')
 
             # Clear the cache
-            cache.delete('timeline')
+            cachetags.invalidate('events')
+            event_ids = Event_Update.objects.filter(id=pk).values_list('event_id',flat=True)
+            functions.event_detail_invalidate(event_ids)
+            feeds.events_changed(event_ids)
 
             return HttpResponse('Value successfully modified')
 
         else:
-            logger.error('%s: invalid form: %s' % ('events.update_modify',form.errors))
+            logger.error('%s: invalid form: %s', 'events.update_modify',form.errors)
             return HttpResponseBadRequest('Invalid request')
     else:
-        logger.error('%s: Invalid request: GET received but only POST accepted.' % ('events.update_modify'))
+        logger.error('%s: Invalid request: GET received but only POST accepted.', 'events.update_modify')
         messages.add_message(request, messages.ERROR, 'Invalid request.')
-        return HttpResponseRedirect('/admin')
\ No newline at end of file
+        return HttpResponseRedirect('/admin')
+
+@staff_member_required_ssd
+def event_import(request):
+    """Import Events Page
+
+    Import historical incidents and maintenances from a CSV or JSON file
+
+    """
+
+    logger.debug('%s view being executed.', 'events.event_import')
+
+    errors = []
+
+    # If this is a POST, then validate the form and import the file
+    if request.method == 'POST':
+
+        # Check the form elements
+        form = ImportEventsForm(request.POST, request.FILES)
+        logger.debug('Form submit (POST): %s, with result: %s', 'ImportEventsForm',form)
+
+        if form.is_valid():
+            # Obtain the cleaned data
+            f = form.cleaned_data['file']
+            format = form.cleaned_data['format']
+
+            imported, skipped, errors = importer.run(f, format, request.user.id, request.timezone)
+
+            if imported:
+                messages.add_message(request, messages.SUCCESS, '%s events imported.' % imported)
+            if skipped:
+                messages.add_message(request, messages.ERROR, '%s events could not be imported, see below.' % skipped)
+            if not imported and not skipped:
+                messages.add_message(request, messages.ERROR, 'No events found in the file.')
+
+            # Start over with a blank form
+            form = ImportEventsForm()
+
+        else:
+            messages.add_message(request, messages.ERROR, 'Invalid data entered, please correct the errors below:')
+
+    # Not a POST so create a blank form
+    else:
+        form = ImportEventsForm()
+
+    # Print the page
+    return render_to_response(
+       'events/import.html',
+       {
+          'title':'System Status Dashboard | Import Events',
+          'form':form,
+          'errors':errors,
+          'nav_section':'event',
+          'nav_sub':'event_import'
+       },
+       context_instance=RequestContext(request)
+    )
@@ -0,0 +1,91 @@
+#
+# Copyright 2015 - Tom Alessi
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""This module contains all of the event feed functions of SSD."""
+
+
+import calendar
+import logging
+from django.http import HttpResponse, HttpResponseNotModified, HttpResponseBadRequest, Http404
+from django.utils.http import http_date, parse_http_date_safe
+from ssd.dashboard import feeds as engine
+from ssd.dashboard.forms import FeedForm
+
+
+# Get an instance of the ssd logger
+logger = logging.getLogger(__name__)
+
+
+def _feed(request, format):
+    """Serve a feed in the requested format, honoring conditional GETs"""
+
+    form = FeedForm(request.GET)
+    logger.debug('Form submit (GET): %s, with result: %s', 'FeedForm',form)
+
+    if not form.is_valid():
+        return HttpResponseBadRequest('Invalid request')
+
+    # All events, or just those of one service
+    service = form.cleaned_data['service']
+    if service:
+        feed = 'service_%s' % service
+    else:
+        feed = 'all'
+
+    rendered = engine.render(feed, format, request.build_absolute_uri('/'))
+    if not rendered:
+        raise Http404
+    version, updated, body = rendered
+    etag = '"%s-%s"' % (version, format)
+    last_modified = calendar.timegm(updated.utctimetuple())
+
+    # If the reader already has this version, there is nothing to send
+    if 'HTTP_IF_NONE_MATCH' in request.META:
+        if request.META['HTTP_IF_NONE_MATCH'] == etag:
+            return HttpResponseNotModified()
+    else:
+        since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+        if since and since >= last_modified:
+            return HttpResponseNotModified()
+
+    response = HttpResponse(body, content_type='%s; charset=utf-8' % engine.FORMATS[format].mime_type)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def atom(request):
+    """Atom Feed View
+
+    Feed of all events, or of one service's events (?service=<id>)
+
+    """
+
+    logger.debug('%s view being executed.', 'feeds.atom')
+
+    return _feed(request, 'atom')
+
+
+def rss(request):
+    """RSS Feed View
+
+    Feed of all events, or of one service's events (?service=<id>)
+
+    """
+
+    logger.debug('%s view being executed.', 'feeds.rss')
+
+    return _feed(request, 'rss')
@@ -22,7 +22,7 @@ import datetime
 import pytz
 import re
 from django.conf import settings
-from django.core.cache import cache
+from django.db import transaction
 from django.shortcuts import render_to_response
 from django.template import RequestContext
 from django.http import HttpResponseRedirect
@@ -32,7 +32,7 @@ from django.contrib.auth.models import User
 from ssd.dashboard.decorators import staff_member_required_ssd
 from ssd.dashboard.models import Event, Type, Status, Event_Service, Event_Update, Event_Email, Event_Impact, Event_Coordinator, Service, Email, Config_Email
 from ssd.dashboard.forms import DeleteUpdateForm, AddIncidentForm, DeleteEventForm, UpdateIncidentForm, DetailForm, ListForm
-from ssd.dashboard import notify
+from ssd.dashboard import availability, cachetags, feeds, functions, notify
 
 
 # Get an instance of the ssd logger
@@ -47,7 +47,7 @@ def incident(request):
 
     """
 
-    logger.debug('%s view being executed.' % 'incidents.incident')
+    logger.debug('%s view being executed.', 'incidents.incident')
 
 
     # If this is a POST, then validate the form and save the data
@@ -61,7 +61,7 @@ def incident(request):
 
         # Check the form elements
         form = AddIncidentForm(request.POST)
-        logger.debug('Form submit (POST): %s, with result: %s' % ('AddIncidentForm',form))
+        logger.debug('Form submit (POST): %s, with result: %s', 'AddIncidentForm',form)
 
         if form.is_valid():
             # Obtain the cleaned data
@@ -87,30 +87,37 @@ def incident(request):
                 # Status is still open
                 status='open'
 
-            # Create the event and obtain the ID
-            e = Event.objects.create(
-                                     type_id=Type.objects.filter(type='incident').values('id')[0]['id'],
-                                     description=description,
-                                     status_id=Status.objects.filter(status=status).values('id')[0]['id'],
-                                     start=start,
-                                     end=end,
-                                     user_id=request.user.id
-                                    )
-            event_id = e.pk
-
-            # Add the email recipient, if requested.
-            # Form validation ensures that a valid email is selected if broadcast is selected.
-            if broadcast:
-                Event_Email(event_id=event_id,email_id=email_id).save()
-
-            # Find out which services this impacts and associate the services with the event
-            # Form validation confirms that there is at least 1 service
-            for service_id in affected_svcs:
-                # Should be number only -- can't figure out how to validate
-                # multiple checkboxes in the form
-                if re.match(r'^\d+$', service_id):
-                    Event_Service(service_id=service_id,event_id=event_id).save()
-
+            # Write the event and everything tied to it in a single transaction so that
+            # readers never see (or cache) a half written event
+            with transaction.atomic():
+                # Create the event and obtain the ID
+                e = Event.objects.create(
+                                         type_id=Type.objects.filter(type='incident').values('id')[0]['id'],
+                                         description=description,
+                                         status_id=Status.objects.filter(status=status).values('id')[0]['id'],
+                                         start=start,
+                                         end=end,
+                                         user_id=request.user.id
+                                        )
+                event_id = e.pk
+
+                # Add the email recipient, if requested.
+                # Form validation ensures that a valid email is selected if broadcast is selected.
+                if broadcast:
+                    Event_Email(event_id=event_id,email_id=email_id).save()
+
+                # Find out which services this impacts and associate the services with the event
+                # Form validation confirms that there is at least 1 service
+                functions.event_services_set(logger, event_id, affected_svcs)
+
+                # Update the availability rollups for the impacted services
+                availability.event_refresh(event_id)
+
+            # The transaction has been committed so the cache can now be cleared and notifications
+            # sent without exposing a partially written event.
+            # Clear the cache - don't discriminate and just clear everything that impacts events
+            cachetags.invalidate('events')
+            feeds.events_changed([event_id])
 
             # Send an email notification to the appropriate list about this issue if requested.  Broadcast won't be
             # allowed to be true if an email address is not defined or if global email is disabled.
@@ -118,9 +125,6 @@ def incident(request):
                 email = notify.email()
                 email.email_event(event_id,email_id,request.timezone,True)
 
-            # Clear the cache - don't discriminate and just clear everything that impacts events
-            cache.delete_many(['timeline','events_ns','event_count_ns'])
-
             # Set a success message
             messages.add_message(request, messages.SUCCESS, 'Incident successfully created.')
 
@@ -171,7 +175,7 @@ def i_update(request):
 
     """
 
-    logger.debug('%s view being executed.' % 'incidents.i_update')
+    logger.debug('%s view being executed.', 'incidents.i_update')
 
     # If this is a POST, then validate the form and save the data
     # Some validation must take place manually (service
@@ -185,7 +189,7 @@ def i_update(request):
 
         # Check the form elements
         form = UpdateIncidentForm(request.POST)
-        logger.debug('Form submit (POST): %s, with result: %s' % ('UpdateIncidentForm',form))
+        logger.debug('Form submit (POST): %s, with result: %s', 'UpdateIncidentForm',form)
 
         if form.is_valid():
 
@@ -214,39 +218,48 @@ def i_update(request):
                 # Status is still open
                 status='open'
 
-            # Update the event
-            Event.objects.filter(id=id).update(
-                                     description=description,
-                                     status=Status.objects.filter(status=status).values('id')[0]['id'],
-                                     start=start,
-                                     end=end)
-
-            # Add the update, if there is one, using the current time
-            if update:
-                # Create a datetime object for right now and add the server's timezone (whatever DJango has)
-                time_now = datetime.datetime.now()
-                time_now = pytz.timezone(settings.TIME_ZONE).localize(time_now)
-                Event_Update(event_id=id, date=time_now, update=update, user_id=request.user.id).save()
-
-            # Add the email recipient.  If an email recipient is missing, then the broadcast email will not be checked.
-            # In both cases, delete the existing email (because it will be re-added)
-            Event_Email.objects.filter(event_id=id).delete()
-            if email_id:
-                Event_Email(event_id=id,email_id=email_id).save()
-
-            # See if we are adding or subtracting services
-            # The easiest thing to do here is remove all affected
-            # services and re-add the ones indicated here
-
-            # Remove first
-            Event_Service.objects.filter(event_id=id).delete()
-
-            # Now add (form validation confirms that there is at least 1)
-            for service_id in affected_svcs:
-                # Should be number only -- can't figure out how to validate
-                # multiple checkboxes in the form
-                if re.match(r'^\d+$', service_id):
-                    Event_Service(event_id=id,service_id=service_id).save()
+            # Write the event and everything tied to it in a single transaction so that
+            # readers never see (or cache) a half written event
+            with transaction.atomic():
+                # Lock the incident so that concurrent updates are applied one after the other
+                functions.event_lock(logger, id)
+
+                # Capture the incident as it was so its old availability rollups can be corrected
+                before = availability.event_snapshot(id)
+
+                # Update the event
+                Event.objects.filter(id=id).update(
+                                         description=description,
+                                         status=Status.objects.filter(status=status).values('id')[0]['id'],
+                                         start=start,
+                                         end=end)
+
+                # Add the update, if there is one, using the current time
+                if update:
+                    # Create a datetime object for right now and add the server's timezone (whatever DJango has)
+                    time_now = datetime.datetime.now()
+                    time_now = pytz.timezone(settings.TIME_ZONE).localize(time_now)
+                    Event_Update(event_id=id, date=time_now, update=update, user_id=request.user.id).save()
+
+                # Add the email recipient.  If an email recipient is missing, then the broadcast email will not be checked.
+                # In both cases, delete the existing email (because it will be re-added)
+                Event_Email.objects.filter(event_id=id).delete()
+                if email_id:
+                    Event_Email(event_id=id,email_id=email_id).save()
+
+                # See if we are adding or subtracting services and apply only
+                # the difference (form validation confirms that there is at least 1)
+                functions.event_services_set(logger, id, affected_svcs)
+
+                # Update the availability rollups for the old and new services
+                availability.event_refresh(id, before)
+
+            # The transaction has been committed so the cache can now be cleared and notifications
+            # sent without exposing a partially written event.
+            # Clear the cache - don't discriminate and just clear everything that impacts events
+            cachetags.invalidate('events')
+            functions.event_detail_invalidate([id])
+            feeds.events_changed([id])
 
             # Send an email notification to the appropriate list about this issue if requested.  Broadcast won't be
             # allowed to be true if an email address is not defined or if global email is disabled.
@@ -254,9 +267,6 @@ def i_update(request):
                 email = notify.email()
                 email.email_event(id,email_id,request.timezone,False)
 
-            # Clear the cache - don't discriminate and just clear everything that impacts events
-            cache.delete_many(['timeline','events_ns','event_count_ns'])
-
             # Set a success message
             messages.add_message(request, messages.SUCCESS, 'Incident successfully updated')
 
@@ -352,25 +362,30 @@ def i_delete(request):
 
     """
 
-    logger.debug('%s view being executed.' % 'incidents.i_delete')
+    logger.debug('%s view being executed.', 'incidents.i_delete')
 
     # If it's a POST, then we are going to delete it after confirmation
     if request.method == 'POST':
 
         # Check the form elements
         form = DeleteEventForm(request.POST)
-        logger.debug('Form submit (POST): %s, with result: %s' % ('DeleteEventForm',form))
+        logger.debug('Form submit (POST): %s, with result: %s', 'DeleteEventForm',form)
 
         if form.is_valid():
 
             # Obtain the cleaned data
             id = form.cleaned_data['id']
 
-            # Delete the incident
-            Event.objects.filter(id=id).delete()
+            # Delete the incident and remove its downtime from the availability rollups
+            before = availability.event_snapshot(id)
+            with transaction.atomic():
+                Event.objects.filter(id=id).delete()
+                availability.event_refresh(id, before)
 
             # Clear the cache - don't discriminate and just clear everything that impacts events
-            cache.delete_many(['timeline','events_ns','event_count_ns'])
+            cachetags.invalidate('events')
+            functions.event_detail_invalidate([id])
+            feeds.events_changed([id])
 
             # Set a message that the delete was successful
             messages.add_message(request, messages.SUCCESS, 'Incident id:%s successfully deleted' % id)
@@ -387,7 +402,7 @@ def i_delete(request):
 
     # Make sure we have an ID
     form = DeleteEventForm(request.GET)
-    logger.debug('Form submit (GET): %s, with result: %s' % ('DeleteEventForm',form))
+    logger.debug('Form submit (GET): %s, with result: %s', 'DeleteEventForm',form)
 
     if form.is_valid():
 
@@ -421,10 +436,10 @@ def i_detail(request):
 
     """
 
-    logger.debug('%s view being executed.' % 'incidents.i_detail')
+    logger.debug('%s view being executed.', 'incidents.i_detail')
 
     form = DetailForm(request.GET)
-    logger.debug('Form submit (GET): %s, with result: %s' % ('DetailForm',form))
+    logger.debug('Form submit (GET): %s, with result: %s', 'DetailForm',form)
 
     if form.is_valid():
         # Obtain the cleaned data
@@ -436,43 +451,24 @@ def i_detail(request):
         return HttpResponseRedirect('/')
 
     # Obain the incident detail (and make sure it's an incident)
-    details = Event.objects.filter(id=id,type__type='incident').values(
-                                                'status__status',
-                                                'start',
-                                                'end',
-                                                'description',
-                                                'user_id__first_name',
-                                                'user_id__last_name'
-                                                )
+    # This includes the services and updates and comes from the cache unless the incident has changed
+    detail = functions.event_detail_get(logger, id, 'incident')
+
     # If nothing was returned, send back to the home page
-    if not details:
+    if not detail:
         messages.add_message(request, messages.ERROR, 'Invalid request: no such incident id.')
         return HttpResponseRedirect('/')
 
-    # Which services were impacted
-    services = Event.objects.filter(id=id).values('event_service__service__service_name')
-
-    # Obain any incident updates
-    updates = Event.objects.filter(id=id).values(
-                                                'event_update__id',
-                                                'event_update__date',
-                                                'event_update__update',
-                                                'event_update__user__first_name',
-                                                'event_update__user__last_name'
-                                                ).order_by('event_update__id')
-    # If there are no updates, set to None
-    if len(updates) == 1 and updates[0]['event_update__date'] == None:
-        updates = None
-
     # Print the page
     return render_to_response(
        'incidents/i_detail.html',
        {
           'title':'System Status Dashboard | Incident Detail',
-          'services':services,
+          'services':detail['services'],
           'id':id,
-          'details':details,
-          'updates':updates
+          'details':detail['details'],
+          'updates':detail['updates'],
+          'archived':detail['archived']
        },
        context_instance=RequestContext(request)
     )
@@ -486,10 +482,10 @@ def i_list(request):
 
     """
 
-    logger.debug('%s view being executed.' % 'incidents.i_list')
+    logger.debug('%s view being executed.', 'incidents.i_list')
 
     form = ListForm(request.GET)
-    logger.debug('Form submit (GET): %s, with result: %s' % ('ListForm',form))
+    logger.debug('Form submit (GET): %s, with result: %s', 'ListForm',form)
 
     # Check the params
     if form.is_valid():
@@ -538,14 +534,14 @@ def i_update_delete(request):
 
     """
 
-    logger.debug('%s view being executed.' % 'incidents.i_update_delete')
+    logger.debug('%s view being executed.', 'incidents.i_update_delete')
 
     # If it's a POST, then we are going to delete it after confirmation
     if request.method == 'POST':
 
         # Check the form elements
         form = DeleteUpdateForm(request.POST)
-        logger.debug('Form submit (POST): %s, with result: %s' % ('DeleteUpdateForm',form))
+        logger.debug('Form submit (POST): %s, with result: %s', 'DeleteUpdateForm',form)
 
         if form.is_valid():
 
@@ -557,7 +553,9 @@ def i_update_delete(request):
             Event_Update.objects.filter(id=id).delete()
 
             # Clear the cache
-            cache.delete('timeline')
+            cachetags.invalidate('events')
+            functions.event_detail_invalidate([event_id])
+            feeds.events_changed([event_id])
 
             # Set a message that the delete was successful
             messages.add_message(request, messages.SUCCESS, 'Incident update id:%s successfully deleted' % id)
@@ -574,7 +572,7 @@ def i_update_delete(request):
 
     # Make sure we have an ID
     form = DeleteUpdateForm(request.GET)
-    logger.debug('Form submit (GET): %s, with result: %s' % ('DeleteUpdateForm',form))
+    logger.debug('Form submit (GET): %s, with result: %s', 'DeleteUpdateForm',form)
 
     if form.is_valid():
 
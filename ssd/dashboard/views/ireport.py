@@ -17,26 +17,29 @@
 """This module contains all of the incident report functions of SSD."""
 
 import logging
-import os
 import datetime
 import pytz
 from django.conf import settings
 from django.core.cache import cache
-from ssd.dashboard.decorators import staff_member_required_ssd
+from ssd.dashboard.decorators import staff_member_required_ssd, rate_limited_ssd
 from django.shortcuts import render_to_response
 from django.template import RequestContext
 from django.http import HttpResponseRedirect
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.contrib import messages
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
 from ssd.dashboard.models import Config_Ireport, Config_Email, Ireport
 from ssd.dashboard.forms import IreportConfigForm, ReportIncidentForm, ListForm, DeleteEventForm, DetailForm
-from ssd.dashboard import notify
+from ssd.dashboard import cachetags, notify, ratelimit, screenshots
+from ssd.dashboard.uploadhandler import IreportUploadHandler
 
 
 # Get an instance of the ssd logger
 logger = logging.getLogger(__name__)
 
 
+@csrf_exempt
+@rate_limited_ssd('ireport', ratelimit.IREPORT_RATE, ratelimit.IREPORT_GLOBAL_RATE)
 def ireport(request):
     """Report View
 
@@ -44,7 +47,26 @@ def ireport(request):
 
     """
 
-    logger.debug('%s view being executed.' % 'ireport.ireport')
+    logger.debug('%s view being executed.', 'ireport.ireport')
+
+    # Enforce the screenshot size limits while the upload is streamed in
+    # This has to happen before the POST data is read, so the CSRF check is done afterwards
+    if request.method == 'POST':
+        request.upload_handlers.insert(0, IreportUploadHandler(request))
+
+        # Stream the upload in through the handler
+        request.POST
+
+        # A rejected upload changes nothing, so report it without the CSRF check
+        # (the token may be in the part of the request that was never read)
+        if hasattr(request, 'upload_error'):
+            return _ireport(request)
+
+    return csrf_protect(_ireport)(request)
+
+
+def _ireport(request):
+    """Report View (after the upload handlers are in place)"""
 
     # If this functionality is disabled in the admin, let the user know
     enable_ireport = cache.get('enable_ireport')
@@ -64,9 +86,15 @@ def ireport(request):
     if request.method == 'POST':
         # Check the form elements
         form = ReportIncidentForm(request.POST, request.FILES)
-        logger.debug('Form submit (POST): %s, with result: %s' % ('ReportIncidentForm',form))
+        logger.debug('Form submit (POST): %s, with result: %s', 'ReportIncidentForm',form)
 
-        if form.is_valid():
+        # If the upload was stopped part way through, the form data is incomplete
+        # so let the user know why and give them back what was received
+        if hasattr(request, 'upload_error'):
+            messages.add_message(request, messages.ERROR, request.upload_error[1])
+            form = ReportIncidentForm(initial=request.POST.dict())
+
+        elif form.is_valid():
             # Obtain the cleaned data
             name = form.cleaned_data['name']
             email = form.cleaned_data['email']
@@ -115,7 +143,7 @@ def ireport(request):
             if Config_Email.objects.filter(id=Config_Email.objects.values('id')[0]['id']).values('enabled')[0]['enabled'] == 1:
                 if Config_Ireport.objects.filter(id=Config_Ireport.objects.values('id')[0]['id']).values('email_enabled')[0]['email_enabled'] == 1:
                     pager = notify.email()
-                    pager.page(detail)
+                    pager.page_reports()
 
             # Give the user a thank you and let them know what to expect
             message = Config_Ireport.objects.filter(id=Config_Ireport.objects.values('id')[0]['id']).values('submit_message')[0]['submit_message']
@@ -149,14 +177,14 @@ def ireport_config(request):
 
     """
 
-    logger.debug('%s view being executed.' % 'ireport.ireport_config')
+    logger.debug('%s view being executed.', 'ireport.ireport_config')
 
     # If this is a POST, then validate the form and save the data
     if request.method == 'POST':
 
         # Check the form elements
         form = IreportConfigForm(request.POST)
-        logger.debug('Form submit (POST): %s, with result: %s' % ('IreportConfigForm',form))
+        logger.debug('Form submit (POST): %s, with result: %s', 'IreportConfigForm',form)
 
         if form.is_valid():
             # Obtain the cleaned data
@@ -180,7 +208,7 @@ def ireport_config(request):
                                                   )
 
             # Clear the cache
-            cache.delete('enable_ireport')
+            cachetags.invalidate('config')
 
             # Set a success message
             messages.add_message(request, messages.SUCCESS, 'Preferences saved successfully')
@@ -218,10 +246,10 @@ def ireport_list(request):
 
     """
 
-    logger.debug('%s view being executed.' % 'ireport.ireport_list')
+    logger.debug('%s view being executed.', 'ireport.ireport_list')
 
     form = ListForm(request.GET)
-    logger.debug('Form submit (GET): %s, with result: %s' % ('ListForm',form))
+    logger.debug('Form submit (GET): %s, with result: %s', 'ListForm',form)
 
     # Check the params
     if form.is_valid():
@@ -244,6 +272,9 @@ def ireport_list(request):
             # If page is out of range (e.g. 9999), deliver last page of results.
             ireports = paginator.page(paginator.num_pages)
 
+        # Add the thumbnail locations for this page
+        ireports.object_list = screenshots.annotate(ireports.object_list)
+
         # Print the page
         return render_to_response(
            'ireport/ireport_list.html',
@@ -270,38 +301,32 @@ def ireport_delete(request):
 
     """
 
-    logger.debug('%s view being executed.' % 'ireport.ireport_delete')
+    logger.debug('%s view being executed.', 'ireport.ireport_delete')
 
     # If it's a POST, then we are going to delete it after confirmation
     if request.method == 'POST':
 
         # Check the form elements
         form = DeleteEventForm(request.POST)
-        logger.debug('Form submit (POST): %s, with result: %s' % ('DeleteEventForm',form))
+        logger.debug('Form submit (POST): %s, with result: %s', 'DeleteEventForm',form)
 
         if form.is_valid():
 
             # Obtain the cleaned data
             id = form.cleaned_data['id']
 
-            # First, delete any screenshots
-            # Obtain the local uploads location
-            upload_path = Config_Ireport.objects.filter(id=Config_Ireport.objects.values('id')[0]['id']).values('upload_path')[0]['upload_path']
             # Get any screenshots
-            screenshots = Ireport.objects.filter(id=id).values('screenshot1','screenshot2')
-            for screenshot in screenshots:
-                for name,file_path in screenshot.items():
-                    if file_path:
-                        # Remove the file
-                        try:
-                            os.remove('%s/%s' % (upload_path,file_path))
-                        except OSError:
-                            pass
-
+            files = list(Ireport.objects.filter(id=id).values('screenshot1','screenshot2'))
 
             # Delete the incident
             Ireport.objects.filter(id=id).delete()
 
+            # Delete the screenshots (and thumbnails) unless another report shares them
+            for screenshot in files:
+                for name,file_path in screenshot.items():
+                    if file_path:
+                        screenshots.release(file_path)
+
             # Set a message that the delete was successful
             messages.add_message(request, messages.SUCCESS, 'Incident report id:%s successfully deleted' % id)
 
@@ -320,7 +345,7 @@ def ireport_delete(request):
 
     # Make sure we have an ID
     form = DeleteEventForm(request.GET)
-    logger.debug('Form submit (GET): %s, with result: %s' % ('DeleteEventForm',form))
+    logger.debug('Form submit (GET): %s, with result: %s', 'DeleteEventForm',form)
 
     if form.is_valid():
 
@@ -356,10 +381,10 @@ def ireport_detail(request):
 
     """
 
-    logger.debug('%s view being executed.' % 'ireport.ireport_detail')
+    logger.debug('%s view being executed.', 'ireport.ireport_detail')
 
     form = DetailForm(request.GET)
-    logger.debug('Form submit (GET): %s, with result: %s' % ('DetailForm',form))
+    logger.debug('Form submit (GET): %s, with result: %s', 'DetailForm',form)
 
     if form.is_valid():
         # Obtain the cleaned data
@@ -382,6 +407,9 @@ def ireport_detail(request):
                                                 'screenshot2'
                                                 )
 
+    # Add the screenshot and thumbnail locations
+    detail = screenshots.annotate(detail)
+
     # Print the page
     return render_to_response(
        'ireport/ireport_detail.html',
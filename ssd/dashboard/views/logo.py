@@ -17,7 +17,6 @@
 """This module contains all of the logo configuration functions of SSD."""
 
 import logging
-from django.core.cache import cache
 from ssd.dashboard.decorators import staff_member_required_ssd
 from django.shortcuts import render_to_response
 from django.template import RequestContext
@@ -25,6 +24,7 @@ from django.http import HttpResponseRedirect
 from django.contrib import messages
 from ssd.dashboard.models import Config_Logo
 from ssd.dashboard.forms import LogoConfigForm
+from ssd.dashboard import cachetags
 
 
 # Get an instance of the ssd logger
@@ -37,14 +37,14 @@ def logo_config(request):
 
     """
 
-    logger.debug('%s view being executed.' % 'logo.logo_config')
+    logger.debug('%s view being executed.', 'logo.logo_config')
 
     # If this is a POST, then validate the form and save the data
     if request.method == 'POST':
 
         # Check the form elements
         form = LogoConfigForm(request.POST)
-        logger.debug('Form submit (POST): %s, with result: %s' % ('LogoConfigForm',form))
+        logger.debug('Form submit (POST): %s, with result: %s', 'LogoConfigForm',form)
 
         if form.is_valid():
             # Obtain the cleaned data
@@ -55,7 +55,7 @@ def logo_config(request):
             Config_Logo.objects.filter(id=Config_Logo.objects.values('id')[0]['id']).update(url=url,logo_enabled=logo_enabled)
 
             # Clear the cache
-            cache.delete_many(['display_logo','logo_url'])
+            cachetags.invalidate('config')
 
             messages.add_message(request, messages.SUCCESS, 'Preferences saved successfully')
         else:
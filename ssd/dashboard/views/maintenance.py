@@ -22,7 +22,7 @@ import datetime
 import pytz
 import re
 from django.conf import settings
-from django.core.cache import cache
+from django.db import transaction
 from django.shortcuts import render_to_response
 from django.template import RequestContext
 from django.http import HttpResponseRedirect
@@ -33,7 +33,7 @@ from django.contrib.auth.models import User
 from ssd.dashboard.decorators import staff_member_required_ssd
 from ssd.dashboard.models import Event, Type, Status, Event_Service, Event_Update, Event_Email, Event_Impact, Event_Coordinator, Service, Email,Config_Email
 from ssd.dashboard.forms import DeleteUpdateForm, DetailForm, DeleteEventForm,UpdateMaintenanceForm, EmailMaintenanceForm, AddMaintenanceForm, ListForm
-from ssd.dashboard import notify
+from ssd.dashboard import cachetags, feeds, functions, notify
 
 
 # Get an instance of the ssd logger
@@ -46,7 +46,7 @@ def maintenance(request):
 
     """
 
-    logger.debug('%s view being executed.' % 'maintenance.maintenance')
+    logger.debug('%s view being executed.', 'maintenance.maintenance')
 
     # If this is a POST, then validate the form and save the data
     # Some validation must take place manually
@@ -59,7 +59,7 @@ def maintenance(request):
 
         # Check the form elements
         form = AddMaintenanceForm(request.POST)
-        logger.debug('Form submit (POST): %s, with result: %s' % ('AddMaintenanceForm',form))
+        logger.debug('Form submit (POST): %s, with result: %s', 'AddMaintenanceForm',form)
 
         if form.is_valid():
             # Obtain the cleaned data
@@ -82,33 +82,38 @@ def maintenance(request):
             start = tz.localize(start)
             end = tz.localize(end)
 
-            # Create the event and obtain the ID
-            e = Event.objects.create(type_id=Type.objects.filter(type='maintenance').values('id')[0]['id'],
-                                     description=description,
-                                     status_id=Status.objects.filter(status='planning').values('id')[0]['id'],
-                                     start=start,
-                                     end=end,
-                                     user_id=request.user.id
-                                    )
-            event_id = e.pk
-
-            # Save the impact analysis
-            Event_Impact(event_id=event_id,impact=impact).save()
-
-            # Save the coordinator, if requested
-            Event_Coordinator(event_id=event_id,coordinator=coordinator).save()
-
-            # Add the email recipient, if requested
-            if email_id:
-                Event_Email(event_id=event_id,email_id=email_id).save()
-
-            # Find out which services this impacts and associate the services with the event
-            # Form validation confirms that there is at least 1
-            for service_id in affected_svcs:
-                # Should be number only -- can't figure out how to validate
-                # multiple checkboxes in the form
-                if re.match(r'^\d+$', service_id):
-                    Event_Service(service_id=service_id,event_id=event_id).save()
+            # Write the event and everything tied to it in a single transaction so that
+            # readers never see (or cache) a half written event
+            with transaction.atomic():
+                # Create the event and obtain the ID
+                e = Event.objects.create(type_id=Type.objects.filter(type='maintenance').values('id')[0]['id'],
+                                         description=description,
+                                         status_id=Status.objects.filter(status='planning').values('id')[0]['id'],
+                                         start=start,
+                                         end=end,
+                                         user_id=request.user.id
+                                        )
+                event_id = e.pk
+
+                # Save the impact analysis
+                Event_Impact(event_id=event_id,impact=impact).save()
+
+                # Save the coordinator, if requested
+                Event_Coordinator(event_id=event_id,coordinator=coordinator).save()
+
+                # Add the email recipient, if requested
+                if email_id:
+                    Event_Email(event_id=event_id,email_id=email_id).save()
+
+                # Find out which services this impacts and associate the services with the event
+                # Form validation confirms that there is at least 1 service
+                functions.event_services_set(logger, event_id, affected_svcs)
+
+            # The transaction has been committed so the cache can now be cleared and notifications
+            # sent without exposing a partially written event.
+            # Clear the cache - don't discriminate and just clear everything that impacts events
+            cachetags.invalidate('events')
+            feeds.events_changed([event_id])
 
             # Send an email notification to the appropriate list about this maintenance, if requested.  Broadcast won't be
             # allowed to be true if an email address is not defined or if global email is disabled.
@@ -116,9 +121,6 @@ def maintenance(request):
                 email = notify.email()
                 email.email_event(event_id,email_id,request.timezone,True)
 
-            # Clear the cache - don't discriminate and just clear everything that impacts events
-            cache.delete_many(['timeline','events_ns','event_count_ns'])
-
             # Set a success message
             messages.add_message(request, messages.SUCCESS, 'Maintenance successfully created.')
 
@@ -169,7 +171,7 @@ def m_update(request):
 
     """
 
-    logger.debug('%s view being executed.' % 'maintenance.m_update')
+    logger.debug('%s view being executed.', 'maintenance.m_update')
 
     # If this is a POST, then validate the form and save the data
     # Some validation must take place manually (service
@@ -183,7 +185,7 @@ def m_update(request):
 
         # Check the form elements
         form = UpdateMaintenanceForm(request.POST)
-        logger.debug('Form submit (POST): %s, with result: %s' % ('UpdateMaintenanceForm',form))
+        logger.debug('Form submit (POST): %s, with result: %s', 'UpdateMaintenanceForm',form)
 
 
         if form.is_valid():
@@ -219,52 +221,55 @@ def m_update(request):
             else:
                 status='planning'
 
-            # Update the event
-            Event.objects.filter(id=id).update(
-                                     description=description,
-                                     status=Status.objects.filter(status=status).values('id')[0]['id'],
-                                     start=start,
-                                     end=end)
-
-            # Update the impact analysis (if it's blank, make sure it's deleted, maybe they added it previously)
-            if impact:
-                Event_Impact.objects.filter(event_id=id).update(impact=impact)
-            else:
-                Event_Impact.objects.filter(event_id=id).delete()
-
-            # Update the coordinator (if it's blank, make sure it's deleted, maybe they added it previously)
-            if coordinator:
-                Event_Coordinator.objects.filter(event_id=id).update(coordinator=coordinator)
-            else:
-                Event_Coordinator.objects.filter(event_id=id).delete()
+            # Write the event and everything tied to it in a single transaction so that
+            # readers never see (or cache) a half written event
+            with transaction.atomic():
+                # Lock the maintenance so that concurrent updates are applied one after the other
+                functions.event_lock(logger, id)
+
+                # Update the event
+                Event.objects.filter(id=id).update(
+                                         description=description,
+                                         status=Status.objects.filter(status=status).values('id')[0]['id'],
+                                         start=start,
+                                         end=end)
+
+                # Update the impact analysis (if it's blank, make sure it's deleted, maybe they added it previously)
+                if impact:
+                    Event_Impact.objects.filter(event_id=id).update(impact=impact)
+                else:
+                    Event_Impact.objects.filter(event_id=id).delete()
 
-            # Add the update, if there is one, using the current time
-            if update:
-                # Create a datetime object for right now and add the server's timezone (whatever DJango has)
-                time_now = datetime.datetime.now()
-                time_now = pytz.timezone(settings.TIME_ZONE).localize(time_now)
-                Event_Update(event_id=id, date=time_now, update=update, user_id=request.user.id).save()
+                # Update the coordinator (if it's blank, make sure it's deleted, maybe they added it previously)
+                if coordinator:
+                    Event_Coordinator.objects.filter(event_id=id).update(coordinator=coordinator)
+                else:
+                    Event_Coordinator.objects.filter(event_id=id).delete()
 
-            # Add the email recipient.  If an email recipient is missing, then the broadcast email will not be checked.
-            # In both cases, delete the existing email (because it will be re-added)
-            Event_Email.objects.filter(event_id=id).delete()
-            if email_id:
-                Event_Email(event_id=id,email_id=email_id).save()
+                # Add the update, if there is one, using the current time
+                if update:
+                    # Create a datetime object for right now and add the server's timezone (whatever DJango has)
+                    time_now = datetime.datetime.now()
+                    time_now = pytz.timezone(settings.TIME_ZONE).localize(time_now)
+                    Event_Update(event_id=id, date=time_now, update=update, user_id=request.user.id).save()
 
+                # Add the email recipient.  If an email recipient is missing, then the broadcast email will not be checked.
+                # In both cases, delete the existing email (because it will be re-added)
+                Event_Email.objects.filter(event_id=id).delete()
+                if email_id:
+                    Event_Email(event_id=id,email_id=email_id).save()
 
-            # See if we are adding or subtracting services
-            # The easiest thing to do here is remove all affected
-            # services and re-add the ones indicated here
 
-            # Remove first
-            Event_Service.objects.filter(event_id=id).delete()
+                # See if we are adding or subtracting services and apply only
+                # the difference (form validation confirms that there is at least 1)
+                functions.event_services_set(logger, id, affected_svcs)
 
-            # Now add (form validation confirms that there is at least 1)
-            for service_id in affected_svcs:
-                # Should be number only -- can't figure out how to validate
-                # multiple checkboxes in the form
-                if re.match(r'^\d+$', service_id):
-                    Event_Service(event_id=id,service_id=service_id).save()
+            # The transaction has been committed so the cache can now be cleared and notifications
+            # sent without exposing a partially written event.
+            # Clear the cache - don't discriminate and just clear everything that impacts events
+            cachetags.invalidate('events')
+            functions.event_detail_invalidate([id])
+            feeds.events_changed([id])
 
             # Send an email notification to the appropriate list about this maintenance, if requested.  Broadcast won't be
             # allowed to be true if an email address is not defined or if global email is disabled.
@@ -272,9 +277,6 @@ def m_update(request):
                 email = notify.email()
                 email.email_event(id,email_id,request.timezone,False)
 
-            # Clear the cache - don't discriminate and just clear everything that impacts events
-            cache.delete_many(['timeline','events_ns','event_count_ns'])
-
             # Set a success message
             messages.add_message(request, messages.SUCCESS, 'Maintenance successfully updated')
 
@@ -391,10 +393,10 @@ def m_detail(request):
 
     """
 
-    logger.debug('%s view being executed.' % 'maintenance.m_detail')
+    logger.debug('%s view being executed.', 'maintenance.m_detail')
 
     form = DetailForm(request.GET)
-    logger.debug('Form submit (GET): %s, with result: %s' % ('DetailForm',form))
+    logger.debug('Form submit (GET): %s, with result: %s', 'DetailForm',form)
 
 
     if form.is_valid():
@@ -407,46 +409,24 @@ def m_detail(request):
         return HttpResponseRedirect('/')
 
     # Obain the maintenance detail (and make sure it's a maintenance)
-    details = Event.objects.filter(id=id,type__type='maintenance').values(
-                                                'start',
-                                                'end',
-                                                'status__status',
-                                                'description',
-                                                'event_impact__impact',
-                                                'event_coordinator__coordinator',
-                                                'event_email__email__email',
-                                                'user_id__first_name',
-                                                'user_id__last_name'
-                                                )
+    # This includes the services and updates and comes from the cache unless the maintenance has changed
+    detail = functions.event_detail_get(logger, id, 'maintenance')
+
     # If nothing was returned, send back to the home page
-    if not details:
+    if not detail:
         messages.add_message(request, messages.ERROR, 'Invalid request: no such maintenance id.')
         return HttpResponseRedirect('/')
 
-    # Which services were impacted
-    services = Event.objects.filter(id=id).values('event_service__service__service_name')
-
-    # Obain any maintenance updates
-    updates = Event.objects.filter(id=id).values(
-                                                'event_update__id',
-                                                'event_update__date',
-                                                'event_update__update',
-                                                'event_update__user__first_name',
-                                                'event_update__user__last_name'
-                                                ).order_by('event_update__id')
-    # If there are no updates, set to None
-    if len(updates) == 1 and updates[0]['event_update__date'] == None:
-        updates = None
-
     # Print the page
     return render_to_response(
        'maintenance/m_detail.html',
        {
           'title':'System Status Dashboard | Scheduled Maintenance Detail',
-          'services':services,
+          'services':detail['services'],
           'id':id,
-          'details':details,
-          'updates':updates,
+          'details':detail['details'],
+          'updates':detail['updates'],
+          'archived':detail['archived'],
        },
        context_instance=RequestContext(request)
     )
@@ -456,11 +436,11 @@ def m_detail(request):
 def m_email(request):
     """Send an Email Notification about a Maintenance"""
 
-    logger.debug('%s view being executed.' % 'maintenance.m_email')
+    logger.debug('%s view being executed.', 'maintenance.m_email')
 
     # Check the form elements
     form = EmailMaintenanceForm(request.GET)
-    logger.debug('Form submit (GET): %s, with result: %s' % ('EmailMaintenanceForm',form))
+    logger.debug('Form submit (GET): %s, with result: %s', 'EmailMaintenanceForm',form)
 
     if form.is_valid():
         # Obtain the cleaned data
@@ -499,14 +479,14 @@ def m_delete(request):
 
     """
 
-    logger.debug('%s view being executed.' % 'maintenance.m_delete')
+    logger.debug('%s view being executed.', 'maintenance.m_delete')
 
     # If it's a POST, then we are going to delete it after confirmation
     if request.method == 'POST':
 
         # Check the form elements
         form = DeleteEventForm(request.POST)
-        logger.debug('Form submit (POST): %s, with result: %s' % ('DeleteEventForm',form))
+        logger.debug('Form submit (POST): %s, with result: %s', 'DeleteEventForm',form)
 
 
         if form.is_valid():
@@ -518,7 +498,9 @@ def m_delete(request):
             Event.objects.filter(id=id).delete()
 
             # Clear the cache - don't discriminate and just clear everything that impacts events
-            cache.delete_many(['timeline','events_ns','event_count_ns'])
+            cachetags.invalidate('events')
+            functions.event_detail_invalidate([id])
+            feeds.events_changed([id])
 
             # Set a message that the delete was successful
             messages.add_message(request, messages.SUCCESS, 'Maintenance id:%s successfully deleted' % id)
@@ -535,7 +517,7 @@ def m_delete(request):
 
     # Make sure we have an ID
     form = DeleteEventForm(request.GET)
-    logger.debug('Form submit (GET): %s, with result: %s' % ('DeleteEventForm',form))
+    logger.debug('Form submit (GET): %s, with result: %s', 'DeleteEventForm',form)
 
     if form.is_valid():
 
@@ -570,10 +552,10 @@ def m_list(request):
 
     """
 
-    logger.debug('%s view being executed.' % 'maintenance.m_list')
+    logger.debug('%s view being executed.', 'maintenance.m_list')
 
     form = ListForm(request.GET)
-    logger.debug('Form submit (GET): %s, with result: %s' % ('ListForm',form))
+    logger.debug('Form submit (GET): %s, with result: %s', 'ListForm',form)
 
     # Check the params
     if form.is_valid():
@@ -624,14 +606,14 @@ def m_update_delete(request):
 
     """
 
-    logger.debug('%s view being executed.' % 'maintenance.m_update_delete')
+    logger.debug('%s view being executed.', 'maintenance.m_update_delete')
 
     # If it's a POST, then we are going to delete it after confirmation
     if request.method == 'POST':
 
         # Check the form elements
         form = DeleteUpdateForm(request.POST)
-        logger.debug('Form submit (POST): %s, with result: %s' % ('DeleteUpdateForm',form))
+        logger.debug('Form submit (POST): %s, with result: %s', 'DeleteUpdateForm',form)
 
         if form.is_valid():
 
@@ -643,7 +625,9 @@ def m_update_delete(request):
             Event_Update.objects.filter(id=id).delete()
 
             # Clear the cache
-            cache.delete('timeline')
+            cachetags.invalidate('events')
+            functions.event_detail_invalidate([event_id])
+            feeds.events_changed([event_id])
 
             # Set a message that the delete was successful
             messages.add_message(request, messages.SUCCESS, 'Maintenance update id:%s successfully deleted' % id)
@@ -660,7 +644,7 @@ def m_update_delete(request):
 
     # Make sure we have an ID
     form = DeleteUpdateForm(request.GET)
-    logger.debug('Form submit (GET): %s, with result: %s' % ('DeleteUpdateForm',form))
+    logger.debug('Form submit (GET): %s, with result: %s', 'DeleteUpdateForm',form)
 
     if form.is_valid():
 
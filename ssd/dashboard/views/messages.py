@@ -20,12 +20,12 @@
 import logging
 from ssd.dashboard.decorators import staff_member_required_ssd
 from django.shortcuts import render_to_response
-from django.core.cache import cache
 from django.template import RequestContext
 from django.http import HttpResponseRedirect
 from django.contrib import messages
 from ssd.dashboard.models import Config_Message
 from ssd.dashboard.forms import MessagesConfigForm
+from ssd.dashboard import cachetags
 
 
 # Get an instance of the ssd logger
@@ -38,14 +38,14 @@ def messages_config(request):
 
     """
 
-    logger.debug('%s view being executed.' % 'messages.messages_config')
+    logger.debug('%s view being executed.', 'messages.messages_config')
 
     # If this is a POST, then validate the form and save the data
     if request.method == 'POST':
 
         # Check the form elements
         form = MessagesConfigForm(request.POST)
-        logger.debug('Form submit (POST): %s, with result: %s' % ('MessagesConfigForm',form))
+        logger.debug('Form submit (POST): %s, with result: %s', 'MessagesConfigForm',form)
 
         if form.is_valid():
             # Obtain the cleaned data
@@ -64,7 +64,7 @@ def messages_config(request):
                                                     )
 
             # Clear the cache
-            cache.delete('alerts')
+            cachetags.invalidate('messages')
 
             # Set a success message
             messages.add_message(request, messages.SUCCESS, 'Preferences saved successfully')
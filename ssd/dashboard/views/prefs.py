@@ -34,12 +34,12 @@ def set_timezone(request):
 
     """
 
-    logger.debug('%s view being executed.' % 'prefs.set_timezone')
+    logger.debug('%s view being executed.', 'prefs.set_timezone')
 
     if request.method == 'POST':
         # Check the form elements
         form = UpdateTZForm(request.POST)
-        logger.debug('Form submit (POST): %s, with result: %s' % ('UpdateTZForm',form))
+        logger.debug('Form submit (POST): %s, with result: %s', 'UpdateTZForm',form)
 
         if form.is_valid():
             # Obtain the cleaned data
@@ -87,12 +87,12 @@ def jump(request):
 
     """
 
-    logger.debug('%s view being executed.' % 'prefs.jump')
+    logger.debug('%s view being executed.', 'prefs.jump')
 
     if request.method == 'POST':
         # Check the form elements
         form = JumpToForm(request.POST)
-        logger.debug('Form submit (POST): %s, with result: %s' % ('JumpToForm',form))
+        logger.debug('Form submit (POST): %s, with result: %s', 'JumpToForm',form)
 
         if form.is_valid():
             # Obtain the cleaned data
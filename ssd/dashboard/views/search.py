@@ -17,22 +17,92 @@
 """This module contains all of the search functions of SSD."""
 
 
-import logging
+import csv
 import datetime
+import json
+import logging
 import pytz
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.contrib import messages
 from django.shortcuts import render_to_response
 from django.template import RequestContext
-from django.http import HttpResponseRedirect
-from ssd.dashboard.models import Event
-from ssd.dashboard.forms import SearchForm, GSearchForm
+from django.db import router
+from django.http import HttpResponse, HttpResponseRedirect, HttpResponseBadRequest, StreamingHttpResponse
+from ssd.dashboard.models import Event, Archive_Event
+from ssd.dashboard.archive import QuerySetChain
+from ssd.dashboard.forms import SearchForm, GSearchForm, HistogramForm
+from ssd.dashboard import cachetags
+from ssd.dashboard import histogram as engine
 
 
 # Get an instance of the ssd logger
 logger = logging.getLogger(__name__)
 
 
+# Number of events read per query when exporting
+EXPORT_CHUNK = 1000
+
+# Columns of the CSV export
+EXPORT_FIELDS = ['id','type','status','start','end','description','services','impact','coordinator','updates','archived']
+
+
+def _filter(form, timezone):
+    """Build the event query filter from a valid SearchForm"""
+
+    start = form.cleaned_data['start']
+    end = form.cleaned_data['end']
+    text = form.cleaned_data['text']
+    type = form.cleaned_data['type']
+
+    filter = {}
+
+    # Start/End
+    if start and end:
+        # Combine the dates and times into datetime objects
+        start_tmp = datetime.datetime.combine(start, datetime.datetime.strptime('00:00:00','%H:%M:%S').time())
+        end_tmp = datetime.datetime.combine(end, datetime.datetime.strptime('23:59:59','%H:%M:%S').time())
+
+        # Set the timezone
+        tz = pytz.timezone(timezone)
+        start_tmp = tz.localize(start_tmp)
+        end_tmp = tz.localize(end_tmp)
+
+        filter['start__range'] = [start_tmp,end_tmp]
+
+    # Type
+    if type:
+        filter['type__type'] = '%s' % type
+
+    # Text
+    if text:
+        filter['description__contains'] = '%s' % text
+
+    return filter
+
+
+@cachetags.cached('graph_events', ('events',))
+def _graph_events(date, type, timezone):
+    """Obtain the events of a type that started on a date (in the given timezone)"""
+
+    # Combine the dates and times into datetime objects
+    start = datetime.datetime.combine(date, datetime.datetime.strptime('00:00:00','%H:%M:%S').time())
+    end = datetime.datetime.combine(date, datetime.datetime.strptime('23:59:59','%H:%M:%S').time())
+
+    # Set the timezone
+    tz = pytz.timezone(timezone)
+    start = tz.localize(start)
+    end = tz.localize(end)
+
+    # Search the live events and then the archive
+    events = []
+    for model in (Event, Archive_Event):
+        events.extend(model.objects.filter(type__type=type,start__range=[start,end]
+                                  ).values('id','type__type','start','description','status__status'
+                                  ).order_by('-start'))
+
+    return events
+
+
 def graph(request):
     """Event Search View (Graph)
 
@@ -40,10 +110,10 @@ def graph(request):
 
     """
 
-    logger.debug('%s view being executed.' % 'search.gsearch')
+    logger.debug('%s view being executed.', 'search.gsearch')
 
     form = GSearchForm(request.GET)
-    logger.debug('Form submit (GET): %s, with result: %s' % ('GSearchForm',form))
+    logger.debug('Form submit (GET): %s, with result: %s', 'GSearchForm',form)
 
     if form.is_valid():
         # Obtain the cleaned data (only validate the dates)
@@ -51,18 +121,8 @@ def graph(request):
         type = form.cleaned_data['type']
         page = form.cleaned_data['page']
 
-        # Combine the dates and times into datetime objects
-        start = datetime.datetime.combine(date, datetime.datetime.strptime('00:00:00','%H:%M:%S').time())
-        end = datetime.datetime.combine(date, datetime.datetime.strptime('23:59:59','%H:%M:%S').time())
-
-        # Set the timezone
-        tz = pytz.timezone(request.timezone)
-        start = tz.localize(start)
-        end = tz.localize(end)
-
-        results_all = Event.objects.filter(type__type=type,start__range=[start,end]
-                                          ).values('id','type__type','start','description','status__status'
-                                          ).order_by('-start')
+        # The events of that day (live and archived)
+        results_all = _graph_events(date, type, request.timezone)
 
         # Create a paginator and paginate the list w/ 10 messages per page
         paginator = Paginator(results_all, 10)
@@ -99,6 +159,35 @@ def graph(request):
         return HttpResponseRedirect('/')
 
 
+def histogram(request):
+    """Event Histogram View
+
+    Count the incidents and maintenances per day, week or month between two
+    dates (in the user's timezone), as JSON
+
+    """
+
+    logger.debug('%s view being executed.', 'search.histogram')
+
+    form = HistogramForm(request.GET)
+    logger.debug('Form submit (GET): %s, with result: %s', 'HistogramForm',form)
+
+    if not form.is_valid():
+        return HttpResponseBadRequest('Invalid histogram query')
+
+    start = form.cleaned_data['start']
+    end = form.cleaned_data['end']
+    granularity = form.cleaned_data['granularity'] or 'day'
+
+    if (end - start).days >= engine.HISTOGRAM_MAX_DAYS:
+        return HttpResponseBadRequest('The histogram range cannot be more than %s days' % engine.HISTOGRAM_MAX_DAYS)
+
+    counts = engine.counts(start, end, granularity, request.timezone)
+
+    return HttpResponse(json.dumps({'granularity':granularity, 'timezone':request.timezone, 'counts':counts}),
+                        content_type='application/json')
+
+
 def events(request):
     """Event List View
 
@@ -106,10 +195,10 @@ def events(request):
 
     """
 
-    logger.debug('%s view being executed.' % 'search.events')
+    logger.debug('%s view being executed.', 'search.events')
 
     form = SearchForm(request.GET)
-    logger.debug('Form submit (GET): %s, with result: %s' % ('SearchForm',form))
+    logger.debug('Form submit (GET): %s, with result: %s', 'SearchForm',form)
 
     # Check the params
     if form.is_valid():
@@ -121,36 +210,11 @@ def events(request):
         type = form.cleaned_data['type']
 
         # Build the filter for the search query
-        filter = {}
+        filter = _filter(form, request.timezone)
 
-        # Start/End
-        if start and end:
-            # Combine the dates and times into datetime objects
-            start_tmp = datetime.datetime.combine(start, datetime.datetime.strptime('00:00:00','%H:%M:%S').time())
-            end_tmp = datetime.datetime.combine(end, datetime.datetime.strptime('23:59:59','%H:%M:%S').time())
-
-            # Set the timezone
-            tz = pytz.timezone(request.timezone)
-            start_tmp = tz.localize(start_tmp)
-            end_tmp = tz.localize(end_tmp)
-
-            filter['start__range'] = [start_tmp,end_tmp]
-
-        # Type
-        if type:
-            filter['type__type'] = '%s' % type
-
-        # Text
-        if text:
-            filter['description__contains'] = '%s' % text
-
-        # Obtain filtered incidents
-        if filter:
-            events_all = Event.objects.filter(**filter).values('id','status__status','type__type','start','end','description').order_by('-id')
-
-        # Obtain all incidents
-        else:
-            events_all = Event.objects.values('id','status__status','type__type','start','end','description').order_by('-id')
+        # Obtain filtered incidents (or all incidents if there is no filter) from the
+        # live events and then the archive
+        events_all = QuerySetChain(*[model.objects.filter(**filter).values('id','status__status','type__type','start','end','description').order_by('-id') for model in (Event, Archive_Event)])
 
         # Create a paginator and paginate the list w/ 10 messages per page
         paginator = Paginator(events_all, 10)
@@ -209,4 +273,118 @@ def events(request):
               'form':form,
            },
            context_instance=RequestContext(request)
-        )
\ No newline at end of file
+        )
+
+def _export_rows(filter, timezone, db):
+    """Generate every event matching the filter (live events first, then the
+    archive) with its services, impact, coordinator and updates
+
+    Events are read in chunks of EXPORT_CHUNK by descending id, and the related
+    data of each chunk is read in one query per table, so memory use does not
+    grow with the number of events exported.
+
+    """
+
+    tz = pytz.timezone(timezone)
+
+    for model in (Event, Archive_Event):
+        last = None
+        while True:
+            events = model.objects.using(db).filter(**filter)
+            if last:
+                events = events.filter(id__lt=last)
+            events = list(events.values('id','type__type','status__status','start','end','description').order_by('-id')[:EXPORT_CHUNK].iterator())
+            if not events:
+                break
+            last = events[-1]['id']
+            ids = [event['id'] for event in events]
+
+            # The related data of this chunk
+            related = dict((id, {'services':[], 'impact':'', 'coordinator':'', 'updates':[]}) for id in ids)
+            for row in model.objects.using(db).filter(id__in=ids).exclude(event_service__service__service_name=None).values('id','event_service__service__service_name').order_by('event_service__service__service_name').iterator():
+                related[row['id']]['services'].append(row['event_service__service__service_name'])
+            for row in model.objects.using(db).filter(id__in=ids).values('id','event_impact__impact','event_coordinator__coordinator').iterator():
+                related[row['id']]['impact'] = row['event_impact__impact'] or ''
+                related[row['id']]['coordinator'] = row['event_coordinator__coordinator'] or ''
+            for row in model.objects.using(db).filter(id__in=ids).exclude(event_update__date=None).values('id','event_update__date','event_update__update').order_by('event_update__id').iterator():
+                related[row['id']]['updates'].append({'date':row['event_update__date'].astimezone(tz).isoformat(), 'update':row['event_update__update']})
+
+            for event in events:
+                yield {
+                    'id':event['id'],
+                    'type':event['type__type'],
+                    'status':event['status__status'],
+                    'start':event['start'].astimezone(tz).isoformat(),
+                    'end':event['end'].astimezone(tz).isoformat() if event['end'] else '',
+                    'description':event['description'],
+                    'services':related[event['id']]['services'],
+                    'impact':related[event['id']]['impact'],
+                    'coordinator':related[event['id']]['coordinator'],
+                    'updates':related[event['id']]['updates'],
+                    'archived':model == Archive_Event,
+                }
+
+
+class _Echo(object):
+    """File-like object that hands back what is written to it (for csv.writer)"""
+
+    def write(self, value):
+        return value
+
+
+def _export_csv(rows):
+    """Generate CSV lines for the exported events"""
+
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        row['services'] = '; '.join(row['services'])
+        row['updates'] = '\n'.join(['%s %s' % (update['date'],update['update']) for update in row['updates']])
+        yield writer.writerow([unicode(row[field]).encode('utf-8') for field in EXPORT_FIELDS])
+
+
+def _export_json(rows):
+    """Generate newline delimited JSON for the exported events"""
+
+    for row in rows:
+        yield json.dumps(row) + '\n'
+
+
+def _export(request, format):
+    """Stream all events matching the search criteria (the same as the event
+    search) in the requested format"""
+
+    form = SearchForm(request.GET)
+    logger.debug('Form submit (GET): %s, with result: %s', 'SearchForm',form)
+
+    if not form.is_valid():
+        messages.add_message(request, messages.ERROR, 'Invalid export query')
+        return HttpResponseRedirect('/search/events')
+
+    # The response is generated after this view returns, so decide which database
+    # to read from now (a read replica, if this request is using one)
+    rows = _export_rows(_filter(form, request.timezone), request.timezone, router.db_for_read(Event))
+
+    if format == 'json':
+        response = StreamingHttpResponse(_export_json(rows), content_type='application/x-ndjson')
+    else:
+        response = StreamingHttpResponse(_export_csv(rows), content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="ssd_events.%s"' % format
+
+    return response
+
+
+def export_csv(request):
+    """Event Export View (CSV)"""
+
+    logger.debug('%s view being executed.', 'search.export_csv')
+
+    return _export(request, 'csv')
+
+
+def export_json(request):
+    """Event Export View (newline delimited JSON)"""
+
+    logger.debug('%s view being executed.', 'search.export_json')
+
+    return _export(request, 'json')
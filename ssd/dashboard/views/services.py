@@ -18,15 +18,16 @@
 
 
 import logging
-from django.db import IntegrityError
-from django.core.cache import cache
+import re
+from django.db import IntegrityError, transaction
 from ssd.dashboard.decorators import staff_member_required_ssd
 from django.shortcuts import render_to_response
 from django.template import RequestContext
 from django.http import HttpResponse, HttpResponseRedirect, HttpResponseBadRequest
 from django.contrib import messages
-from ssd.dashboard.models import Service, Event_Service
-from ssd.dashboard.forms import AddServiceForm, RemoveServiceForm, XEditableModifyForm
+from ssd.dashboard.models import Service, Event_Service, Archive_Event_Service, Service_Group, Service_Group_Member
+from ssd.dashboard.forms import AddServiceForm, RemoveServiceForm, XEditableModifyForm, AddServiceGroupForm, ServiceGroupForm
+from ssd.dashboard import cachetags, feeds, functions, groups
 
 
 # Get an instance of the ssd logger
@@ -39,14 +40,14 @@ def services(request):
 
     """
 
-    logger.debug('%s view being executed.' % 'services.services')
+    logger.debug('%s view being executed.', 'services.services')
 
     # If this is a POST, then validate the form and save the data
     if request.method == 'POST':
 
         # Check the form elements
         form = AddServiceForm(request.POST)
-        logger.debug('Form submit (POST): %s, with result: %s' % ('AddServiceForm',form))
+        logger.debug('Form submit (POST): %s, with result: %s', 'AddServiceForm',form)
 
         if form.is_valid():
             service = form.cleaned_data['service']
@@ -60,8 +61,8 @@ def services(request):
             else:
                 messages.add_message(request, messages.SUCCESS, 'Service saved successfully.')
 
-            # Clear the cache so the new services show up in the dashboard immediately
-            cache.delete('services')
+            # Clear the cache so the new services (and their status badges) show up in the dashboard immediately
+            cachetags.invalidate('services')
 
             # Send them back so they can see the newly created service
             return HttpResponseRedirect('/admin/services')
@@ -95,14 +96,14 @@ def services(request):
 def service_delete(request):
     """Remove Service"""
 
-    logger.debug('%s view being executed.' % 'services.service_delete')
+    logger.debug('%s view being executed.', 'services.service_delete')
 
     # If it's a POST, then we are going to delete it after confirmation
     if request.method == 'POST':
 
         # Check the form elements
         form = RemoveServiceForm(request.POST)
-        logger.debug('Form submit (POST): %s, with result: %s' % ('RemoveServiceForm',form))
+        logger.debug('Form submit (POST): %s, with result: %s', 'RemoveServiceForm',form)
 
         if form.is_valid():
             id = form.cleaned_data['id']
@@ -122,8 +123,9 @@ def service_delete(request):
             else:
                 Service.objects.filter(id=id).delete()
 
-                # Clear the cache so the modified service listing shows up in the dashboard immediately
-                cache.delete('services')
+                # Clear the cache so the modified service listing (and status badges) shows up in the dashboard immediately
+                # (the service is also gone from its group)
+                cachetags.invalidate('services')
 
                 # Set a message that delete was successful
                 messages.add_message(request, messages.SUCCESS, 'Service successfully removed.')
@@ -135,7 +137,7 @@ def service_delete(request):
 
     # Make sure we have an ID
     form = RemoveServiceForm(request.GET)
-    logger.debug('Form submit (GET): %s, with result: %s' % ('RemoveServiceForm',form))
+    logger.debug('Form submit (GET): %s, with result: %s', 'RemoveServiceForm',form)
 
     if form.is_valid():
 
@@ -178,14 +180,14 @@ def service_modify(request):
 
     """
 
-    logger.debug('%s view being executed.' % 'services.service_modify')
+    logger.debug('%s view being executed.', 'services.service_modify')
 
     # If this is a POST, then validate the form and save the data, otherise do nothing
     if request.method == 'POST':
 
         # Check the form elements
         form = XEditableModifyForm(request.POST)
-        logger.debug('Form submit (POST): %s, with result: %s' % ('XEditableModifyForm',form))
+        logger.debug('Form submit (POST): %s, with result: %s', 'XEditableModifyForm',form)
 
         if form.is_valid():
             pk = form.cleaned_data['pk']
@@ -194,7 +196,7 @@ def service_modify(request):
 
             # Add the column we are updating (but only allow specific values)
             if not name == 'service_name':
-                logger.error('Invalid column specified during service modification: %s' % name)
+                logger.error('Invalid column specified during service modification: %s', name)
                 return HttpResponseBadRequest('An error was encountered with this request.')
 
             filter = {}
@@ -204,19 +206,206 @@ def service_modify(request):
             try:
                 Service.objects.filter(id=pk).update(**filter)
             except Exception as e:
-                logger.error('%s: Error saving update: %s' % ('services.service_modify',e))
+                logger.error('%s: Error saving update: %s', 'services.service_modify',e)
                 return HttpResponseBadRequest('An error was encountered with this request.')
 
             # Clear the cache so the modified service listing shows up in the dashboard immediately
-            cache.delete('services')
+            # (including the status badges, group rollups and the detail of any events this service is part of)
+            cachetags.invalidate('services')
+            event_ids = list(Event_Service.objects.filter(service_id=pk).values_list('event_id',flat=True))
+            archived_ids = list(Archive_Event_Service.objects.filter(service_id=pk).values_list('event_id',flat=True))
+            functions.event_detail_invalidate(event_ids + archived_ids)
+            feeds.events_changed(event_ids)
 
             return HttpResponse('Value successfully modified')
 
         else:
-            logger.error('%s: invalid form: %s' % ('services.service_modify',form.errors))
+            logger.error('%s: invalid form: %s', 'services.service_modify',form.errors)
             return HttpResponseBadRequest('Invalid request')
     else:
-        logger.error('%s: Invalid request: GET received but only POST accepted.' % ('services.service_modify'))
+        logger.error('%s: Invalid request: GET received but only POST accepted.', 'services.service_modify')
         messages.add_message(request, messages.ERROR, 'Invalid request.')
         return HttpResponseRedirect('/admin/services')
 
+
+
+@staff_member_required_ssd
+def service_groups(request):
+    """View and Add Service Groups
+
+    """
+
+    logger.debug('%s view being executed.', 'services.service_groups')
+
+    # If this is a POST, then validate the form and save the data
+    if request.method == 'POST':
+
+        # Check the form elements
+        form = AddServiceGroupForm(request.POST)
+        logger.debug('Form submit (POST): %s, with result: %s', 'AddServiceGroupForm',form)
+
+        if form.is_valid():
+            group = form.cleaned_data['group']
+
+            # Don't allow duplicates
+            try:
+                Service_Group(group_name=group).save()
+            except IntegrityError:
+                messages.add_message(request, messages.ERROR, 'That group name already exists.')
+                pass
+            else:
+                messages.add_message(request, messages.SUCCESS, 'Group saved successfully.')
+
+            # Clear the cache so the new group shows up in the dashboard immediately
+            cachetags.invalidate('services')
+
+            # Send them back so they can see the newly created group
+            return HttpResponseRedirect('/admin/service_groups')
+
+        else:
+            messages.add_message(request, messages.ERROR, 'Invalid data entered, please correct the errors below:')
+
+    # Not a POST
+    else:
+        # Create a blank form
+        form = AddServiceGroupForm()
+
+    # Print the page
+    return render_to_response(
+       'services/service_groups.html',
+       {
+          'title':'System Status Dashboard | Manage Service Groups',
+          'form':form,
+          'groups':groups.members()['groups'],
+          'nav_section':'services',
+          'nav_sub':'service_groups'
+       },
+       context_instance=RequestContext(request)
+    )
+
+
+@staff_member_required_ssd
+def service_group(request):
+    """Set the Services in a Service Group
+
+    A service can only be in one group, so services that are added to this
+    group are removed from any other group.
+
+    """
+
+    logger.debug('%s view being executed.', 'services.service_group')
+
+    # If this is a POST, then validate the form and save the data
+    if request.method == 'POST':
+
+        # Check the form elements
+        form = ServiceGroupForm(request.POST)
+        logger.debug('Form submit (POST): %s, with result: %s', 'ServiceGroupForm',form)
+
+        if form.is_valid():
+            id = form.cleaned_data['id']
+
+            if not Service_Group.objects.filter(id=id).exists():
+                messages.add_message(request, messages.ERROR, 'That group has already been removed, perhaps someone else deleted it?')
+                return HttpResponseRedirect('/admin/service_groups')
+
+            # Should be number only -- can't figure out how to validate
+            # multiple checkboxes in the form
+            service_ids = set([int(service_id) for service_id in request.POST.getlist('service') if re.match(r'^\d+$', service_id)])
+
+            with transaction.atomic():
+                Service_Group_Member.objects.filter(group_id=id).exclude(service_id__in=service_ids).delete()
+                Service_Group_Member.objects.filter(service_id__in=service_ids).exclude(group_id=id).delete()
+                current = set(Service_Group_Member.objects.filter(group_id=id).values_list('service_id', flat=True))
+                Service_Group_Member.objects.bulk_create([
+                    Service_Group_Member(group_id=id, service_id=service_id)
+                    for service_id in Service.objects.filter(id__in=service_ids - current).values_list('id', flat=True)
+                ])
+
+            # Clear the cache so the group shows up in the dashboard immediately
+            cachetags.invalidate('services')
+
+            messages.add_message(request, messages.SUCCESS, 'Group saved successfully.')
+            return HttpResponseRedirect('/admin/service_group?id=%s' % id)
+
+    # If we get this far, it's a GET (or an invalid POST) and we are showing the group
+
+    # Make sure we have an ID
+    form = ServiceGroupForm(request.GET)
+    logger.debug('Form submit (GET): %s, with result: %s', 'ServiceGroupForm',form)
+
+    if form.is_valid():
+
+        # Obtain the cleaned data
+        id = form.cleaned_data['id']
+
+        # Obtain the group name
+        group = Service_Group.objects.filter(id=id).values('id','group_name')
+
+        # If someone already deleted it, set an error message and send back to the group listing
+        if not group:
+            messages.add_message(request, messages.ERROR, 'That group has already been removed, perhaps someone else deleted it?')
+            return HttpResponseRedirect('/admin/service_groups')
+
+        # All services, with the group they are in (if any)
+        members = dict(Service_Group_Member.objects.values_list('service_id','group__group_name'))
+        services = []
+        for service in Service.objects.values('id','service_name').order_by('service_name'):
+            service['group_name'] = members.get(service['id'])
+            services.append(service)
+
+        # Print the page
+        return render_to_response(
+           'services/service_group.html',
+           {
+              'title':'System Status Dashboard | Manage Service Group',
+              'group':group[0],
+              'services':services,
+              'nav_section':'services',
+              'nav_sub':'service_group'
+           },
+           context_instance=RequestContext(request)
+        )
+
+    # Invalid request
+    else:
+
+        # Set a message that the request failed and send back to the group listing
+        messages.add_message(request, messages.ERROR, 'Invalid request.')
+        return HttpResponseRedirect('/admin/service_groups')
+
+
+@staff_member_required_ssd
+def service_group_delete(request):
+    """Remove Service Group
+
+    The services in the group are kept (and shown ungrouped).
+
+    """
+
+    logger.debug('%s view being executed.', 'services.service_group_delete')
+
+    if request.method == 'POST':
+
+        # Check the form elements
+        form = ServiceGroupForm(request.POST)
+        logger.debug('Form submit (POST): %s, with result: %s', 'ServiceGroupForm',form)
+
+        if form.is_valid():
+            id = form.cleaned_data['id']
+
+            with transaction.atomic():
+                Service_Group_Member.objects.filter(group_id=id).delete()
+                Service_Group.objects.filter(id=id).delete()
+
+            # Clear the cache so the group's services show up in the dashboard immediately
+            cachetags.invalidate('services')
+
+            # Set a message that delete was successful
+            messages.add_message(request, messages.SUCCESS, 'Group successfully removed.')
+
+            return HttpResponseRedirect('/admin/service_groups')
+
+    # Invalid request
+    messages.add_message(request, messages.ERROR, 'Invalid request.')
+    return HttpResponseRedirect('/admin/service_groups')
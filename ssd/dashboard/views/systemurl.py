@@ -37,14 +37,14 @@ def systemurl_config(request):
 
     """
 
-    logger.debug('%s view being executed.' % 'systemurl.systemurl_config')
+    logger.debug('%s view being executed.', 'systemurl.systemurl_config')
 
     # If this is a POST, then validate the form and save the data
     if request.method == 'POST':
 
         # Check the form elements
         form = SystemurlConfigForm(request.POST)
-        logger.debug('Form submit (POST): %s, with result: %s' % ('SystemurlConfigForm',form))
+        logger.debug('Form submit (POST): %s, with result: %s', 'SystemurlConfigForm',form)
 
         if form.is_valid():
             # Obtain the cleaned data
@@ -22,6 +22,7 @@ urlpatterns = patterns('',
 
     # Main Dashboard
     url(r'^$',                              'ssd.dashboard.views.main.index'),
+    url(r'^rows$',                          'ssd.dashboard.views.main.rows'),
 
     # Escalation Path
     url(r'^escalation$',                    'ssd.dashboard.views.escalation.escalation'),
@@ -29,6 +30,9 @@ urlpatterns = patterns('',
     # Search
     url(r'^search/events$',                 'ssd.dashboard.views.search.events'),
     url(r'^search/graph$',                  'ssd.dashboard.views.search.graph'),
+    url(r'^search/histogram$',              'ssd.dashboard.views.search.histogram'),
+    url(r'^search/export/csv$',             'ssd.dashboard.views.search.export_csv'),
+    url(r'^search/export/json$',            'ssd.dashboard.views.search.export_json'),
 
     # Preferences
     url(r'^prefs/set_timezone$',            'ssd.dashboard.views.prefs.set_timezone'),
@@ -40,6 +44,17 @@ urlpatterns = patterns('',
     # Maintenance Events
     url(r'^m_detail$',                      'ssd.dashboard.views.maintenance.m_detail'),
 
+    # Service Availability
+    url(r'^availability$',                  'ssd.dashboard.views.availability.availability'),
+
+    # Event Feeds
+    url(r'^feeds/atom$',                    'ssd.dashboard.views.feeds.atom'),
+    url(r'^feeds/rss$',                     'ssd.dashboard.views.feeds.rss'),
+
+    # Service Badges
+    url(r'^badge/svg$',                     'ssd.dashboard.views.badges.svg'),
+    url(r'^badge/json$',                    'ssd.dashboard.views.badges.json'),
+
     # Incident Reports
     url(r'^ireport$',                       'ssd.dashboard.views.ireport.ireport'),
 
@@ -60,6 +75,10 @@ urlpatterns = patterns('',
     url(r'^admin$',                         'ssd.dashboard.views.admin.main'),
     url(r'^admin/admin_config$',            'ssd.dashboard.views.admin.admin_config'),
     url(r'^admin/cache_status$',            'ssd.dashboard.views.admin.cache_status'),
+    url(r'^admin/profiles$',                'ssd.dashboard.views.admin.profiles'),
+    url(r'^admin/profile_disarm$',          'ssd.dashboard.views.admin.profile_disarm'),
+    url(r'^admin/profile_download$',        'ssd.dashboard.views.admin.profile_download'),
+    url(r'^admin/profile_delete$',          'ssd.dashboard.views.admin.profile_delete'),
 
     # Incident Events (admin functionality)
     url(r'^admin/incident$',                'ssd.dashboard.views.incidents.incident'),
@@ -86,6 +105,9 @@ urlpatterns = patterns('',
     url(r'^admin/services$',                'ssd.dashboard.views.services.services'),
     url(r'^admin/service_delete$',          'ssd.dashboard.views.services.service_delete'),
     url(r'^admin/service_modify$',          'ssd.dashboard.views.services.service_modify'),
+    url(r'^admin/service_groups$',          'ssd.dashboard.views.services.service_groups'),
+    url(r'^admin/service_group$',           'ssd.dashboard.views.services.service_group'),
+    url(r'^admin/service_group_delete$',    'ssd.dashboard.views.services.service_group_delete'),
 
     # Messages Configuration (admin functionality)
     url(r'^admin/messages_config$',         'ssd.dashboard.views.messages.messages_config'),
@@ -106,9 +128,11 @@ urlpatterns = patterns('',
     url(r'^admin/escalation_config$',       'ssd.dashboard.views.escalation.escalation_config'),
     url(r'^admin/escalation_contacts$',     'ssd.dashboard.views.escalation.escalation_contacts'),
     url(r'^admin/contact_switch$',          'ssd.dashboard.views.escalation.contact_switch'),
+    url(r'^admin/contact_reorder$',         'ssd.dashboard.views.escalation.contact_reorder'),
     url(r'^admin/contact_delete$',          'ssd.dashboard.views.escalation.contact_delete'),
     url(r'^admin/contact_modify$',          'ssd.dashboard.views.escalation.contact_modify'),
 
     # Events
     url(r'^admin/update_modify$',           'ssd.dashboard.views.events.update_modify'),
+    url(r'^admin/event_import$',            'ssd.dashboard.views.events.event_import'),
 )